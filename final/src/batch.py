@@ -0,0 +1,132 @@
+"""Run a batch of switch configurations in parallel worker processes.
+
+Used in the Logic Simulator project to run many experiments on one network,
+such as sign-off sweeps over switch settings. The parsed network is sent to
+each worker process once, and every job starts from a checkpoint of its
+initial state, so the definition file is only parsed once.
+
+Functions
+---------
+read_jobs(path, names, devices) - returns the jobs listed in a jobs file.
+run_batch(names, devices, network, monitors, jobs, processes=None, seed=0) -
+                returns the monitored traces of each job.
+display_results(monitors, jobs, results) - prints the traces of each job.
+"""
+import multiprocessing
+import pickle
+import random
+
+from periodic import PeriodicRunner
+
+# Network of the worker process, set up by _start_worker
+_worker = {}
+
+
+def read_jobs(path, names, devices):
+    """Return the jobs listed in the jobs file at path.
+
+    Each line of the file is one job: the number of cycles to run, followed
+    by the switch settings that differ from the definition file, such as
+    "100 SW1=1 SW2=0". Blank lines and lines starting with "#" are ignored.
+    Each job is returned as a pair ({switch_id: signal}, cycles). Return None
+    and print the error if the file is invalid.
+    """
+    try:
+        with open(path) as jobs_file:
+            lines = jobs_file.readlines()
+    except OSError:
+        print("Error: could not read the jobs file", path)
+        return None
+
+    switch_ids = devices.find_devices(devices.SWITCH)
+    jobs = []
+    for line_number, line in enumerate(lines, 1):
+        words = line.split()
+        if not words or words[0].startswith("#"):
+            continue
+        if not words[0].isdigit():
+            print("Error: line", line_number, "of the jobs file must start "
+                  "with a number of cycles")
+            return None
+        switches = {}
+        for word in words[1:]:
+            name, _, signal = word.partition("=")
+            switch_id = names.query(name)
+            if switch_id not in switch_ids or signal not in ["0", "1"]:
+                print("Error: line", line_number, "of the jobs file has an "
+                      "invalid switch setting", word)
+                return None
+            switches[switch_id] = int(signal)
+        jobs.append((switches, int(words[0])))
+    return jobs
+
+
+def run_batch(names, devices, network, monitors, jobs, processes=None,
+              seed=0):
+    """Return the monitored traces of each job.
+
+    jobs is a list of pairs ({switch_id: signal}, cycles). Every job starts
+    from the current state of the network, with the given switches set, a
+    cold start-up seeded from seed and the job number, and the monitors
+    reset, as if it was run with the "r" command. The jobs are shared among
+    processes worker processes, all the available processors by default, or
+    run in this process if processes is 1. Return a list with, for each job,
+    a dictionary {(device_id, output_id): list of signals} in the order of
+    the monitors, or None if the network oscillated.
+    """
+    network_blob = pickle.dumps((names, devices, network, monitors))
+    numbered_jobs = [(seed, job_number, switches, cycles)
+                     for job_number, (switches, cycles) in enumerate(jobs)]
+    if processes == 1 or len(jobs) <= 1:
+        _start_worker(network_blob)
+        return [_run_job(job) for job in numbered_jobs]
+    with multiprocessing.Pool(processes, initializer=_start_worker,
+                              initargs=(network_blob,)) as pool:
+        return pool.map(_run_job, numbered_jobs,
+                        chunksize=max(1, len(jobs) // (4 * (
+                            processes or multiprocessing.cpu_count()))))
+
+
+def _start_worker(network_blob):
+    """Unpack the network and checkpoint its initial state."""
+    (names, devices, network, monitors) = pickle.loads(network_blob)
+    _worker["devices"] = devices
+    _worker["network"] = network
+    _worker["monitors"] = monitors
+    _worker["runner"] = PeriodicRunner(devices, network, monitors)
+    _worker["checkpoint"] = network.checkpoint()
+
+
+def _run_job(job):
+    """Run one job in the worker and return its traces."""
+    (seed, job_number, switches, cycles) = job
+    devices = _worker["devices"]
+    network = _worker["network"]
+    monitors = _worker["monitors"]
+    network.restore(_worker["checkpoint"])
+    for switch_id, signal in switches.items():
+        devices.set_switch(switch_id, signal)
+    random.seed("{}:{}".format(seed, job_number))
+    monitors.reset_monitors()
+    devices.cold_startup()
+    if not _worker["runner"].run(cycles):
+        return None
+    return {monitor: list(signal_list) for monitor, signal_list
+            in monitors.monitors_dictionary.items()}
+
+
+def display_results(monitors, jobs, results):
+    """Print the monitored traces of each job."""
+    devices = monitors.devices
+    for job_number, ((switches, cycles), traces) in enumerate(
+            zip(jobs, results), 1):
+        settings = " ".join(
+            "{}={}".format(devices.names.get_name_string(switch_id), signal)
+            for switch_id, signal in switches.items())
+        print("Job", job_number, "-", cycles, "cycles", settings)
+        if traces is None:
+            print("Error! Network oscillating.")
+            continue
+        monitors.monitors_dictionary.clear()
+        monitors.monitors_dictionary.update(traces)
+        monitors.display_signals()
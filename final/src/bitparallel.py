@@ -0,0 +1,473 @@
+"""Simulate many switch patterns at once with bit-parallel signals.
+
+Used in the Logic Simulator project to verify a network under a whole batch
+of switch settings. Every signal is a Python integer whose bit k holds the
+signal under pattern k, so one evaluation of a gate with the bitwise
+operators simulates it under every pattern of the batch.
+
+Classes
+-------
+BitParallelSimulator - simulates a batch of switch patterns at once.
+"""
+from graph import strongly_connected_components, get_device_graph
+
+
+class BitParallelSimulator:
+    """Simulate a batch of switch patterns at once.
+
+    The devices are evaluated in topological order, with the DATA input of
+    D-types cut as in the levelized.LevelizedEngine() class, so the signals
+    of every pattern are the same as when simulating the patterns one after
+    the other. Feedback loops are iterated until none of their signals
+    change under any pattern. Clocks, signal generators and RC devices do not
+    depend on the switches, so they have the same signal in every pattern.
+
+    The simulation starts from the current state of the network, and leaves
+    the Device objects unchanged.
+
+    Faults can be injected into some of the patterns, so that a device
+    output or input is stuck at LOW or HIGH in those patterns only, as used
+    by the faults.FaultSimulator() class.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    monitors: instance of the monitors.Monitors() class.
+    iteration_limit: number of passes through a feedback loop to wait for
+                     its signals to settle before declaring the network
+                     unstable.
+
+    Public methods
+    --------------
+    build_plan(self): Sorts the devices into evaluation order.
+
+    run_patterns(self, patterns, cycles=1, switch_ids=None): Simulates each
+                    pattern of switch signals for a number of cycles and
+                    returns the monitored signals of every pattern.
+
+    run_words(self, switch_words, width, cycles=1): Simulates packed switch
+                    words and returns the monitored words.
+
+    get_truth_tables(self, switch_ids=None, block_bits=16): Returns the
+                    truth table of every monitored output for all the
+                    switch assignments.
+
+    get_enumeration_word(self, bit, block_bits): Returns the word that
+                    enumerates one bit of the pattern numbers.
+
+    inject_faults(self, faults): Makes each fault stuck in one pattern.
+
+    drop_patterns(self, bits): Makes the given patterns the same as pattern
+                               0.
+
+    load_state(self): Broadcasts the current state of the network to every
+                      pattern.
+
+    execute_cycle(self, cycle, switch_words): Evaluates all the devices for
+                                              one cycle.
+    """
+
+    def __init__(self, devices, monitors, iteration_limit=20):
+        """Initialise the simulator. The plan is built on the first run."""
+        self.devices = devices
+        self.monitors = monitors
+        self.iteration_limit = iteration_limit
+
+        self.topology_version = None  # version the plan was built for
+        self.sources = []  # (kind, device) of the devices without inputs
+        self.components = []  # lists of (kind, device, in_loop) in order
+        self.supported = True  # False if a device cannot be simulated
+
+        self.words = {}  # stores {(device_id, output_id): signal word}
+        self.memory = {}  # stores {device_id: D-type memory word}
+        self.last_clock = {}  # stores {device_id: CLK word}
+        self.mask = 0  # word with a HIGH bit for every pattern
+        self.unsettled = 0  # patterns still changing when a loop gave up
+
+        # Stuck-at faults, as {(device_id, port_id): (LOW bits, HIGH bits)}
+        self.output_faults = {}
+        self.input_faults = {}
+        self.faulty_devices = set()
+
+    def build_plan(self):
+        """Sort the devices into evaluation order."""
+        devices = self.devices
+        kinds = {}
+        rank = {}
+        for kind in devices.registry.kinds:
+            for device_id in devices.find_devices(kind.kind_id):
+                kinds[device_id] = kind
+                rank[device_id] = len(rank)
+
+        successors = get_device_graph(devices, cut_inputs=[devices.DATA_ID])
+        self.sources = []
+        self.components = []
+        self.supported = True
+        for component in strongly_connected_components(list(kinds),
+                                                       successors):
+            component.sort(key=rank.get)
+            members = []
+            for device_id in component:
+                device = devices.get_device(device_id)
+                kind = kinds[device_id]
+                if None in device.inputs.values():
+                    self.supported = False  # an input is unconnected
+                if not device.inputs:
+                    if kind.kind_id not in [devices.SWITCH, devices.SIGGEN,
+                                            devices.CLOCK, devices.RC] and (
+                            kind.evaluate is None):
+                        self.supported = False
+                    self.sources.append((kind, device))
+                    continue
+                if kind.evaluate is None and kind.kind_id != devices.D_TYPE:
+                    self.supported = False
+                in_loop = len(component) > 1 or any(
+                    connected_output[0] == device_id for connected_output
+                    in device.inputs.values() if connected_output is not None)
+                members.append((kind, device, in_loop))
+            if members:
+                self.components.append(members)
+        self.topology_version = devices.topology_version
+
+    def run_patterns(self, patterns, cycles=1, switch_ids=None):
+        """Simulate each pattern of switch signals for a number of cycles.
+
+        Each pattern is a list of signals, LOW or HIGH, for the switches in
+        switch_ids, which are all the switches in the network by default.
+        Return a list with a dictionary {(device_id, output_id): list of
+        signals in each cycle} of the monitored outputs for each pattern.
+        Return None if the network cannot be simulated bit-parallel, or if it
+        oscillates under any of the patterns.
+        """
+        devices = self.devices
+        if switch_ids is None:
+            switch_ids = devices.find_devices(devices.SWITCH)
+
+        # Pack the patterns into one word per switch
+        switch_words = {}
+        for position, switch_id in enumerate(switch_ids):
+            word = 0
+            for bit, pattern in enumerate(patterns):
+                if pattern[position] == devices.HIGH:
+                    word |= 1 << bit
+            switch_words[switch_id] = word
+
+        traces = self.run_words(switch_words, len(patterns), cycles)
+        if traces is None:
+            return None
+
+        # Unpack one dictionary of traces for each pattern
+        results = []
+        for bit in range(len(patterns)):
+            results.append({monitor: [(word >> bit) & 1 for word in words]
+                            for monitor, words in traces.items()})
+        return results
+
+    def run_words(self, switch_words, width, cycles=1):
+        """Simulate packed switch words for a number of cycles.
+
+        switch_words is a dictionary {switch_id: word} with one bit for each
+        of the width patterns. Switches that are left out keep their state in
+        every pattern. Return a dictionary {(device_id, output_id): list of
+        words in each cycle} of the monitored outputs, or None if the network
+        cannot be simulated bit-parallel or oscillates.
+        """
+        devices = self.devices
+        if self.topology_version != devices.topology_version:
+            self.build_plan()
+        if not self.supported:
+            return None
+        self.mask = (1 << width) - 1
+
+        self.load_state()
+        monitored = list(self.monitors.monitors_dictionary)
+        traces = {monitor: [] for monitor in monitored}
+        for cycle in range(devices.cycle, devices.cycle + cycles):
+            if not self.execute_cycle(cycle, switch_words):
+                return None
+            for monitor in monitored:
+                traces[monitor].append(self.words[monitor])
+        return traces
+
+    def get_truth_tables(self, switch_ids=None, block_bits=16):
+        """Return the truth table of every monitored output.
+
+        All the assignments of the switches in switch_ids, which are all the
+        switches by default, are simulated in blocks of 2**block_bits
+        patterns. Each truth table is a bytes object whose bit i, counting
+        from the least significant bit of the first byte, is the output when
+        switch k of switch_ids is set to bit k of i. Return a dictionary
+        {(device_id, output_id): truth table}, or None if the network is not
+        combinational, cannot be simulated bit-parallel or oscillates.
+        """
+        devices = self.devices
+        for kind_id in [devices.D_TYPE, devices.CLOCK, devices.RC,
+                        devices.SIGGEN]:
+            if devices.find_devices(kind_id):
+                return None  # the outputs depend on time
+        if switch_ids is None:
+            switch_ids = devices.find_devices(devices.SWITCH)
+        block_bits = min(block_bits, len(switch_ids))
+        width = 1 << block_bits
+        block_words = dict(zip(switch_ids, [
+            self.get_enumeration_word(bit, block_bits)
+            for bit in range(block_bits)]))
+
+        blocks = {monitor: [] for monitor in self.monitors.monitors_dictionary}
+        for block in range(1 << (len(switch_ids) - block_bits)):
+            # Within a block, the higher switches have the same signal
+            switch_words = dict(block_words)
+            for bit, switch_id in enumerate(switch_ids[block_bits:]):
+                switch_words[switch_id] = (
+                    (1 << width) - 1 if (block >> bit) & 1 else 0)
+            traces = self.run_words(switch_words, width)
+            if traces is None:
+                return None
+            for monitor, words in traces.items():
+                blocks[monitor].append(words[0])
+
+        tables = {}
+        for monitor, words in blocks.items():
+            if width >= 8:
+                tables[monitor] = b"".join(word.to_bytes(width // 8, "little")
+                                           for word in words)
+            else:  # blocks smaller than a byte
+                table = 0
+                for block, word in enumerate(words):
+                    table |= word << (block * width)
+                tables[monitor] = table.to_bytes(
+                    (len(words) * width + 7) // 8, "little")
+        return tables
+
+    def get_enumeration_word(self, bit, block_bits):
+        """Return the word in which pattern i has bit number bit of i.
+
+        The word has 2**block_bits patterns.
+        """
+        width = 1 << block_bits
+        if bit < 3:
+            byte = bytes([[0xAA, 0xCC, 0xF0][bit]])
+            word = int.from_bytes(byte * max(width // 8, 1), "little")
+            return word & ((1 << width) - 1)
+        run = 1 << (bit - 3)  # bytes of LOW, then of HIGH
+        return int.from_bytes((bytes(run) + b"\xff" * run) * (
+            width // (16 * run)), "little")
+
+    def inject_faults(self, faults):
+        """Make each fault stuck in one pattern.
+
+        faults is a list of faults (device_id, port_id, is_input, signal),
+        and fault k is injected into pattern k + 1, leaving pattern 0 free of
+        faults. port_id is an input ID if is_input is True, and otherwise an
+        output ID. signal is the level, LOW or HIGH, that the port is stuck
+        at. A fault of None leaves its pattern free of faults.
+        """
+        self.output_faults = {}
+        self.input_faults = {}
+        self.faulty_devices = set()
+        for bit, fault in enumerate(faults, 1):
+            if fault is None:
+                continue
+            (device_id, port_id, is_input, signal) = fault
+            port_faults = self.input_faults if is_input else (
+                self.output_faults)
+            (low_bits, high_bits) = port_faults.get((device_id, port_id),
+                                                    (0, 0))
+            if signal == self.devices.HIGH:
+                high_bits |= 1 << bit
+            else:
+                low_bits |= 1 << bit
+            port_faults[(device_id, port_id)] = (low_bits, high_bits)
+            self.faulty_devices.add(device_id)
+
+    def drop_patterns(self, bits):
+        """Make the patterns with a HIGH bit in bits the same as pattern 0.
+
+        Used once the faults of these patterns are no longer of interest, so
+        they cannot make a feedback loop oscillate.
+        """
+        keep = ~bits
+        for words in [self.words, self.memory, self.last_clock]:
+            for key, word in words.items():
+                words[key] = (word & keep) | (bits if word & 1 else 0)
+
+    def load_state(self):
+        """Broadcast the current state of the network to every pattern."""
+        devices = self.devices
+        self.words = {}
+        for device in devices.devices_list:
+            for output_id, signal in device.outputs.items():
+                self.words[(device.device_id, output_id)] = self.broadcast(
+                    signal in [devices.HIGH, devices.RISING])
+            if device.device_id in self.faulty_devices:
+                self.apply_output_faults(device)
+        self.memory = {}
+        self.last_clock = {}
+        for device_id in devices.find_devices(devices.D_TYPE):
+            device = devices.get_device(device_id)
+            self.memory[device_id] = self.broadcast(
+                device.dtype_memory == devices.HIGH)
+            if device.inputs[devices.CLK_ID] is None:
+                self.last_clock[device_id] = 0
+            else:
+                self.last_clock[device_id] = self.get_input_word(
+                    device, devices.CLK_ID)
+
+    def broadcast(self, high):
+        """Return the word of a signal that is the same in every pattern."""
+        return self.mask if high else 0
+
+    def execute_cycle(self, cycle, switch_words):
+        """Evaluate all the devices for one cycle. Return True if settled."""
+        devices = self.devices
+        # D-types sample DATA before the sources change it
+        data_samples = {}
+        for device_id in self.memory:
+            device = devices.get_device(device_id)
+            data_samples[device_id] = self.get_input_word(device,
+                                                          devices.DATA_ID)
+
+        for kind, device in self.sources:
+            device_id = device.device_id
+            kind_id = kind.kind_id
+            if kind_id == devices.SWITCH:
+                word = switch_words.get(device_id, self.broadcast(
+                    device.switch_state == devices.HIGH))
+            elif kind_id == devices.SIGGEN:
+                pattern = device.siggen_pattern
+                word = self.broadcast(
+                    pattern[cycle % len(pattern)] == devices.HIGH)
+            elif kind_id == devices.CLOCK:
+                word = self.broadcast(devices.get_clock_signal(
+                    device_id, cycle) == devices.HIGH)
+            elif kind_id == devices.RC:
+                word = self.broadcast(cycle < device.rc_fall_cycle)
+            else:
+                self.evaluate_bits(kind, device)
+                continue
+            self.words[(device_id, None)] = word
+            if device_id in self.faulty_devices:
+                self.apply_output_faults(device)
+
+        for members in self.components:
+            if len(members) == 1 and not members[0][2]:
+                kind, device, in_loop = members[0]
+                self.evaluate(kind, device, data_samples)
+                continue
+            for passes in range(self.iteration_limit):
+                changed = 0  # patterns in which an output changed
+                for (kind, device, in_loop) in members:
+                    outputs = self.get_output_words(device)
+                    self.evaluate(kind, device, data_samples)
+                    for new_word, old_word in zip(
+                            self.get_output_words(device), outputs):
+                        changed |= new_word ^ old_word
+                if not changed:
+                    break
+            else:
+                self.unsettled = changed
+                return False
+        return True
+
+    def get_output_words(self, device):
+        """Return the list of output words of the device."""
+        return [self.words[(device.device_id, output_id)]
+                for output_id in device.outputs]
+
+    def get_input_word(self, device, input_id):
+        """Return the word at the input of the device, with its faults."""
+        word = self.words[device.inputs[input_id]]
+        fault = self.input_faults.get((device.device_id, input_id))
+        if fault is not None:
+            (low_bits, high_bits) = fault
+            word = (word & ~low_bits) | high_bits
+        return word
+
+    def get_input_words(self, device):
+        """Return the list of input words of the device, with its faults."""
+        if device.device_id in self.faulty_devices:
+            return [self.get_input_word(device, input_id)
+                    for input_id in device.inputs]
+        return [self.words[connected_output]
+                for connected_output in device.inputs.values()]
+
+    def apply_output_faults(self, device):
+        """Force the stuck bits of the outputs of the device."""
+        for output_id in device.outputs:
+            fault = self.output_faults.get((device.device_id, output_id))
+            if fault is not None:
+                (low_bits, high_bits) = fault
+                port = (device.device_id, output_id)
+                self.words[port] = (self.words[port] & ~low_bits) | high_bits
+
+    def evaluate(self, kind, device, data_samples):
+        """Evaluate a device under every pattern at once."""
+        devices = self.devices
+        device_id = device.device_id
+        mask = self.mask
+        input_words = self.get_input_words(device)
+        kind_id = kind.kind_id
+
+        if kind_id in [devices.AND, devices.NAND]:
+            word = mask
+            for input_word in input_words:
+                word &= input_word
+            if kind_id == devices.NAND:
+                word ^= mask
+        elif kind_id in [devices.OR, devices.NOR]:
+            word = 0
+            for input_word in input_words:
+                word |= input_word
+            if kind_id == devices.NOR:
+                word ^= mask
+        elif kind_id == devices.XOR:
+            word = 0
+            for input_word in input_words:
+                word ^= input_word
+        elif kind_id == devices.LUT:
+            # OR of the minterms for which the table is HIGH
+            word = 0
+            for index in range(1 << len(input_words)):
+                if not (device.lut_table >> index) & 1:
+                    continue
+                term = mask
+                for bit, input_word in enumerate(input_words):
+                    term &= input_word if (index >> bit) & 1 else (
+                        input_word ^ mask)
+                word |= term
+        elif kind_id == devices.D_TYPE:
+            signals = dict(zip(device.inputs, input_words))
+            clock_word = signals[devices.CLK_ID]
+            rising = clock_word & (self.last_clock[device_id] ^ mask)
+            memory = (self.memory[device_id] & ~rising) | (
+                data_samples[device_id] & rising)
+            memory = (memory | signals[devices.SET_ID]) & (
+                signals[devices.CLEAR_ID] ^ mask)
+            self.memory[device_id] = memory
+            self.last_clock[device_id] = clock_word
+            self.words[(device_id, devices.Q_ID)] = memory
+            self.words[(device_id, devices.QBAR_ID)] = memory ^ mask
+            word = None  # the outputs are already set
+        else:
+            self.evaluate_bits(kind, device)
+            return
+        if word is not None:
+            self.words[(device_id, None)] = word
+        if device_id in self.faulty_devices:
+            self.apply_output_faults(device)
+
+    def evaluate_bits(self, kind, device):
+        """Evaluate a device of another kind one pattern at a time."""
+        devices = self.devices
+        input_words = self.get_input_words(device)
+        output_words = [0] * len(device.outputs)
+        for bit in range(self.mask.bit_length()):
+            input_signals = [(word >> bit) & 1 for word in input_words]
+            for position, signal in enumerate(kind.evaluate(
+                    devices, device, input_signals)):
+                if signal == devices.HIGH:
+                    output_words[position] |= 1 << bit
+        for output_id, word in zip(device.outputs, output_words):
+            self.words[(device.device_id, output_id)] = word
+        if device.device_id in self.faulty_devices:
+            self.apply_output_faults(device)
@@ -0,0 +1,483 @@
+"""Compile the network into straight-line Python code.
+
+Used in the Logic Simulator project to simulate a network without looking up
+devices, dictionaries or methods in every cycle. The network is translated
+into the source of a Python module with a step(state, cycle, calls) function,
+which keeps every signal in a local variable and evaluates the devices in
+signal-flow order. The module can be cached in a file alongside the
+definition file and reused by later runs.
+
+Classes
+-------
+CodeGenerator - translates the network into the source of a Python module.
+CompiledEngine - executes the network with the generated step function.
+
+Functions
+---------
+get_cache_path(path) - returns the path of the cached module for a definition
+                       file.
+"""
+import hashlib
+import importlib.util
+import os
+import types
+
+from graph import strongly_connected_components, get_device_graph
+
+# Changing the generated code must change this, to invalidate cached modules
+CODEGEN_VERSION = 2
+
+
+def get_cache_path(path):
+    """Return the path of the cached module for the definition file."""
+    directory, file_name = os.path.split(os.path.abspath(path))
+    module_name = os.path.splitext(file_name)[0].replace(".", "_")
+    return os.path.join(directory, "__logsim_cache__", module_name + ".py")
+
+
+class CodeGenerator:
+    """Translate the network into the source of a Python module.
+
+    The module holds a FINGERPRINT of the network it was generated from, the
+    layout of the state list, and the step(state, cycle, calls) function.
+    The state list holds every signal, followed by the memory and last CLK
+    signal of every D-type, the setting of every switch, the phase of every
+    clock and the fall cycle of every RC device. The timing of D-types is
+    the same as in the levelized.LevelizedEngine() class.
+
+    Devices of kinds that are not built in are evaluated by calling
+    kind.evaluate, found in the calls list passed to step.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    iteration_limit: number of passes through a feedback loop to wait for
+                     its signals to settle before declaring the network
+                     unstable.
+
+    Public methods
+    --------------
+    get_fingerprint(self): Returns a hash of the structure of the network.
+
+    generate(self): Returns the source of the module, or None if the network
+                    cannot be compiled.
+    """
+
+    def __init__(self, devices, iteration_limit=20):
+        """Initialise the generator with the devices of the network."""
+        self.devices = devices
+        self.iteration_limit = iteration_limit
+
+        self.kinds = {}  # stores {device_id: kind} in registry order
+        for kind in devices.registry.kinds:
+            for device_id in devices.find_devices(kind.kind_id):
+                self.kinds[device_id] = kind
+
+        self.signal_index = {}  # stores {(device_id, output_id): index}
+        self.lines = []  # lines of the step function being generated
+
+    def get_fingerprint(self):
+        """Return a hash of the structure of the network.
+
+        The iteration limit is written into the generated code, so it is
+        hashed too. Switch settings, D-type memories, clock phases and RC
+        fall cycles are part of the state, so changing them keeps the
+        fingerprint.
+        """
+        devices = self.devices
+        fingerprint = hashlib.sha256(repr(
+            (CODEGEN_VERSION, self.iteration_limit)).encode())
+        for device_id, kind in self.kinds.items():
+            device = devices.get_device(device_id)
+            fingerprint.update(repr((
+                devices.names.get_name_string(device_id), kind.name,
+                list(device.inputs.items()), list(device.outputs),
+                device.clock_half_period, device.clock_high_time,
+                device.lut_table, device.siggen_pattern)).encode())
+        return fingerprint.hexdigest()
+
+    def generate(self):
+        """Return the source of the module, or None if it cannot be made."""
+        devices = self.devices
+        self.signal_index = {}
+        for device_id in self.kinds:
+            for output_id in devices.get_device(device_id).outputs:
+                self.signal_index[(device_id, output_id)] = len(
+                    self.signal_index)
+
+        # Layout of the state after the signals
+        slot = len(self.signal_index)
+        d_types = []  # (device_id, memory slot)
+        switches = []  # (device_id, setting slot)
+        clocks = []  # (device_id, phase slot)
+        rcs = []  # (device_id, fall cycle slot)
+        calls = []  # IDs of the devices evaluated by a call
+        for device_id, kind in self.kinds.items():
+            device = devices.get_device(device_id)
+            if None in device.inputs.values():
+                return None  # an input is unconnected
+            if kind.kind_id == devices.D_TYPE:
+                d_types.append((device_id, slot))
+                slot += 2
+            elif kind.kind_id == devices.SWITCH:
+                switches.append((device_id, slot))
+                slot += 1
+            elif kind.kind_id == devices.CLOCK:
+                clocks.append((device_id, slot))
+                slot += 1
+            elif kind.kind_id == devices.RC:
+                rcs.append((device_id, slot))
+                slot += 1
+            elif kind.kind_id != devices.SIGGEN:
+                if kind.evaluate is None:
+                    return None  # cannot be evaluated in generated code
+                if kind.kind_id not in devices.gate_types + [devices.LUT]:
+                    calls.append(device_id)
+        self.call_index = {device_id: position for position, device_id
+                           in enumerate(calls)}
+
+        self.lines = ["def step(state, cycle, calls):",
+                      "    steady = True"]
+        signals = self.get_signal_list(range(len(self.signal_index)))
+        if signals:
+            self.add_line("({},) = state[:{}]".format(
+                signals, len(self.signal_index)))
+        for device_id, memory_slot in d_types:
+            self.add_line("m{0}, c{0} = state[{1}], state[{2}]".format(
+                device_id, memory_slot, memory_slot + 1))
+
+        # D-type DATA samples, then sources, then signal flow order
+        for device_id, memory_slot in d_types:
+            self.add_line("d{} = {}".format(device_id, self.get_signal(
+                devices.get_device(device_id).inputs[devices.DATA_ID])))
+        successors = get_device_graph(devices, cut_inputs=[devices.DATA_ID])
+        rank = {device_id: position for position, device_id
+                in enumerate(self.kinds)}
+        components = []
+        for component in strongly_connected_components(list(self.kinds),
+                                                       successors):
+            component.sort(key=rank.get)
+            members = [device_id for device_id in component
+                       if devices.get_device(device_id).inputs]
+            for device_id in component:
+                if not devices.get_device(device_id).inputs:
+                    self.add_source(device_id, dict(switches), dict(clocks),
+                                    dict(rcs))
+            if members:
+                components.append(members)
+
+        for members in components:
+            device = devices.get_device(members[0])
+            if len(members) == 1 and members[0] not in [
+                    connected_output[0] for connected_output
+                    in device.inputs.values()]:
+                self.add_device(members[0], "    ")
+                continue
+            # Iterate a feedback loop until none of its outputs change
+            outputs = self.get_signal_list(
+                [self.signal_index[(device_id, output_id)]
+                 for device_id in members
+                 for output_id in devices.get_device(device_id).outputs])
+            self.add_line("for _ in range({}):".format(self.iteration_limit))
+            self.add_line("previous = ({},)".format(outputs), "        ")
+            for device_id in members:
+                self.add_device(device_id, "        ")
+            self.add_line("if ({},) == previous:".format(outputs),
+                          "        ")
+            self.add_line("break", "            ")
+            self.add_line("else:")
+            self.add_line("steady = False", "        ")
+
+        if signals:
+            self.add_line("state[:{}] = [{}]".format(
+                len(self.signal_index), signals))
+        for device_id, memory_slot in d_types:
+            self.add_line("state[{0}], state[{1}] = m{2}, c{2}".format(
+                memory_slot, memory_slot + 1, device_id))
+        self.add_line("return steady")
+
+        header = [
+            '"""Generated from a logic network by codegen.py. Do not edit."""',
+            "FINGERPRINT = {!r}".format(self.get_fingerprint()),
+            "SIGNALS = {!r}".format(list(self.signal_index)),
+            "D_TYPES = {!r}".format(d_types),
+            "SWITCHES = {!r}".format(switches),
+            "CLOCKS = {!r}".format(clocks),
+            "RCS = {!r}".format(rcs),
+            "CALLS = {!r}".format(calls),
+            "STATE_SIZE = {}".format(slot),
+            "", ""]
+        return "\n".join(header + self.lines) + "\n"
+
+    def add_line(self, line, indent="    "):
+        """Add an indented line to the step function."""
+        self.lines.append(indent + line)
+
+    def get_signal_list(self, indices):
+        """Return the variables of the signal indices, separated by commas."""
+        return ", ".join("s{}".format(index) for index in indices)
+
+    def get_signal(self, connected_output):
+        """Return the variable of the output (device_id, output_id)."""
+        return "s{}".format(self.signal_index[connected_output])
+
+    def add_source(self, device_id, switch_slots, clock_slots, rc_slots):
+        """Add the lines that update a device without inputs."""
+        devices = self.devices
+        device = devices.get_device(device_id)
+        kind = self.kinds[device_id]
+        output = self.get_signal((device_id, None))
+        name = devices.names.get_name_string(device_id)
+        if kind.kind_id == devices.SWITCH:
+            # The engine stores the setting in the state before each step
+            self.add_line("{} = state[{}]  # {}".format(
+                output, switch_slots[device_id], name))
+        elif kind.kind_id == devices.SIGGEN:
+            self.add_line("{} = {!r}[cycle % {}]  # {}".format(
+                output, tuple(device.siggen_pattern),
+                len(device.siggen_pattern), name))
+        elif kind.kind_id == devices.CLOCK:
+            self.add_line(
+                "{} = 1 if (cycle + state[{}]) % {} < {} else 0  # {}".format(
+                    output, clock_slots[device_id],
+                    2 * device.clock_half_period, device.clock_high_time,
+                    name))
+        elif kind.kind_id == devices.RC:
+            self.add_line("{} = 1 if cycle < state[{}] else 0  # {}".format(
+                output, rc_slots[device_id], name))
+        else:
+            self.add_device(device_id, "    ")
+
+    def add_device(self, device_id, indent):
+        """Add the lines that evaluate a device from its input signals."""
+        devices = self.devices
+        device = devices.get_device(device_id)
+        kind_id = self.kinds[device_id].kind_id
+        inputs = [self.get_signal(connected_output)
+                  for connected_output in device.inputs.values()]
+        name = devices.names.get_name_string(device_id)
+
+        if kind_id == devices.D_TYPE:
+            signals = dict(zip(device.inputs, inputs))
+            memory = "m{}".format(device_id)
+            clock = "c{}".format(device_id)
+            self.add_line("# {}".format(name), indent)
+            self.add_line("if not {} and {}:".format(
+                clock, signals[devices.CLK_ID]), indent)
+            self.add_line("{} = d{}".format(memory, device_id),
+                          indent + "    ")
+            self.add_line("{} = {}".format(clock, signals[devices.CLK_ID]),
+                          indent)
+            self.add_line("if {}:".format(signals[devices.SET_ID]), indent)
+            self.add_line("{} = 1".format(memory), indent + "    ")
+            self.add_line("if {}:".format(signals[devices.CLEAR_ID]), indent)
+            self.add_line("{} = 0".format(memory), indent + "    ")
+            self.add_line("{} = {}".format(self.get_signal(
+                (device_id, devices.Q_ID)), memory), indent)
+            self.add_line("{} = 1 - {}".format(self.get_signal(
+                (device_id, devices.QBAR_ID)), memory), indent)
+            return
+
+        output = self.get_signal((device_id, None))
+        if kind_id in [devices.AND, devices.NAND]:
+            expression = " & ".join(inputs)
+        elif kind_id in [devices.OR, devices.NOR]:
+            expression = " | ".join(inputs)
+        elif kind_id == devices.XOR:
+            expression = " ^ ".join(inputs)
+        elif kind_id == devices.LUT:
+            index = " | ".join(
+                [inputs[0]] + ["{} << {}".format(signal, bit)
+                               for bit, signal in enumerate(inputs) if bit])
+            expression = "{} >> ({}) & 1".format(device.lut_table, index)
+        else:
+            position = self.call_index[device_id]
+            outputs = self.get_signal_list(
+                [self.signal_index[(device_id, output_id)]
+                 for output_id in device.outputs])
+            self.add_line("{}, = calls[{}]([{}])  # {}".format(
+                outputs, position, ", ".join(inputs), name), indent)
+            return
+        if kind_id in [devices.NAND, devices.NOR]:
+            expression = "1 - ({})".format(expression)
+        self.add_line("{} = {}  # {}".format(output, expression, name),
+                      indent)
+
+
+class CompiledEngine:
+    """Execute the network with the generated step function.
+
+    The module is generated when the structure of the network changes, or
+    loaded from cache_path if that file was generated from a network with
+    the same structure. Only the signals that changed in a cycle are written
+    back to the Device objects.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    cache_path: path of the file to cache the generated module in, or None.
+    iteration_limit: number of passes through a feedback loop to wait for
+                     its signals to settle before declaring the network
+                     unstable.
+
+    Public methods
+    --------------
+    build_plan(self): Loads or generates the module for the network.
+
+    load_state(self): Reads the state list from the Device objects.
+
+    execute_network(self): Executes all the devices for one simulation
+                           cycle.
+    """
+
+    def __init__(self, devices, network, cache_path=None,
+                 iteration_limit=20):
+        """Initialise the engine. The plan is built on the first cycle."""
+        self.devices = devices
+        self.network = network
+        self.cache_path = cache_path
+        self.iteration_limit = iteration_limit
+
+        self.topology_version = None  # version the plan was built for
+        self.next_cycle = None  # cycle expected to be executed next
+        self.module = None  # generated module, None if not compiled
+        self.loaded_from_cache = False
+
+        self.state = []
+        self.synced = []  # signals in the Device objects
+        self.ports = []  # (outputs dictionary, output ID) of each signal
+        self.switches = []  # (Device, setting slot) of each switch
+        self.calls = []  # functions evaluating the devices of other kinds
+
+    def build_plan(self):
+        """Load or generate the module for the network."""
+        generator = CodeGenerator(self.devices, self.iteration_limit)
+        fingerprint = generator.get_fingerprint()
+        self.module = None
+        self.loaded_from_cache = False
+        if self.cache_path is not None and os.path.exists(self.cache_path):
+            self.module = self.import_module(fingerprint)
+            self.loaded_from_cache = self.module is not None
+
+        if self.module is None:
+            source = generator.generate()
+            if source is not None:
+                if self.cache_path is not None:
+                    self.write_module(source)
+                namespace = {"__name__": "logsim_compiled"}
+                exec(compile(source, self.cache_path or "<network>", "exec"),
+                     namespace)
+                self.module = types.SimpleNamespace(**namespace)
+
+        self.topology_version = self.devices.topology_version
+        if self.module is not None:
+            devices = self.devices
+            self.ports = [(devices.get_device(device_id).outputs, output_id)
+                          for (device_id, output_id) in self.module.SIGNALS]
+            self.switches = [(devices.get_device(device_id), slot)
+                             for device_id, slot in self.module.SWITCHES]
+            self.calls = [self.get_call(device_id)
+                          for device_id in self.module.CALLS]
+            self.load_state()
+
+    def get_call(self, device_id):
+        """Return a function evaluating a device of another kind."""
+        devices = self.devices
+        device = devices.get_device(device_id)
+        evaluate = devices.registry.get_kind(device.device_kind).evaluate
+        return lambda input_signals: evaluate(devices, device, input_signals)
+
+    def import_module(self, fingerprint):
+        """Return the module cached in the file, or None if it is invalid.
+
+        The FINGERPRINT line is read before the module is executed, so a
+        module generated from another network is never run.
+        """
+        fingerprint_line = "FINGERPRINT = {!r}\n".format(fingerprint)
+        try:
+            with open(self.cache_path) as cache_file:
+                cache_file.readline()  # docstring
+                if cache_file.readline() != fingerprint_line:
+                    return None
+        except (OSError, UnicodeDecodeError):
+            return None
+        spec = importlib.util.spec_from_file_location("logsim_compiled",
+                                                      self.cache_path)
+        module = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(module)
+        except (SyntaxError, OSError):
+            return None
+        if getattr(module, "FINGERPRINT", None) != fingerprint:
+            return None
+        return module
+
+    def write_module(self, source):
+        """Write the module to the cache file, ignoring failures."""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "w") as cache_file:
+                cache_file.write(source)
+            # The bytecode of the old module could have the same time stamp
+            bytecode_path = importlib.util.cache_from_source(self.cache_path)
+            if os.path.exists(bytecode_path):
+                os.remove(bytecode_path)
+        except OSError:
+            pass  # the module is still used, just not cached
+
+    def load_state(self):
+        """Read the state list from the Device objects."""
+        devices = self.devices
+        high = [devices.HIGH, devices.RISING]
+        self.synced = [outputs[output_id]
+                       for (outputs, output_id) in self.ports]
+        self.state = [1 if signal in high else 0 for signal in self.synced]
+        self.state.extend([0] * (self.module.STATE_SIZE - len(self.state)))
+        for device_id, slot in self.module.D_TYPES:
+            device = devices.get_device(device_id)
+            self.state[slot] = 1 if device.dtype_memory == devices.HIGH else 0
+            clock_output = device.inputs[devices.CLK_ID]
+            self.state[slot + 1] = 1 if devices.get_device(
+                clock_output[0]).outputs[clock_output[1]] in high else 0
+        for device_id, slot in self.module.CLOCKS:
+            self.state[slot] = devices.get_device(device_id).clock_phase
+        for device_id, slot in self.module.RCS:
+            self.state[slot] = devices.get_device(device_id).rc_fall_cycle
+        self.next_cycle = devices.cycle
+
+    def execute_network(self):
+        """Execute all the devices for one simulation cycle.
+
+        Return True if successful and the network does not oscillate.
+        """
+        devices = self.devices
+        network = self.network
+        if self.topology_version != devices.topology_version:
+            self.build_plan()
+        elif self.next_cycle != devices.cycle:
+            self.load_state()  # a cold start-up changed the devices
+        if self.module is None:
+            return False
+
+        for kind, device_ids in network.get_plan():
+            if kind.start_cycle is not None:
+                kind.start_cycle(network, device_ids)
+        state = self.state
+        for device, index in self.switches:
+            state[index] = device.switch_state
+        network.steady_state = self.module.step(state, devices.cycle,
+                                                self.calls)
+        network.iterations = 1
+
+        # Write the signals that changed into the Device objects
+        synced = self.synced
+        for index, (outputs, output_id) in enumerate(self.ports):
+            if state[index] != synced[index]:
+                outputs[output_id] = synced[index] = state[index]
+        for device_id, slot in self.module.D_TYPES:
+            devices.get_device(device_id).dtype_memory = state[slot]
+
+        devices.cycle += 1
+        self.next_cycle = devices.cycle
+        return network.steady_state
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""Simulate the independent parts of a network in parallel worker processes.
+
+Used in the Logic Simulator project to run large networks made of many
+unconnected blocks, such as replicated test structures. No signal passes
+between two connected components of the network, so each one can be
+simulated on its own, and the monitored signals merged back afterwards.
+
+Classes
+-------
+ComponentRunner - runs the connected components of the network in worker
+                  processes and records the monitors.
+"""
+import collections
+import copy
+import multiprocessing
+import pickle
+
+from graph import get_connected_components
+from periodic import PeriodicRunner
+
+# Network of the worker process, set up by _start_worker
+_worker = {}
+
+
+class ComponentRunner:
+    """Run the connected components of the network in worker processes.
+
+    The components are found from the inputs of the devices when the
+    network is first run, and again whenever its topology changes. They are
+    grouped into jobs of similar sizes, and each job is simulated in a
+    worker process from the current state of the network, skipping periodic
+    behaviour as PeriodicRunner does. The monitored signals of the jobs are
+    appended to the monitors in their usual order, and the final states of
+    the devices copied back, so the simulation can be continued, checkpointed
+    or run again as usual.
+
+    The state copied back holds the outputs, D-type memories and RC timers
+    of the devices, as in a checkpoint, so devices of kinds that are not
+    built in must keep no other state. If any job oscillates, the network is
+    left in the state it was in before the run.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    monitors: instance of the monitors.Monitors() class.
+    processes: number of worker processes, all the available processors by
+               default. With 1, the jobs are run in this process.
+
+    Public methods
+    --------------
+    get_components(self): Returns the connected components of the network.
+
+    get_jobs(self): Returns the device IDs simulated by each job.
+
+    run(self, cycles): Runs the network for the specified number of cycles,
+                       recording the monitors, and returns True if
+                       successful.
+    """
+
+    def __init__(self, devices, network, monitors, processes=None):
+        """Initialise the runner."""
+        self.devices = devices
+        self.network = network
+        self.monitors = monitors
+        self.processes = processes or multiprocessing.cpu_count()
+        self.skipped_cycles = 0  # not known, as each job skips its own
+
+        self.components = []
+        self.components_version = None  # topology the components are for
+
+    def get_components(self):
+        """Return the connected components of the network.
+
+        Each component is a list of device IDs, found again only if the
+        topology of the network has changed.
+        """
+        if self.components_version != self.devices.topology_version:
+            self.components = get_connected_components(self.devices)
+            self.components_version = self.devices.topology_version
+        return self.components
+
+    def get_jobs(self):
+        """Return the device IDs simulated by each job.
+
+        There are up to four jobs per process, so that the processes stay
+        busy when the components have very different sizes. The largest
+        components are given out first, each to the job with the fewest
+        devices so far.
+        """
+        components = sorted(self.get_components(), key=len, reverse=True)
+        jobs = [[] for _ in range(min(len(components), 4 * self.processes))]
+        for component in components:
+            min(jobs, key=len).extend(component)
+        positions = {device.device_id: position for position, device
+                     in enumerate(self.devices.devices_list)}
+        return [sorted(job, key=positions.get) for job in jobs]
+
+    def run(self, cycles):
+        """Run the network for the specified number of cycles.
+
+        The monitors record the signals of every cycle. Return True if
+        successful, or False if the network oscillates.
+        """
+        devices = self.devices
+        jobs = self.get_jobs()
+        if cycles == 0:
+            return True
+        network_blob = pickle.dumps((devices, self.network, self.monitors))
+        cycle_jobs = [(device_ids, cycles) for device_ids in jobs]
+        if self.processes == 1 or len(jobs) <= 1:
+            _start_worker(network_blob)
+            results = [_run_job(job) for job in cycle_jobs]
+        else:
+            with multiprocessing.Pool(self.processes,
+                                      initializer=_start_worker,
+                                      initargs=(network_blob,)) as pool:
+                results = pool.map(_run_job, cycle_jobs)
+
+        if not all(succeeded for (succeeded, *_) in results):
+            self.network.oscillating_loops = [
+                loop for (succeeded, _, _, loops) in results
+                if not succeeded for loop in loops]
+            return False
+
+        for (_, traces, states, _) in results:
+            for monitor, signal_list in traces.items():
+                self.monitors.monitors_dictionary[monitor].extend(signal_list)
+            for device_id, outputs, dtype_memory, rc_fall_cycle in states:
+                device = devices.get_device(device_id)
+                device.outputs.update(outputs)
+                device.dtype_memory = dtype_memory
+                device.rc_fall_cycle = rc_fall_cycle
+        devices.cycle += cycles
+        devices.reschedule_timers()
+        if self.network.engine is not None:
+            self.network.engine.next_cycle = None  # reload the new state
+        return True
+
+
+def _start_worker(network_blob):
+    """Unpack the network in the worker process."""
+    (devices, network, monitors) = pickle.loads(network_blob)
+    _worker["devices"] = devices
+    _worker["network"] = network
+    _worker["monitors"] = monitors
+
+
+def _make_part(device_ids):
+    """Return a network and monitors holding only the given devices.
+
+    The devices are shared with the whole network of the worker, which is
+    safe as long as the parts made from it do not overlap.
+    """
+    devices = copy.copy(_worker["devices"])
+    devices.devices_list = [devices.get_device(device_id)
+                            for device_id in device_ids]
+    devices.devices_dictionary = {device.device_id: device
+                                  for device in devices.devices_list}
+    devices.reschedule_timers()
+
+    network = copy.copy(_worker["network"])
+    network.devices = devices
+    network.plan_version = None  # the plan is for the whole network
+    engine = network.engine
+    if engine is not None:
+        network.set_engine(type(engine)(
+            devices, network, iteration_limit=engine.iteration_limit))
+
+    monitors = copy.copy(_worker["monitors"])
+    monitors.devices = devices
+    monitors.network = network
+    monitors.monitors_dictionary = collections.OrderedDict(
+        (monitor, []) for monitor in _worker["monitors"].monitors_dictionary
+        if monitor[0] in devices.devices_dictionary)
+    return devices, network, monitors
+
+
+def _run_job(job):
+    """Run one part of the network in the worker and return its results.
+
+    Return whether it succeeded, the monitored signals of the part, the
+    final state of its devices and the loops that oscillated.
+    """
+    (device_ids, cycles) = job
+    devices, network, monitors = _make_part(device_ids)
+    if not PeriodicRunner(devices, network, monitors).run(cycles):
+        return (False, None, None, network.oscillating_loops)
+    states = [(device.device_id, device.outputs, device.dtype_memory,
+               device.rc_fall_cycle) for device in devices.devices_list]
+    return (True, dict(monitors.monitors_dictionary), states, [])
@@ -0,0 +1,114 @@
+"""Find the part of the network that the monitored signals depend on.
+
+Used in the Logic Simulator project to simulate only the devices that can
+affect a monitor, when a few signals of a large network are monitored.
+
+Classes
+-------
+ConeOfInfluence - keeps the fan-in cone of the monitored devices up to date.
+"""
+from graph import get_fan_in_cone
+
+
+class ConeOfInfluence:
+    """Keep the fan-in cone of the monitored devices up to date.
+
+    The cone holds every monitored device and every device that drives one
+    of them, directly or through other devices, including D-types that feed
+    back through their DATA inputs. Each device in the cone counts the
+    monitored devices whose own cone holds it. Adding a monitor only visits
+    the cone of its device, and removing the last monitor of a device
+    visits the same cone again to take it away, so the cones of the other
+    monitors are not found again. The whole cone is found again if the
+    topology of the network changes.
+
+    Set with Monitors.set_cone and Network.set_cone, the default sweep of
+    the network only executes the devices in the cone. The devices outside
+    it keep their state until a monitor brings them back into the cone.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    monitors: instance of the monitors.Monitors() class.
+
+    Public methods
+    --------------
+    update(self): Finds the cone of all the monitors again.
+
+    count_cone(self, device_id, step): Adds step to the count of every
+                                       device in the cone of a device.
+
+    add_monitor(self, device_id, output_id): Adds the cone of a new monitor.
+
+    remove_monitor(self, device_id, output_id): Takes away the cone of a
+                                                removed monitor.
+
+    get_devices(self): Returns the IDs of the devices in the cone.
+    """
+
+    def __init__(self, devices, monitors):
+        """Find the cone of the current monitors."""
+        self.devices = devices
+        self.monitors = monitors
+
+        self.roots = {}  # stores {device_id: number of monitored outputs}
+        self.counts = {}  # stores {device_id: monitored devices it drives}
+        self.topology_version = None  # version the counts were found for
+        self.version = 0  # incremented whenever the cone changes
+        self.update()
+
+    def update(self):
+        """Find the cone of all the monitors again."""
+        self.roots = {}
+        self.counts = {}
+        for (device_id, output_id) in self.monitors.monitors_dictionary:
+            self.roots[device_id] = self.roots.get(device_id, 0) + 1
+        for device_id in self.roots:
+            self.count_cone(device_id, 1)
+        self.topology_version = self.devices.topology_version
+        self.version += 1
+
+    def count_cone(self, device_id, step):
+        """Add step to the count of every device in the cone of a device.
+
+        Devices whose count falls to zero leave the cone.
+        """
+        for member in get_fan_in_cone(self.devices, [device_id]):
+            count = self.counts.get(member, 0) + step
+            if count:
+                self.counts[member] = count
+            else:
+                del self.counts[member]
+
+    def add_monitor(self, device_id, output_id):
+        """Add the cone of a new monitor.
+
+        Called once the monitor is in the monitors dictionary.
+        """
+        if self.topology_version != self.devices.topology_version:
+            self.update()
+            return
+        self.roots[device_id] = self.roots.get(device_id, 0) + 1
+        if self.roots[device_id] == 1:
+            self.count_cone(device_id, 1)
+            self.version += 1
+
+    def remove_monitor(self, device_id, output_id):
+        """Take away the cone of a removed monitor.
+
+        Called once the monitor has left the monitors dictionary.
+        """
+        if self.topology_version != self.devices.topology_version:
+            self.update()
+            return
+        self.roots[device_id] -= 1
+        if not self.roots[device_id]:
+            del self.roots[device_id]
+            self.count_cone(device_id, -1)
+            self.version += 1
+
+    def get_devices(self):
+        """Return a set-like view of the IDs of the devices in the cone."""
+        if self.topology_version != self.devices.topology_version:
+            self.update()
+        return self.counts.keys()
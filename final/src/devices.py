@@ -8,8 +8,13 @@ Classes
 Device - stores device properties.
 Devices - makes and stores all the devices in the logic network.
 """
+import collections
+import heapq
+import itertools
 import random
 
+from registry import DeviceRegistry, builtin_kinds
+
 
 class Device:
     """Store device properties.
@@ -36,11 +41,18 @@ class Device:
 
         self.device_kind = None
         self.clock_half_period = None
-        self.clock_counter = None
+        self.clock_high_time = None
+        self.clock_phase = None
+        self.clock_random_phase = None
+        self.clock_next_edge = None
         self.rc_time = None
-        self.rc_counter = None
+        self.rc_fall_cycle = None
         self.switch_state = None
         self.dtype_memory = None
+        self.lut_table = None
+        self.siggen_pattern = None
+        self.delay = None  # propagation delay, the kind's by default
+        self.constant = False  # True for a switch that is never set
 
 
 class Devices:
@@ -55,6 +67,9 @@ class Devices:
 
     Public methods
     --------------
+    register_kind(self, kind): Adds a device kind to the registry and returns
+                               its kind ID.
+
     get_device(self, device_id): Returns the Device object corresponding
                                  to the device ID.
 
@@ -64,6 +79,18 @@ class Devices:
     add_device(self, device_id, device_kind): Adds the specified device to the
                                               network.
 
+    remove_device(self, device_id): Removes the specified device from the
+                                    network.
+
+    record_edit(self, edit_kind, device_id, input_id=None, signal=None):
+                Records a change to the topology and increments its version.
+
+    get_edits(self, version): Returns the edits made since the given
+                              topology version.
+
+    get_gate_input_ids(self, no_of_inputs): Returns the IDs of the gate input
+                                            names "I1" to "In".
+
     add_input(self, device_id, input_id): Adds the specified input to the
                                           specified device.
 
@@ -76,22 +103,57 @@ class Devices:
     get_signal_ids(self, signal_name): Returns the device and output IDs of
                                        the specified signal.
 
+    add_alias(self, signal, equivalent): Makes a removed signal stand for an
+                                         equivalent signal.
+
+    resolve_signal(self, device_id, output_id): Returns the device and output
+                                                IDs that a signal stands for.
+
     set_switch(self, device_id, signal): Sets switch_state of specified device
                                          to signal.
 
+    set_constant(self, device_id): Marks a switch as constant.
+
     make_switch(self, device_id, initial_state): Makes a switch device and sets
                                                  its initial state.
 
-    make_clock(self, device_id, clock_half_period): Makes a clock device with
-                                                    the specified half period.
+    make_clock(self, device_id, clock_half_period, clock_high_time=None,
+               clock_phase=None): Makes a clock device with the specified
+                                  half period, duty cycle and phase.
+
+    get_clock_signal(self, device_id, cycle): Returns the level of the clock
+                                              in the given cycle.
+
+    get_next_clock_edge(self, device_id, cycle): Returns the first cycle after
+                                                 the given cycle in which the
+                                                 clock changes level.
+
+    schedule_clock(self, device, cycle): Queues the first edge of the clock
+                                         after the given cycle.
+
+    make_siggen(self, device_id, pattern): Makes a signal generator device
+                                           with the specified bit pattern.
 
     make_gate(self, device_id, device_kind, no_of_inputs): Makes logic gates
                                         with the specified number of inputs.
 
     make_d_type(self, device_id): Makes a D-type device.
 
+    make_lut(self, device_id, no_of_inputs, table): Makes a look-up table
+                                                   device.
+
+    cold_start_d_type(self, device): Sets the D-type memory to a random state.
+
+    cold_start_clock(self, device): Sets the clock to a random point in its
+                                    cycle.
+
+    cold_start_rc(self, device): Restarts the charging of the RC device.
+
     cold_startup(self): Simulates cold start-up of D-types and clocks.
 
+    reschedule_timers(self): Queues the next clock edges and RC timers from
+                             the current cycle.
+
     make_device(self, device_id, device_kind, device_property=None): Creates
                        the specified device and returns errors if unsuccessful.
 
@@ -103,6 +165,16 @@ class Devices:
         self.names = names
 
         self.devices_list = []
+        self.devices_dictionary = {}  # stores {device_id: Device}
+        # Incremented whenever devices, ports or connections change
+        self.topology_version = 0
+        # The latest edits as (topology_version, edit kind, device_id,
+        # input_id, signal), so plans can be updated rather than rebuilt
+        self.topology_edits = collections.deque(maxlen=4096)
+        self.edit_kinds = [self.DEVICE_ADDED, self.DEVICE_REMOVED,
+                           self.PORT_ADDED, self.CONNECTION_MADE,
+                           self.CONNECTION_REMOVED,
+                           self.DEVICE_CHANGED] = range(6)
 
         gate_strings = ["AND", "OR", "NAND", "NOR", "XOR"]
         device_strings = ["CLOCK", "SWITCH", "DTYPE", "RC"] #Addon
@@ -114,7 +186,8 @@ class Devices:
          self.DEVICE_PRESENT] = self.names.unique_error_codes(6)
 
         self.signal_types = [self.LOW, self.HIGH, self.RISING,
-                             self.FALLING, self.BLANK] = range(5)
+                             self.FALLING, self.BLANK,
+                             self.UNKNOWN] = range(6)
         self.gate_types = [self.AND, self.OR, self.NAND, self.NOR,
                            self.XOR] = self.names.lookup(gate_strings)
         self.device_types = [
@@ -128,15 +201,41 @@ class Devices:
         self.dtype_output_ids = [
             self.Q_ID, self.QBAR_ID
         ] = self.names.lookup(dtype_outputs)
+        [self.LUT, self.SIGGEN] = self.names.lookup(["LUT", "SIGGEN"])
+
+        # Registry of the device kinds, in the order they are executed
+        self.registry = DeviceRegistry(self.names)
+        for kind in builtin_kinds():
+            self.register_kind(kind)
+
+        self.max_gate_inputs = 4096
+        self.max_lut_inputs = 16
+
+        # Number of simulation cycles completed since the cold start-up
+        self.cycle = 0
+
+        # Heap of (fall_cycle, device_id) timers of the charging RC devices
+        self.rc_schedule = []
+        # Heap of (edge_cycle, device_id) of the next edge of each clock
+        self.clock_schedule = []
 
-        self.max_gate_inputs = 16
+        # IDs of the gate input names "I1", "I2", ... interned so far
+        self.gate_input_ids = []
+
+        # Signals removed by optimisation, as {(device_id, output_id):
+        # (device_id, output_id) of an equivalent signal}
+        self.signal_aliases = {}
+
+    def register_kind(self, kind):
+        """Add a device kind to the registry and return its kind ID.
+
+        kind is an instance of the registry.DeviceKind() class.
+        """
+        return self.registry.register(kind)
 
     def get_device(self, device_id):
         """Return the Device object corresponding to device_id."""
-        for device in self.devices_list:
-            if device.device_id == device_id:
-                return device
-        return None
+        return self.devices_dictionary.get(device_id)
 
     def find_devices(self, device_kind=None):
         """Return a list of device IDs of the specified device_kind.
@@ -157,6 +256,66 @@ class Devices:
         new_device = Device(device_id)
         new_device.device_kind = device_kind
         self.devices_list.append(new_device)
+        self.devices_dictionary[device_id] = new_device
+        self.record_edit(self.DEVICE_ADDED, device_id)
+
+    def remove_device(self, device_id):
+        """Remove the specified device from the network.
+
+        Its inputs are recorded as disconnected first. The inputs it drives
+        must be disconnected before.
+        """
+        device = self.devices_dictionary.pop(device_id)
+        self.devices_list.remove(device)
+        for input_id, connected_output in device.inputs.items():
+            if connected_output is not None:
+                self.record_edit(self.CONNECTION_REMOVED, device_id,
+                                 input_id, connected_output)
+        self.record_edit(self.DEVICE_REMOVED, device_id)
+
+    def record_edit(self, edit_kind, device_id, input_id=None, signal=None):
+        """Record a change to the topology and increment its version.
+
+        edit_kind is one of edit_kinds. For connections, signal is the
+        (device_id, output_id) connected to or disconnected from the input.
+        DEVICE_CHANGED records a device whose kind was changed in place.
+        """
+        self.topology_version += 1
+        self.topology_edits.append((self.topology_version, edit_kind,
+                                    device_id, input_id, signal))
+
+    def get_edits(self, version):
+        """Return the edits made since the given topology version, in order.
+
+        Each edit is a tuple (edit kind, device_id, input_id, signal). Return
+        None if some of the changes since then were not recorded, so the
+        plans that depend on the topology must be rebuilt.
+        """
+        if version is None:
+            return None
+        count = self.topology_version - version
+        if count == 0:
+            return []
+        if count < 0 or count > len(self.topology_edits):
+            return None
+        edits = list(itertools.islice(self.topology_edits,
+                                      len(self.topology_edits) - count,
+                                      None))
+        if edits[0][0] != version + 1:  # a change was not recorded
+            return None
+        return [edit[1:] for edit in edits]
+
+    def get_gate_input_ids(self, no_of_inputs):
+        """Return the IDs of the gate input names "I1" to "In".
+
+        The names are interned once, so wide gates do not look up thousands
+        of names one at a time.
+        """
+        if no_of_inputs > len(self.gate_input_ids):
+            self.gate_input_ids.extend(self.names.lookup([
+                "".join(["I", str(input_number)]) for input_number in
+                range(len(self.gate_input_ids) + 1, no_of_inputs + 1)]))
+        return self.gate_input_ids[:no_of_inputs]
 
     def add_input(self, device_id, input_id):
         """Add the specified input to the specified device.
@@ -166,6 +325,7 @@ class Devices:
         device = self.get_device(device_id)
         if device is not None:
             device.inputs.setdefault(input_id)
+            self.record_edit(self.PORT_ADDED, device_id, input_id)
             return True
         else:
             return False
@@ -178,6 +338,7 @@ class Devices:
         device = self.get_device(device_id)
         if device is not None:
             device.outputs[output_id] = signal
+            self.record_edit(self.PORT_ADDED, device_id)
             return True
         else:
             return False
@@ -185,9 +346,12 @@ class Devices:
     def get_signal_name(self, device_id, port_id):
         """Return the name string of the specified signal.
 
-        The signal is specified by its device_id and port_id. Return None if
-        either ID is invalid.
+        The signal is specified by its device_id and port_id. A signal
+        removed by optimisation is named after its equivalent signal. Return
+        None if either ID is invalid.
         """
+        if self.get_device(device_id) is None:
+            [device_id, port_id] = self.resolve_signal(device_id, port_id)
         device = self.get_device(device_id)
         if device is not None:
             device_name = self.names.get_name_string(device_id)
@@ -204,7 +368,11 @@ class Devices:
             return None
 
     def get_signal_ids(self, signal_name):
-        """Return the device and output IDs of the specified signal."""
+        """Return the device and output IDs of the specified signal.
+
+        A signal removed by optimisation gives the IDs of its equivalent
+        signal.
+        """
         name_string_list = signal_name.split(".")
         name_id_list = self.names.lookup(name_string_list)
         device_id = name_id_list[0]
@@ -213,7 +381,25 @@ class Devices:
         else:
             output_id = None
 
-        return [device_id, output_id]
+        return self.resolve_signal(device_id, output_id)
+
+    def add_alias(self, signal, equivalent):
+        """Make a removed signal stand for an equivalent signal.
+
+        Both signals are (device_id, output_id) pairs.
+        """
+        self.signal_aliases[signal] = equivalent
+
+    def resolve_signal(self, device_id, output_id):
+        """Return the device and output IDs that a signal stands for.
+
+        The IDs are returned unchanged unless the signal has been removed by
+        optimisation.
+        """
+        signal = (device_id, output_id)
+        while signal in self.signal_aliases:
+            signal = self.signal_aliases[signal]
+        return list(signal)
 
     def set_switch(self, device_id, signal):
         """Set the switch state of the specified device to signal.
@@ -223,12 +409,23 @@ class Devices:
         device = self.get_device(device_id)
         if device is None:
             return False
-        elif device.device_kind != self.SWITCH:
+        elif device.device_kind != self.SWITCH or device.constant:
             return False
         else:
             device.switch_state = signal
             return True
 
+    def set_constant(self, device_id):
+        """Mark the specified switch as constant, so it cannot be set.
+
+        Return True if successful.
+        """
+        device = self.get_device(device_id)
+        if device is None or device.device_kind != self.SWITCH:
+            return False
+        device.constant = True
+        return True
+
     def make_switch(self, device_id, initial_state):
         """Make a switch device and set its initial state."""
         self.add_device(device_id, self.SWITCH)
@@ -240,33 +437,80 @@ class Devices:
         self.add_device(device_id, self.RC)
         device = self.get_device(device_id)
         device.rc_time = rising_time
-        device.rc_counter = 1
-        self.add_output(
-            device_id,
-            output_id=None,
-            signal = self.HIGH
-        )
-
-    def make_clock(self, device_id, clock_half_period):
+        self.add_output(device_id, output_id=None)
+        self.cold_start_rc(device)
+
+    def make_clock(self, device_id, clock_half_period, clock_high_time=None,
+                   clock_phase=None):
         """Make a clock device with the specified half period.
 
-        clock_half_period is an integer > 0. It is the number of simulation
-        cycles before the clock switches state.
+        clock_half_period is an integer > 0, so the period of the clock is
+        2 * clock_half_period cycles. clock_high_time is the number of cycles
+        in each period for which the clock is HIGH, clock_half_period by
+        default. clock_phase is the number of cycles of its period that the
+        clock has already completed at cycle 0. If no phase is given, the
+        clock begins from a random point in its cycle on cold start-up.
         """
         self.add_device(device_id, self.CLOCK)
         device = self.get_device(device_id)
         device.clock_half_period = clock_half_period
-        self.cold_startup()  # clock initialised to a random point in its cycle
+        if clock_high_time is None:
+            clock_high_time = clock_half_period
+        device.clock_high_time = clock_high_time
+        device.clock_phase = clock_phase
+        device.clock_random_phase = clock_phase is None
+        self.add_output(device_id, output_id=None)
+        # Clock initialised to a random point in its cycle
+        self.cold_start_clock(device)
+
+    def get_clock_signal(self, device_id, cycle):
+        """Return the level of the clock in the given cycle.
+
+        The level is computed from the cycle number, so the value of the
+        clock in any past or future cycle is known.
+        """
+        device = self.get_device(device_id)
+        position = (cycle + device.clock_phase) % (
+            2 * device.clock_half_period)
+        if position < device.clock_high_time:
+            return self.HIGH
+        return self.LOW
+
+    def get_next_clock_edge(self, device_id, cycle):
+        """Return the first cycle after cycle in which the clock changes."""
+        device = self.get_device(device_id)
+        period = 2 * device.clock_half_period
+        position = (cycle + device.clock_phase) % period
+        if position < device.clock_high_time:
+            return cycle + device.clock_high_time - position  # falling edge
+        return cycle + period - position  # rising edge
+
+    def schedule_clock(self, device, cycle):
+        """Queue the first edge of the clock after the given cycle."""
+        device.clock_next_edge = self.get_next_clock_edge(device.device_id,
+                                                          cycle)
+        heapq.heappush(self.clock_schedule,
+                       (device.clock_next_edge, device.device_id))
+
+    def make_siggen(self, device_id, pattern):
+        """Make a signal generator device with the specified bit pattern.
+
+        pattern is a sequence of 0s and 1s. The output of the signal generator
+        in simulation cycle n is pattern[n % len(pattern)].
+        """
+        self.add_device(device_id, self.SIGGEN)
+        self.add_output(device_id, output_id=None)
+        device = self.get_device(device_id)
+        device.siggen_pattern = [self.HIGH if int(bit) else self.LOW
+                                 for bit in pattern]
 
     def make_gate(self, device_id, device_kind, no_of_inputs):
         """Make logic gates with the specified number of inputs."""
         self.add_device(device_id, device_kind)
         self.add_output(device_id, output_id=None)
 
-        for input_number in range(1, no_of_inputs + 1):
-            input_name = "".join(["I", str(input_number)])
-            [input_id] = self.names.lookup([input_name])
-            self.add_input(device_id, input_id)
+        device = self.get_device(device_id)
+        device.inputs = dict.fromkeys(self.get_gate_input_ids(no_of_inputs))
 
     def make_d_type(self, device_id):
         """Make a D-type device."""
@@ -275,94 +519,99 @@ class Devices:
             self.add_input(device_id, input_id)
         for output_id in self.dtype_output_ids:
             self.add_output(device_id, output_id)
-        self.cold_startup()  # D-type initialised to a random state
+        # D-type initialised to a random state
+        self.cold_start_d_type(self.get_device(device_id))
+
+    def make_lut(self, device_id, no_of_inputs, table):
+        """Make a look-up table device with the specified truth table.
+
+        Bit i of table is the output when the inputs, read as a binary number
+        with I1 as the least significant bit, are equal to i.
+        """
+        self.make_gate(device_id, self.LUT, no_of_inputs)
+        device = self.get_device(device_id)
+        device.lut_table = table
+
+    def cold_start_d_type(self, device):
+        """Set the memory of the D-type to a random state."""
+        device.dtype_memory = random.choice([self.LOW, self.HIGH])
+
+    def cold_start_clock(self, device):
+        """Make the clock begin from a random point in its cycle.
+
+        Clocks with a given phase always begin from the same point. The output
+        is the level of the clock before the first cycle, and its first edge
+        is queued.
+        """
+        if device.clock_random_phase:
+            device.clock_phase = random.randrange(
+                2 * device.clock_half_period)
+        device.outputs[None] = self.get_clock_signal(device.device_id,
+                                                     self.cycle - 1)
+        self.schedule_clock(device, self.cycle - 1)
+
+    def cold_start_rc(self, device):
+        """Restart the charging of the RC device.
+
+        The output is HIGH until cycle rc_time, counting the current cycle as
+        cycle 1, when a one-shot timer sets it to LOW.
+        """
+        device.rc_fall_cycle = self.cycle + device.rc_time - 1
+        device.outputs[None] = self.HIGH
+        heapq.heappush(self.rc_schedule,
+                       (device.rc_fall_cycle, device.device_id))
 
     def cold_startup(self):
         """Simulate cold start-up of D-types and clocks.
 
-        Set the memory of the D-types to a random state and make the clocks
-        begin from a random point in their cycles.
+        Each device kind in the registry sets the initial state of its
+        devices, e.g. the memory of the D-types is set to a random state and
+        the clocks begin from a random point in their cycles.
         """
+        self.cycle = 0
+        self.rc_schedule = []
+        self.clock_schedule = []
         for device in self.devices_list:
-            if device.device_kind == self.D_TYPE:
-                device.dtype_memory = random.choice([self.LOW, self.HIGH])
-
-            elif device.device_kind == self.CLOCK:
-                clock_signal = random.choice([self.LOW, self.HIGH])
-                self.add_output(device.device_id, output_id=None,
-                                signal=clock_signal)
-                # Initialise it to a random point in its cycle.
-                device.clock_counter = \
-                    random.randrange(device.clock_half_period)
-            elif device.device_kind == self.RC:
-                device.rc_counter = 1
-                device.outputs[None] = self.HIGH
+            kind = self.registry.get_kind(device.device_kind)
+            if kind is not None and kind.cold_start is not None:
+                kind.cold_start(self, device)
+
+    def reschedule_timers(self):
+        """Queue the next clock edges and RC timers from the current cycle.
+
+        Used when the state of the devices is set directly, such as from a
+        checkpoint, rather than by simulating up to the current cycle.
+        """
+        self.clock_schedule = []
+        self.rc_schedule = []
+        for device in self.devices_list:
+            if device.clock_half_period is not None:
+                self.schedule_clock(device, self.cycle - 1)
+            if (device.rc_fall_cycle is not None
+                    and device.rc_fall_cycle >= self.cycle):
+                heapq.heappush(self.rc_schedule,
+                               (device.rc_fall_cycle, device.device_id))
 
     def make_device(self, device_id, device_kind, device_property=None):
         """Create the specified device.
 
-        Return self.NO_ERROR if successful. Return corresponding error if not.
+        The device property is checked and the device is made by the device
+        kind in the registry. Return self.NO_ERROR if successful. Return
+        corresponding error if not.
         """
+        kind = self.registry.get_kind(device_kind)
+
         # Device has already been added to the devices_list
         if self.get_device(device_id) is not None:
             error_type = self.DEVICE_PRESENT
 
-        elif device_kind == self.SWITCH:
-            # Device property is the switch initial state: 0(LOW) or 1(HIGH)
-            if device_property is None:
-                error_type = self.NO_QUALIFIER
-            elif device_property not in [self.LOW, self.HIGH]:
-                error_type = self.INVALID_QUALIFIER
-            else:
-                self.make_switch(device_id, device_property)
-                error_type = self.NO_ERROR
-
-        elif device_kind == self.CLOCK:
-            # Device property is the clock half period > 0
-            if device_property is None:
-                error_type = self.NO_QUALIFIER
-            elif device_property <= 0:
-                error_type = self.INVALID_QUALIFIER
-            else:
-                self.make_clock(device_id, device_property)
-                error_type = self.NO_ERROR
-
-        elif device_kind == self.RC:
-            # Device property is the number of clock cycles
-            if device_property is None:
-                error_type = self.NO_QUALIFIER
-            elif device_property <= 0:
-                error_type = self.INVALID_QUALIFIER
-            else:
-                self.make_rc( device_id, device_property )
-                error_type = self.NO_ERROR
-
-        elif device_kind in self.gate_types:
-            # Device property is the number of inputs
-            if device_kind == self.XOR:
-                if device_property is not None:
-                    error_type = self.QUALIFIER_PRESENT
-                else:
-                    self.make_gate(device_id, device_kind, 2)
-                    error_type = self.NO_ERROR
-            else:  # other gates
-                if device_property is None:
-                    error_type = self.NO_QUALIFIER
-                elif device_property not in range(1, 17):  # between 1 and 16
-                    error_type = self.INVALID_QUALIFIER
-                else:
-                    self.make_gate(device_id, device_kind, device_property)
-                    error_type = self.NO_ERROR
-
-        elif device_kind == self.D_TYPE:
-            if device_property is not None:
-                error_type = self.QUALIFIER_PRESENT
-            else:
-                self.make_d_type(device_id)
-                error_type = self.NO_ERROR
+        elif kind is None:
+            error_type = self.BAD_DEVICE
 
         else:
-            error_type = self.BAD_DEVICE
+            error_type = kind.validate(self, device_property)
+            if error_type == self.NO_ERROR:
+                kind.make(self, device_id, device_property)
 
         return error_type
 
@@ -370,11 +619,19 @@ class Devices:
         """Return the property of the specified device."""
         device = self.get_device(device_id)
         if device.clock_half_period is not None:
-            return device.clock_half_period
+            if (device.clock_random_phase and device.clock_high_time
+                    == device.clock_half_period):
+                return device.clock_half_period
+            return (device.clock_half_period, device.clock_high_time,
+                    device.clock_phase)
         elif device.rc_time is not None:
             return device.rc_time
         elif device.switch_state is not None:
             return device.switch_state
         elif device.dtype_memory is not None:
             return device.dtype_memory
+        elif device.lut_table is not None:
+            return (len(device.inputs), device.lut_table)
+        elif device.siggen_pattern is not None:
+            return "".join(str(bit) for bit in device.siggen_pattern)
         return None
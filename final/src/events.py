@@ -0,0 +1,289 @@
+"""Execute the network by following signal events.
+
+Used in the Logic Simulator project to simulate only the devices whose inputs
+have changed, instead of every device in every iteration.
+
+Classes
+-------
+EventEngine - executes the devices whose inputs have changed.
+"""
+import bisect
+import heapq
+
+
+class EventEngine:
+    """Execute the devices whose inputs have changed.
+
+    The devices are executed in rounds, which are the iterations of the
+    default sweep in Network.execute_network, and in the same order within a
+    round. A device is only executed if one of its inputs has changed, its
+    own output is still RISING or FALLING, or its kind can change in every
+    cycle, such as switches. Executing any other device would leave its
+    outputs unchanged, so the traces are the same as with the sweep, while
+    the quiet parts of the network cost nothing.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    iteration_limit: number of rounds to wait for the signals to settle
+                     before declaring the network unstable.
+
+    Public methods
+    --------------
+    build_plan(self): Builds the fan-out lists and the execution order.
+
+    update_plan(self): Updates the plan with the topology edits.
+
+    add_to_plan(self, device_id): Adds a new device to the plan.
+
+    remove_from_plan(self, device_id): Removes a device from the plan.
+
+    update_fanout(self, driver_id, device_id): Makes the fan-out lists match
+                                the connections from one device to another.
+
+    execute_network(self): Executes the active devices for one simulation
+                           cycle.
+    """
+
+    def __init__(self, devices, network, iteration_limit=20):
+        """Initialise the engine. The plan is built on the first cycle."""
+        self.devices = devices
+        self.network = network
+        self.iteration_limit = iteration_limit
+
+        self.topology_version = None  # version the plan was built for
+        self.kind_devices = []  # (kind, device IDs) in execution order
+        self.order = []  # (kind, device_id) in execution order, or None
+        self.rank = {}  # stores {device_id: position in self.order}
+        # stores {kind_id: [next free position, end of the kind's positions]}
+        self.regions = {}
+        self.fanout = {}  # stores {position: positions of driven devices}
+        self.every_cycle = []  # positions of devices executed every cycle
+
+        self.pending = set()  # positions still to execute in the next cycle
+        self.next_cycle = None  # cycle expected to be executed next
+        self.executions = 0  # number of devices executed so far
+
+    def build_plan(self):
+        """Build the fan-out lists and the execution order of the devices.
+
+        All the devices are executed in the next cycle, since their outputs
+        may not match their inputs yet. Spare positions are left after the
+        devices of each kind, for devices added later.
+        """
+        self.kind_devices = []
+        self.order = []
+        self.rank = {}
+        self.regions = {}
+        for kind in self.devices.registry.kinds:
+            device_ids = self.devices.find_devices(kind.kind_id)
+            if device_ids:
+                self.kind_devices.append((kind, device_ids))
+            for device_id in device_ids:
+                self.rank[device_id] = len(self.order)
+                self.order.append((kind, device_id))
+            spare = len(device_ids) // 4 + 8
+            self.regions[kind.kind_id] = [len(self.order),
+                                          len(self.order) + spare]
+            self.order.extend([None] * spare)
+
+        self.fanout = {position: set() for position in range(len(self.order))}
+        for device_id, position in self.rank.items():
+            device = self.devices.get_device(device_id)
+            for connected_output in device.inputs.values():
+                if (connected_output is not None
+                        and connected_output[0] in self.rank):
+                    self.fanout[self.rank[connected_output[0]]].add(position)
+        self.fanout = {position: sorted(targets)
+                       for position, targets in self.fanout.items()}
+
+        self.every_cycle = [position for position in self.rank.values()
+                            if self.order[position][0].every_cycle]
+        self.pending = set(self.rank.values())
+        self.topology_version = self.devices.topology_version
+
+    def update_plan(self):
+        """Update the plan with the topology edits.
+
+        The devices and connections added or removed since the plan was
+        built are patched into it, and the devices whose inputs changed are
+        executed in the next cycle, so the state of the other devices is
+        kept. The plan is rebuilt instead if some edits were not recorded,
+        a device changed kind, or there is no spare position for a new
+        device.
+        """
+        devices = self.devices
+        edits = devices.get_edits(self.topology_version)
+        if edits is None:
+            self.build_plan()
+            return
+        for (edit_kind, device_id, input_id, signal) in edits:
+            if edit_kind == devices.DEVICE_ADDED:
+                if not self.add_to_plan(device_id):
+                    self.build_plan()
+                    return
+            elif edit_kind == devices.DEVICE_REMOVED:
+                self.remove_from_plan(device_id)
+            elif edit_kind == devices.DEVICE_CHANGED:
+                self.build_plan()  # the device moves to another kind
+                return
+            elif edit_kind in [devices.CONNECTION_MADE,
+                               devices.CONNECTION_REMOVED]:
+                self.update_fanout(signal[0], device_id)
+                if device_id in self.rank:
+                    self.pending.add(self.rank[device_id])
+        self.topology_version = devices.topology_version
+
+    def add_to_plan(self, device_id):
+        """Add a new device to the plan, to be executed in the next cycle.
+
+        The device takes the next spare position of its kind. Return False
+        if there is no spare position.
+        """
+        device = self.devices.get_device(device_id)
+        if device is None or device_id in self.rank:
+            return True  # removed again, or added twice by a reused ID
+        region = self.regions.get(device.device_kind)
+        if region is None or region[0] == region[1]:
+            return False
+        position = region[0]
+        region[0] += 1
+        kind = self.devices.registry.get_kind(device.device_kind)
+        self.order[position] = (kind, device_id)
+        self.rank[device_id] = position
+        if kind.every_cycle:
+            self.every_cycle.append(position)
+        self.pending.add(position)
+        for index, (plan_kind, device_ids) in enumerate(self.kind_devices):
+            if plan_kind is kind:
+                device_ids.append(device_id)
+                return True
+            if self.rank[device_ids[0]] > position:
+                break
+        else:
+            index = len(self.kind_devices)
+        self.kind_devices.insert(index, (kind, [device_id]))
+        return True
+
+    def remove_from_plan(self, device_id):
+        """Remove a device from the plan.
+
+        Its position is left empty until the plan is rebuilt.
+        """
+        position = self.rank.pop(device_id, None)
+        if position is None:
+            return
+        kind, device_id = self.order[position]
+        self.order[position] = None
+        self.fanout[position] = []
+        self.pending.discard(position)
+        if kind.every_cycle:
+            self.every_cycle.remove(position)
+        for index, (plan_kind, device_ids) in enumerate(self.kind_devices):
+            if plan_kind is kind:
+                device_ids.remove(device_id)
+                if not device_ids:
+                    del self.kind_devices[index]
+                return
+
+    def update_fanout(self, driver_id, device_id):
+        """Make the fan-out lists match the connections between two devices.
+
+        The device is in the fan-out of the driver if any of its inputs is
+        connected to one of the driver's outputs.
+        """
+        source = self.rank.get(driver_id)
+        target = self.rank.get(device_id)
+        if source is None or target is None:
+            return
+        device = self.devices.get_device(device_id)
+        connected = device is not None and any(
+            connected_output is not None and connected_output[0] == driver_id
+            for connected_output in device.inputs.values())
+        targets = self.fanout[source]
+        index = bisect.bisect_left(targets, target)
+        present = index < len(targets) and targets[index] == target
+        if connected and not present:
+            targets.insert(index, target)
+        elif present and not connected:
+            del targets[index]
+
+    def execute_network(self):
+        """Execute the active devices for one simulation cycle.
+
+        Return True if successful and the network does not oscillate.
+        """
+        if self.topology_version != self.devices.topology_version:
+            self.update_plan()
+        if self.next_cycle != self.devices.cycle:
+            # A cold start-up changed the state of the devices
+            self.pending = set(self.rank.values())
+        network = self.network
+
+        # Devices that change without any input changing
+        agenda = self.pending | set(self.every_cycle)
+        for kind, device_ids in self.kind_devices:
+            if kind.start_cycle is not None:
+                changed_ids = kind.start_cycle(network, device_ids)
+                if changed_ids is None:
+                    changed_ids = device_ids
+                for device_id in changed_ids:
+                    position = self.rank[device_id]
+                    agenda.add(position)
+                    agenda.update(self.fanout[position])
+
+        transitional = {self.devices.RISING, self.devices.FALLING}
+        steady_state = False
+        network.iterations = 0
+        changed = []  # positions of the devices that changed in the round
+        recent_changes = set()  # changes in the last two rounds
+        while agenda and network.iterations < self.iteration_limit:
+            network.iterations += 1
+            previous_changes = changed
+            changed = []
+            next_agenda = set()
+            queued = agenda
+            heap = list(agenda)
+            heapq.heapify(heap)
+            while heap:
+                position = heapq.heappop(heap)
+                kind, device_id = self.order[position]
+                network.steady_state = True
+                self.executions += 1
+                if not kind.execute(network, device_id):
+                    return False
+                if network.steady_state:  # the outputs have not changed
+                    continue
+                changed.append(position)
+                # Later devices see the change in this round, earlier ones
+                # and the device itself in the next round, as in the sweep
+                for target in self.fanout[position]:
+                    if target <= position:
+                        next_agenda.add(target)
+                    elif target not in queued:
+                        queued.add(target)
+                        heapq.heappush(heap, target)
+                outputs = self.devices.get_device(device_id).outputs
+                if transitional.intersection(outputs.values()):
+                    next_agenda.add(position)
+            recent_changes = set(previous_changes) | set(changed)
+            agenda = next_agenda
+            if not changed or not agenda:
+                # The next round of the sweep would change nothing
+                steady_state = (not changed
+                                or network.iterations < self.iteration_limit)
+                agenda = set()
+                break
+        else:
+            steady_state = not agenda
+
+        if not steady_state:
+            network.oscillating_loops = network.find_loops(
+                [self.order[position][1]
+                 for position in sorted(recent_changes)])
+        network.steady_state = steady_state
+        self.pending = agenda
+        self.devices.cycle += 1
+        self.next_cycle = self.devices.cycle
+        return steady_state
@@ -0,0 +1,206 @@
+"""Measure the stuck-at fault coverage of a test stimulus.
+
+Used in the Logic Simulator project to grade the switch settings applied to
+a network. A fault makes one device output or input stuck at LOW or HIGH,
+and it is detected when a monitored output differs from that of the
+fault-free network in some cycle.
+
+Classes
+-------
+FaultSimulator - simulates all the stuck-at faults of the network in
+                 bit-parallel batches.
+"""
+from bitparallel import BitParallelSimulator
+
+
+class FaultSimulator:
+    """Simulate all the stuck-at faults of the network in bit-parallel batches.
+
+    Every output and every connected input of every device can be stuck at
+    LOW or at HIGH. The faults are simulated in batches with the
+    bitparallel.BitParallelSimulator() class: bit 0 of every signal word
+    holds the fault-free network, and bit k the network with fault k of the
+    batch. A fault is dropped as soon as a monitored output differs from the
+    fault-free one: it is no longer injected, and its bit is made the same
+    as bit 0. A batch stops as soon as all its faults are dropped.
+
+    A fault that makes a feedback loop oscillate is not detected, but is
+    listed apart, and its batch is simulated again without it.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    monitors: instance of the monitors.Monitors() class.
+    batch_size: number of faults simulated at once, in words of
+                batch_size + 1 bits.
+    iteration_limit: number of passes through a feedback loop to wait for
+                     its signals to settle before declaring the network
+                     unstable.
+
+    Public methods
+    --------------
+    get_faults(self): Returns all the stuck-at faults of the network.
+
+    run(self, stimulus, faults=None): Simulates the faults under the
+                                      stimulus and returns True if
+                                      successful.
+
+    get_coverage(self): Returns the fraction of the faults detected.
+
+    get_fault_name(self, fault): Returns the description of a fault.
+
+    display_report(self): Prints the coverage and the undetected faults.
+    """
+
+    def __init__(self, devices, monitors, batch_size=4095,
+                 iteration_limit=20):
+        """Initialise the fault simulator."""
+        self.devices = devices
+        self.monitors = monitors
+        self.batch_size = batch_size
+        self.simulator = BitParallelSimulator(devices, monitors,
+                                              iteration_limit)
+
+        self.faults = []  # the faults simulated in the last run
+        self.detected = {}  # stores {fault: cycle in which it was detected}
+        self.oscillating = []  # faults that made the network oscillate
+
+    def get_faults(self):
+        """Return all the stuck-at faults of the network.
+
+        Each fault is a tuple (device_id, port_id, is_input, signal), in the
+        order of the devices, with the outputs of each device before its
+        connected inputs.
+        """
+        devices = self.devices
+        faults = []
+        for device in devices.devices_list:
+            for output_id in device.outputs:
+                for signal in [devices.LOW, devices.HIGH]:
+                    faults.append((device.device_id, output_id, False,
+                                   signal))
+            for input_id, connected_output in device.inputs.items():
+                if connected_output is not None:
+                    for signal in [devices.LOW, devices.HIGH]:
+                        faults.append((device.device_id, input_id, True,
+                                       signal))
+        return faults
+
+    def run(self, stimulus, faults=None):
+        """Simulate the faults under the stimulus.
+
+        stimulus is a list of pairs ({switch_id: signal}, cycles), as read by
+        batch.read_jobs: the switches are set, and the network run for that
+        number of cycles, one pair after the other, starting from the
+        current state of the network. faults are all the faults of the
+        network by default. Return True if successful, or False if the
+        network cannot be simulated bit-parallel or oscillates without a
+        fault.
+        """
+        self.faults = self.get_faults() if faults is None else list(faults)
+        self.detected = {}
+        self.oscillating = []
+        pending = list(self.faults)
+        while pending:
+            batch = pending[:self.batch_size]
+            pending = pending[self.batch_size:]
+            result = self.run_batch(batch, stimulus)
+            if result is None:
+                return False
+            detected, oscillating = result
+            self.detected.update(detected)
+            if oscillating:
+                # The batch stopped early, so its other faults are run again
+                self.oscillating.extend(oscillating)
+                pending = [fault for fault in batch
+                           if fault not in detected
+                           and fault not in oscillating] + pending
+        return True
+
+    def run_batch(self, batch, stimulus):
+        """Simulate one batch of faults under the stimulus.
+
+        Return a pair ({fault: cycle in which it was detected}, list of
+        faults that made the network oscillate), or None if the fault-free
+        network cannot be simulated.
+        """
+        devices = self.devices
+        simulator = self.simulator
+        if simulator.topology_version != devices.topology_version:
+            simulator.build_plan()
+        if not simulator.supported:
+            return None
+        simulator.mask = (1 << (len(batch) + 1)) - 1
+        simulator.inject_faults(batch)
+        simulator.load_state()
+
+        monitored = list(self.monitors.monitors_dictionary)
+        undetected = simulator.mask & ~1  # the faults not yet detected
+        detected = {}
+        first_cycle = devices.cycle
+        switch_words = {}
+        for switches, cycles in stimulus:
+            for switch_id, signal in switches.items():
+                switch_words[switch_id] = simulator.broadcast(
+                    signal == devices.HIGH)
+            for cycle in range(first_cycle, first_cycle + cycles):
+                if not simulator.execute_cycle(cycle, switch_words):
+                    if simulator.unsettled & 1:
+                        return None  # the fault-free network oscillates
+                    return detected, [
+                        fault for bit, fault in enumerate(batch, 1)
+                        if (simulator.unsettled >> bit) & 1
+                        and fault not in detected]
+                dropped = 0
+                for monitor in monitored:
+                    word = simulator.words[monitor]
+                    dropped |= (word ^ simulator.broadcast(word & 1)) & (
+                        undetected)
+                if not dropped:
+                    continue
+                undetected &= ~dropped
+                while dropped:
+                    bit = dropped.bit_length() - 1
+                    detected[batch[bit - 1]] = cycle
+                    dropped &= ~(1 << bit)
+                if not undetected:
+                    return detected, []  # every fault is dropped
+                simulator.inject_faults([
+                    fault if (undetected >> bit) & 1 else None
+                    for bit, fault in enumerate(batch, 1)])
+                simulator.drop_patterns(simulator.mask & ~(undetected | 1))
+            first_cycle += cycles
+        return detected, []
+
+    def get_coverage(self):
+        """Return the fraction of the faults detected in the last run."""
+        if not self.faults:
+            return 0.0
+        return len(self.detected) / len(self.faults)
+
+    def get_fault_name(self, fault):
+        """Return the description of a fault, such as "G1.I1 stuck-at-0"."""
+        (device_id, port_id, is_input, signal) = fault
+        if is_input:
+            names = self.devices.names
+            port_name = ".".join([names.get_name_string(device_id),
+                                  names.get_name_string(port_id)])
+        else:
+            port_name = self.devices.get_signal_name(device_id, port_id)
+        return "{} stuck-at-{}".format(port_name, signal)
+
+    def display_report(self):
+        """Print the coverage and the undetected faults of the last run."""
+        print("Fault coverage: {:.1f}% ({} of {} faults detected)".format(
+            100 * self.get_coverage(), len(self.detected), len(self.faults)))
+        undetected = [fault for fault in self.faults
+                      if fault not in self.detected
+                      and fault not in self.oscillating]
+        if undetected:
+            print("Undetected faults:")
+            for fault in undetected:
+                print("   ", self.get_fault_name(fault))
+        if self.oscillating:
+            print("Faults that make the network oscillate:")
+            for fault in self.oscillating:
+                print("   ", self.get_fault_name(fault))
@@ -0,0 +1,150 @@
+"""Analyse the structure of the logic network as a directed graph.
+
+Used in the Logic Simulator project by the simulation engines to order the
+devices and find feedback loops. The nodes of a graph can be any hashable
+objects, usually device IDs, and the edges are given by a successors
+dictionary {node: list of nodes}.
+
+Functions
+---------
+strongly_connected_components(nodes, successors) - returns the strongly
+                connected components in topological order.
+get_device_graph(devices, cut_inputs=()) - returns the successors of each
+                device in the network.
+get_connected_components(devices) - returns the groups of devices that are
+                not connected to each other.
+get_fan_in_cone(devices, device_ids) - returns the devices that drive the
+                given devices, directly or through other devices.
+"""
+
+
+def strongly_connected_components(nodes, successors):
+    """Return the strongly connected components in topological order.
+
+    Each component is a list of nodes, and every edge between two
+    components goes from an earlier component to a later one. A component
+    with more than one node, or a node that is its own successor, is a
+    feedback loop. Uses Tarjan's algorithm without recursion, so very deep
+    networks do not reach the recursion limit.
+    """
+    index = {}  # stores {node: order in which it was first visited}
+    low_link = {}
+    on_stack = set()
+    stack = []
+    components = []
+
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low_link[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors.get(root, ())))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low_link[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors.get(child, ()))))
+                    break
+                elif child in on_stack:
+                    low_link[node] = min(low_link[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low_link[parent] = min(low_link[parent], low_link[node])
+                if low_link[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component[::-1])
+
+    # Tarjan's algorithm finds the components in reverse topological order
+    components.reverse()
+    return components
+
+
+def get_device_graph(devices, cut_inputs=()):
+    """Return the successors of each device in the network.
+
+    The result is a dictionary {device_id: list of device IDs}, with an
+    edge from every device to each device that one of its outputs drives.
+    Connections to the input IDs in cut_inputs, such as the DATA input of
+    D-types, are left out.
+    """
+    successors = {device.device_id: [] for device in devices.devices_list}
+    for device in devices.devices_list:
+        for input_id, connected_output in device.inputs.items():
+            if connected_output is None or input_id in cut_inputs:
+                continue
+            driver_successors = successors.get(connected_output[0])
+            if (driver_successors is not None
+                    and device.device_id not in driver_successors[-1:]):
+                driver_successors.append(device.device_id)
+    return successors
+
+
+def get_connected_components(devices):
+    """Return the groups of devices that are not connected to each other.
+
+    Two devices are in the same component if one is connected to an input
+    of the other, directly or through other devices, whatever the direction
+    of the connections. Each component is a list of device IDs in the order
+    of devices.devices_list, and the components are in the order of their
+    first devices.
+    """
+    parent = {device.device_id: device.device_id
+              for device in devices.devices_list}
+
+    def find(device_id):
+        """Return the representative of the component of the device."""
+        root = device_id
+        while parent[root] != root:
+            root = parent[root]
+        while parent[device_id] != root:  # compress the path
+            parent[device_id], device_id = root, parent[device_id]
+        return root
+
+    for device in devices.devices_list:
+        for connected_output in device.inputs.values():
+            if connected_output is None or connected_output[0] not in parent:
+                continue
+            root = find(connected_output[0])
+            device_root = find(device.device_id)
+            if root != device_root:
+                parent[root] = device_root
+
+    components = {}  # stores {representative: list of device IDs}
+    for device in devices.devices_list:
+        components.setdefault(find(device.device_id), []).append(
+            device.device_id)
+    return list(components.values())
+
+
+def get_fan_in_cone(devices, device_ids):
+    """Return the devices that drive the given devices.
+
+    The result is the set of the given device IDs and of the IDs of every
+    device connected to one of their inputs, directly or through other
+    devices, including through the DATA input of D-types, so it holds the
+    sequential feedback loops too.
+    """
+    cone = set(device_ids)
+    stack = list(cone)
+    while stack:
+        device = devices.get_device(stack.pop())
+        if device is None:
+            continue
+        for connected_output in device.inputs.values():
+            if connected_output is not None and (
+                    connected_output[0] not in cone):
+                cone.add(connected_output[0])
+                stack.append(connected_output[0])
+    return cone
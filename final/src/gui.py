@@ -20,6 +20,7 @@ from network import Network
 from monitors import Monitors
 from scanner import Scanner
 from parse import Parser
+from periodic import PeriodicRunner
 
 
 class MyGLCanvas2D(wxcanvas.GLCanvas):
@@ -581,6 +582,7 @@ class Gui(wx.Frame):
         self.devices = devices
         self.monitors = monitors
         self.network = network
+        self.runner = PeriodicRunner(devices, network, monitors)
         self.running = False
         self.monitored_list = self.get_monitored_devices_list(devices, names)
         self.devices_list = self.get_devices(devices, names)
@@ -784,10 +786,12 @@ class Gui(wx.Frame):
         return signals_list
 
     def run(self, cycles):
-        """Run the circuit for a given number of cycles."""
-        for _ in range(cycles):
-            if self.network.execute_network():
-                self.monitors.record_signals()
+        """Run the circuit for a given number of cycles.
+
+        Stops early if the network oscillates.
+        """
+        self.network.get_plan()  # built once, not in the first cycle
+        self.runner.run(cycles)
 
     def get_devices(self, devices, names):
         """Return a list of lists, with each element having id, name, value."""
@@ -847,10 +851,9 @@ class Gui(wx.Frame):
 
     def get_device_string(self, device_index):
         """Return string device name matching with the number."""
-        name = ["AND", "OR", "NAND", "NOR",
-                "XOR", "CLOCK", "SWITCH", "DTYPE", "RC"]
-        if device_index in range(9):
-            return name[device_index]
+        kind = self.devices.registry.get_kind(device_index)
+        if kind is not None:
+            return kind.name
         else:
             return str(device_index)
 
@@ -0,0 +1,477 @@
+"""Execute the network in signal-flow order.
+
+Used in the Logic Simulator project to settle the combinational logic in a
+single pass, by evaluating every device after the devices that drive it.
+
+Classes
+-------
+LevelizedEngine - executes the devices in topological order.
+"""
+from graph import strongly_connected_components, get_device_graph
+
+
+class LevelizedEngine:
+    """Execute the devices in topological order.
+
+    The network is sorted once into its strongly connected components. An
+    acyclic component is a single device, which is evaluated once per cycle
+    after all the devices that drive it, so combinational logic of any depth
+    settles in one pass. Only true feedback loops are iterated until their
+    signals settle. All signals are LOW or HIGH at the end of every device
+    evaluation.
+
+    The DATA input of a D-type is sampled at the start of the cycle, before
+    the switches, signal generators, clocks and RC devices are updated, so
+    it holds its value from before the clock edge, as in the default sweep,
+    and is not part of the signal flow. A D-type stores the DATA
+    sample when its CLK input has risen since it was last evaluated, and
+    SET and CLEAR act immediately, as in the default sweep.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    iteration_limit: number of passes through a feedback loop to wait for
+                     its signals to settle before declaring the network
+                     unstable.
+
+    Public methods
+    --------------
+    build_plan(self): Sorts the devices into strongly connected components.
+
+    update_plan(self): Updates the plan with the topology edits.
+
+    add_to_plan(self, device_id): Adds a new device to the plan.
+
+    remove_from_plan(self, device_id): Removes a device from the plan.
+
+    update_connection(self, device_id, input_id, signal): Updates the plan
+                            after an input is connected or disconnected.
+
+    order_edge(self, driver_id, device_id): Moves components so the driver
+                                            comes before the device.
+
+    get_member_inputs(self, device): Returns the drivers of the inputs of a
+                                     device.
+
+    sample_data(self): Samples the DATA input of every D-type.
+
+    execute_network(self): Executes all the devices for one simulation
+                           cycle.
+
+    execute_component(self, members): Evaluates a strongly connected
+                                      component after its drivers.
+    """
+
+    def __init__(self, devices, network, iteration_limit=20):
+        """Initialise the engine. The plan is built on the first cycle."""
+        self.devices = devices
+        self.network = network
+        self.iteration_limit = iteration_limit
+
+        self.topology_version = None  # version the plan was built for
+        self.kind_devices = []  # (kind, device IDs) in registry order
+        self.sources = []  # (kind, device) of the kinds without inputs
+        self.d_types = []  # (device, DATA driver, DATA port)
+        self.components = []  # lists of (kind, device, inputs) in order
+        self.members = {}  # stores {device_id: (kind, device, inputs)}
+        self.component_index = {}  # stores {device_id: index in components}
+        self.successors = {}  # stores {device_id: set of driven device IDs}
+        self.last_clock = {}  # stores {device_id: CLK at last evaluation}
+        self.data_samples = {}  # stores {device_id: DATA at cycle start}
+        self.unsettled = []  # IDs of the loop devices that kept changing
+        self.next_cycle = None  # cycle expected to be executed next
+
+    def build_plan(self):
+        """Sort the devices into strongly connected components."""
+        devices = self.devices
+        self.kind_devices = []
+        kinds = {}
+        rank = {}
+        for kind in devices.registry.kinds:
+            device_ids = devices.find_devices(kind.kind_id)
+            if device_ids:
+                self.kind_devices.append((kind, device_ids))
+            for device_id in device_ids:
+                kinds[device_id] = kind
+                rank[device_id] = len(rank)
+
+        successors = get_device_graph(devices, cut_inputs=[devices.DATA_ID])
+        self.successors = {device_id: set(targets)
+                           for device_id, targets in successors.items()}
+        self.sources = []
+        self.d_types = []
+        self.components = []
+        self.members = {}
+        self.component_index = {}
+        for component in strongly_connected_components(list(rank),
+                                                       successors):
+            component.sort(key=rank.get)
+            members = []
+            for device_id in component:
+                device = devices.get_device(device_id)
+                kind = kinds[device_id]
+                if not device.inputs:
+                    self.sources.append((kind, device))
+                    continue
+                member = (kind, device, self.get_member_inputs(device))
+                members.append(member)
+                self.members[device_id] = member
+                self.component_index[device_id] = len(self.components)
+                if kind.kind_id == devices.D_TYPE:
+                    self.d_types.append((device,) + tuple(
+                        device.inputs[devices.DATA_ID] or (None, None)))
+            if members:
+                self.components.append(members)
+        self.topology_version = devices.topology_version
+        self.next_cycle = None
+
+    def update_plan(self):
+        """Update the plan with the topology edits.
+
+        The devices and connections added or removed since the plan was
+        built are patched into it. A new device gets a component of its
+        own, and a new connection only reorders the components between the
+        driver and the device, so the plan of a large network is not sorted
+        again, and the clock edges seen by the D-types are kept. The plan is
+        rebuilt instead if some edits were not recorded, a device changed
+        kind, or a connection makes a new feedback loop.
+        """
+        devices = self.devices
+        edits = devices.get_edits(self.topology_version)
+        if edits is None:
+            self.build_plan()
+            return
+        for (edit_kind, device_id, input_id, signal) in edits:
+            if edit_kind == devices.DEVICE_ADDED:
+                self.add_to_plan(device_id)
+            elif edit_kind == devices.DEVICE_REMOVED:
+                self.remove_from_plan(device_id)
+            elif edit_kind == devices.DEVICE_CHANGED:
+                self.build_plan()  # the device moves to another kind
+                return
+            elif edit_kind == devices.PORT_ADDED:
+                device = devices.get_device(device_id)
+                if device is not None and device_id not in self.members and (
+                        device.inputs):
+                    self.build_plan()  # a source with new inputs
+                    return
+                if device_id in self.members:
+                    self.members[device_id][2][:] = self.get_member_inputs(
+                        self.members[device_id][1])
+            elif not self.update_connection(device_id, input_id, signal):
+                self.build_plan()
+                return
+        self.topology_version = devices.topology_version
+
+    def add_to_plan(self, device_id):
+        """Add a new device to the plan.
+
+        A device with inputs is added as a component of its own after all
+        the others, until its connections move it.
+        """
+        devices = self.devices
+        device = devices.get_device(device_id)
+        if device is None or device_id in self.successors:
+            return  # removed again, or added twice by a reused ID
+        kind = devices.registry.get_kind(device.device_kind)
+        kinds = devices.registry.kinds
+        for index, (plan_kind, device_ids) in enumerate(self.kind_devices):
+            if plan_kind is kind:
+                device_ids.append(device_id)
+                break
+            if kinds.index(plan_kind) > kinds.index(kind):
+                self.kind_devices.insert(index, (kind, [device_id]))
+                break
+        else:
+            self.kind_devices.append((kind, [device_id]))
+
+        self.successors[device_id] = set()
+        if not device.inputs:
+            self.sources.append((kind, device))
+            return
+        member = (kind, device, self.get_member_inputs(device))
+        self.members[device_id] = member
+        self.component_index[device_id] = len(self.components)
+        self.components.append([member])
+        if kind.kind_id == devices.D_TYPE:
+            self.d_types.append((device,) + tuple(
+                device.inputs[devices.DATA_ID] or (None, None)))
+            self.last_clock[device_id] = self.get_input(device,
+                                                        devices.CLK_ID)
+
+    def remove_from_plan(self, device_id):
+        """Remove a device from the plan.
+
+        An emptied component is left in place until the plan is rebuilt.
+        """
+        if self.successors.pop(device_id, None) is None:
+            return
+        for index, (kind, device_ids) in enumerate(self.kind_devices):
+            if device_id in device_ids:
+                device_ids.remove(device_id)
+                if not device_ids:
+                    del self.kind_devices[index]
+                break
+        member = self.members.pop(device_id, None)
+        if member is None:
+            self.sources = [(kind, device) for (kind, device) in self.sources
+                            if device.device_id != device_id]
+            return
+        members = self.components[self.component_index.pop(device_id)]
+        members[:] = [other for other in members if other is not member]
+        self.d_types = [entry for entry in self.d_types
+                        if entry[0] is not member[1]]
+        self.last_clock.pop(device_id, None)
+        self.data_samples.pop(device_id, None)
+
+    def update_connection(self, device_id, input_id, signal):
+        """Update the plan after an input is connected or disconnected.
+
+        signal is the output that was connected to or disconnected from the
+        input. Return False if the plan must be rebuilt.
+        """
+        devices = self.devices
+        member = self.members.get(device_id)
+        if member is None:
+            return True  # removed again
+        (kind, device, inputs) = member
+        inputs[:] = self.get_member_inputs(device)
+        if input_id == devices.DATA_ID:  # sampled at the start of the cycle
+            self.d_types = [
+                (device,) + tuple(device.inputs[devices.DATA_ID]
+                                  or (None, None))
+                if entry[0] is device else entry for entry in self.d_types]
+            return True
+        if input_id == devices.CLK_ID and kind.kind_id == devices.D_TYPE:
+            # The new clock is only counted from its next edge
+            self.last_clock[device_id] = self.get_input(device,
+                                                        devices.CLK_ID)
+        driver_id = signal[0]
+        if driver_id not in self.successors:
+            return True  # removed again
+        connected = devices.get_device(device_id) is device and any(
+            connected_output is not None and connected_output[0] == driver_id
+            for other_id, connected_output in device.inputs.items()
+            if other_id != devices.DATA_ID)
+        if not connected:
+            self.successors[driver_id].discard(device_id)
+            return True
+        self.successors[driver_id].add(device_id)
+        return self.order_edge(driver_id, device_id)
+
+    def order_edge(self, driver_id, device_id):
+        """Move components so the driver's comes before the device's.
+
+        Only the components between the two are searched: those reachable
+        from the device are moved after those that reach the driver, which
+        keeps the rest of the order. Return False if the device reaches the
+        driver, so the connection makes a new feedback loop.
+        """
+        lower = self.component_index[device_id]
+        upper = self.component_index.get(driver_id)
+        if upper is None or upper <= lower:
+            return True  # a source, or already in order or in a loop
+        forward = {lower}
+        stack = [lower]
+        while stack:
+            for (kind, device, inputs) in self.components[stack.pop()]:
+                for successor in self.successors[device.device_id]:
+                    index = self.component_index.get(successor)
+                    if index == upper:
+                        return False
+                    if (index is not None and index < upper
+                            and index not in forward):
+                        forward.add(index)
+                        stack.append(index)
+        backward = {upper}
+        stack = [upper]
+        while stack:
+            for (kind, device, inputs) in self.components[stack.pop()]:
+                for input_id, connected_output in device.inputs.items():
+                    if (connected_output is None
+                            or input_id == self.devices.DATA_ID):
+                        continue
+                    index = self.component_index.get(connected_output[0])
+                    if (index is not None and index > lower
+                            and index not in backward):
+                        backward.add(index)
+                        stack.append(index)
+        moved = [self.components[index] for index in sorted(backward)] + [
+            self.components[index] for index in sorted(forward)]
+        for index, members in zip(sorted(forward | backward), moved):
+            self.components[index] = members
+            for (kind, device, inputs) in members:
+                self.component_index[device.device_id] = index
+        return True
+
+    def get_member_inputs(self, device):
+        """Return the drivers of the inputs of a device.
+
+        The result is a list of pairs (driver Device, output ID) in the
+        order of the inputs, with None for the unconnected inputs.
+        """
+        inputs = []
+        for connected_output in device.inputs.values():
+            if connected_output is None:
+                inputs.append(None)
+            else:
+                inputs.append((self.devices.get_device(connected_output[0]),
+                               connected_output[1]))
+        return inputs
+
+    def sample_data(self):
+        """Sample the DATA input of every D-type into data_samples.
+
+        Return False if a DATA input is unconnected.
+        """
+        devices = self.devices
+        for (device, data_driver, data_port) in self.d_types:
+            if data_driver is None:  # DATA is unconnected
+                return False
+            data_device = devices.get_device(data_driver)
+            self.data_samples[device.device_id] = self.resolve(
+                data_device.outputs.get(data_port))
+        return True
+
+    def execute_network(self):
+        """Execute all the devices for one simulation cycle.
+
+        Return True if successful and the network does not oscillate.
+        """
+        devices = self.devices
+        network = self.network
+        if self.topology_version != devices.topology_version:
+            self.update_plan()
+        if self.next_cycle != devices.cycle:
+            # After a cold start-up, clock edges are counted from the current
+            # CLK signals
+            self.last_clock = {}
+            for (device, data_driver, data_port) in self.d_types:
+                self.last_clock[device.device_id] = self.get_input(
+                    device, devices.CLK_ID)
+
+        # D-types sample DATA before the sources change it
+        if not self.sample_data():
+            return False
+        for kind, device_ids in self.kind_devices:
+            if kind.start_cycle is not None:
+                kind.start_cycle(network, device_ids)
+        for kind, device in self.sources:
+            if not self.settle(kind, device):
+                return False
+
+        network.steady_state = True
+        network.iterations = 1
+        self.unsettled = []
+        for members in self.components:
+            if not self.execute_component(members):
+                return False
+        if self.unsettled:
+            network.oscillating_loops = network.find_loops(self.unsettled)
+
+        devices.cycle += 1
+        self.next_cycle = devices.cycle
+        return network.steady_state
+
+    def execute_component(self, members):
+        """Evaluate a strongly connected component after its drivers.
+
+        A feedback loop is iterated until none of its outputs change. If it
+        does not settle, network.steady_state is cleared and the devices
+        that changed in the last pass are added to unsettled. Return True if
+        successful.
+        """
+        network = self.network
+        if len(members) == 1 and not self.is_loop(members[0]):
+            return self.evaluate(*members[0])
+        # Iterate a feedback loop until none of its outputs change
+        for passes in range(1, self.iteration_limit + 1):
+            changed = []
+            for (kind, device, inputs) in members:
+                outputs = list(device.outputs.values())
+                if not self.evaluate(kind, device, inputs):
+                    return False
+                if list(device.outputs.values()) != outputs:
+                    changed.append(device.device_id)
+            network.iterations = max(network.iterations, passes)
+            if not changed:
+                return True
+        network.steady_state = False
+        self.unsettled.extend(changed)
+        return True
+
+    def is_loop(self, member):
+        """Return True if the device drives one of its own inputs."""
+        kind, device, inputs = member
+        return any(connection is not None and connection[0] is device
+                   for connection in inputs)
+
+    def resolve(self, signal):
+        """Return the level that a RISING or FALLING signal settles to."""
+        if signal == self.devices.RISING:
+            return self.devices.HIGH
+        elif signal == self.devices.FALLING:
+            return self.devices.LOW
+        return signal
+
+    def get_input(self, device, input_id):
+        """Return the settled signal at the given input, None if floating."""
+        connected_output = device.inputs.get(input_id)
+        if connected_output is None:
+            return None
+        (output_device_id, output_port_id) = connected_output
+        return self.resolve(self.network.get_output_signal(output_device_id,
+                                                           output_port_id))
+
+    def settle(self, kind, device):
+        """Execute a device until its outputs settle to LOW or HIGH.
+
+        Return True if successful.
+        """
+        for _ in range(self.iteration_limit):
+            self.network.steady_state = True
+            if not kind.execute(self.network, device.device_id):
+                return False
+            if self.network.steady_state:
+                return True
+        return False
+
+    def evaluate(self, kind, device, inputs):
+        """Evaluate a device whose drivers have been evaluated.
+
+        Return True if successful.
+        """
+        devices = self.devices
+        input_signals = []
+        for connection in inputs:
+            if connection is None:  # this input is unconnected
+                return False
+            (driver, port_id) = connection
+            input_signals.append(driver.outputs.get(port_id))
+
+        if kind.evaluate is not None:
+            for output_id, signal in zip(device.outputs, kind.evaluate(
+                    devices, device, input_signals)):
+                device.outputs[output_id] = signal
+            return True
+
+        elif kind.kind_id == devices.D_TYPE:
+            device_id = device.device_id
+            signals = dict(zip(device.inputs, input_signals))
+            clock_signal = signals[devices.CLK_ID]
+            if (self.last_clock.get(device_id) == devices.LOW
+                    and clock_signal == devices.HIGH):
+                device.dtype_memory = self.data_samples[device_id]
+            self.last_clock[device_id] = clock_signal
+            if signals[devices.SET_ID] == devices.HIGH:
+                device.dtype_memory = devices.HIGH
+            if signals[devices.CLEAR_ID] == devices.HIGH:
+                device.dtype_memory = devices.LOW
+            device.outputs[devices.Q_ID] = device.dtype_memory
+            device.outputs[devices.QBAR_ID] = self.network.invert_signal(
+                device.dtype_memory)
+            return True
+
+        # Kinds without a settled evaluation are executed until they settle
+        return self.settle(kind, device)
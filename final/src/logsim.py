@@ -9,8 +9,20 @@ Usage
 Show help: logsim.py -h
 Command line user interface: logsim.py -c <file path>
 Graphical user interface: logsim.py <file path>
+Collapse gate clusters into look-up tables: logsim.py -l [-c] <file path>
+Simulate only what the monitors depend on: logsim.py -m [-c] <file path>
+Optimise with constant switches: logsim.py -o <switches> [-c] <file path>
+Choose the simulation engine: logsim.py -e <engine> [-c] <file path>
+Set the iteration limit: logsim.py -i <limit> [-c] <file path>
+Simulate unconnected parts in parallel: logsim.py -p <n> -c <file path>
+Run a batch of jobs in parallel: logsim.py -b <jobs file> <file path>
+Print the truth tables of a combinational network: logsim.py -t <file path>
+Measure the partitioned engine speedup: logsim.py -s <cycles> <file path>
+Grade a stimulus by fault coverage: logsim.py -f <stimulus file> <file path>
+Check that the network resets: logsim.py -x <cycles> <file path>
 """
 import getopt
+import multiprocessing
 import sys
 import os
 
@@ -24,8 +36,109 @@ from scanner import Scanner
 from parse import Parser
 from userint import UserInterface
 from gui import Gui
+from optimiser import Optimiser
+from events import EventEngine
+from levelize import LevelizedEngine
+from vectorised import VectorisedEngine
+from codegen import CompiledEngine, get_cache_path
+from components import ComponentRunner
+from batch import read_jobs, run_batch, display_results
+from bitparallel import BitParallelSimulator
+from partitioned import PartitionedEngine, report_speedup
+from faults import FaultSimulator
+from timed import TimedEngine
+from xprop import XPropagationSimulator
+from cone import ConeOfInfluence
 import builtins
 
+
+# Simulation engines that can be chosen with the -e option
+ENGINES = {
+    "sweep": None,  # execute every device in every iteration
+    "event": EventEngine,
+    "levelized": LevelizedEngine,
+    "vectorised": VectorisedEngine,
+    "compiled": CompiledEngine,  # generated code cached beside the file
+    "partitioned": PartitionedEngine,  # one worker process per processor
+    "timed": TimedEngine,  # propagation delays on a timing wheel
+}
+
+
+def set_engine(engine_name, devices, network, path):
+    """Make the network use the simulation engine called engine_name.
+
+    path is the definition file, beside which generated code is cached.
+    """
+    engine_class = ENGINES[engine_name]
+    limit = network.iteration_limit
+    if engine_class is CompiledEngine:
+        network.set_engine(CompiledEngine(devices, network,
+                                          cache_path=get_cache_path(path),
+                                          iteration_limit=limit))
+    elif engine_class is not None:
+        network.set_engine(engine_class(devices, network,
+                                        iteration_limit=limit))
+
+
+def print_truth_tables(devices, monitors):
+    """Print the truth table of every monitored output in hexadecimal.
+
+    Bit i of each table, counting from the least significant bit, is the
+    output when switch k, in the order of definition, is set to bit k of i.
+    """
+    switch_ids = devices.find_devices(devices.SWITCH)
+    tables = BitParallelSimulator(devices, monitors).get_truth_tables(
+        switch_ids)
+    if tables is None:
+        print("Error: the network is not combinational")
+        return
+    print("Switches from bit 0:", ", ".join(
+        devices.names.get_name_string(switch_id) for switch_id in switch_ids))
+    for (device_id, output_id), table in tables.items():
+        print(devices.get_signal_name(device_id, output_id) + ":",
+              hex(int.from_bytes(table, "little")))
+
+
+def prune_to_monitors(network, monitors):
+    """Make the default sweep execute only what the monitors depend on.
+
+    The cone of influence is kept up to date as monitors are added and
+    removed.
+    """
+    cone = ConeOfInfluence(network.devices, monitors)
+    monitors.set_cone(cone)
+    network.set_cone(cone)
+
+
+def optimise_network(names, devices, network, monitors, switch_names):
+    """Mark the named switches constant and optimise the network.
+
+    switch_names is a comma-separated list of switch names, which may be
+    empty. Return False if one of them is not a switch.
+    """
+    for switch_name in filter(None, switch_names.split(",")):
+        switch_id = names.query(switch_name.strip())
+        if switch_id is None or not devices.set_constant(switch_id):
+            print("Error:", switch_name, "is not a switch")
+            return False
+    optimiser = Optimiser(names, devices, network, monitors)
+    print("Removed", optimiser.optimise(), "devices")
+    return True
+
+
+def make_scanner(path, names, devices):
+    """Return a scanner for the definition file at path."""
+    return Scanner(
+        path=path,
+        names_map=names,
+        devices_map=Names(devices.registry.get_names()),
+        keywords_map=Names(
+            ["DEVICES", "CONNECTIONS", "MONITORS", "DATA",
+             "CLK", "SET", "CLEAR", "Q", "QBAR", "I"]),
+        punct_map=Names([",", ".", ":", ";", ">", "[", "]", "="])
+    )
+
+
 def main(arg_list):
     """Parse the command line options and arguments specified in arg_list.
 
@@ -35,9 +148,32 @@ def main(arg_list):
     usage_message = ("Usage:\n"
                      "Show help: logsim.py -h\n"
                      "Command line user interface: logsim.py -c <file path>\n"
-                     "Graphical user interface: logsim.py <file path>")
+                     "Graphical user interface: logsim.py <file path>\n"
+                     "Collapse gate clusters into look-up tables: "
+                     "logsim.py -l [-c] <file path>\n"
+                     "Simulate only what the monitors depend on: "
+                     "logsim.py -m [-c] <file path>\n"
+                     "Optimise with constant switches: "
+                     "logsim.py -o <switches> [-c] <file path>\n"
+                     "Choose the simulation engine: "
+                     "logsim.py -e <engine> [-c] <file path>\n"
+                     "Set the iteration limit: "
+                     "logsim.py -i <limit> [-c] <file path>\n"
+                     "Simulate unconnected parts in parallel: "
+                     "logsim.py -p <n> -c <file path>\n"
+                     "Run a batch of jobs in parallel: "
+                     "logsim.py -b <jobs file> <file path>\n"
+                     "Print the truth tables of a combinational network: "
+                     "logsim.py -t <file path>\n"
+                     "Measure the partitioned engine speedup: "
+                     "logsim.py -s <cycles> <file path>\n"
+                     "Grade a stimulus by fault coverage: "
+                     "logsim.py -f <stimulus file> <file path>\n"
+                     "Check that the network resets: "
+                     "logsim.py -x <cycles> <file path>\n"
+                     "Engines: " + ", ".join(ENGINES))
     try:
-        options, arguments = getopt.getopt(arg_list, "hc:")
+        options, arguments = getopt.getopt(arg_list, "hlmc:e:i:b:t:p:s:f:x:o:")
     except getopt.GetoptError:
         print("Error: invalid command line arguments\n")
         print(usage_message)
@@ -48,30 +184,136 @@ def main(arg_list):
     devices = Devices(names)
     network = Network(names, devices)
     monitors = Monitors(names, devices, network)
+    option_flags = [option for option, value in options]
+    engine_name = dict(options).get("-e", "sweep")
+    if engine_name not in ENGINES:
+        print("Error: unknown engine", engine_name, "\n")
+        print(usage_message)
+        sys.exit()
+    limit = dict(options).get("-i", str(network.iteration_limit))
+    if not limit.isdigit() or int(limit) == 0:
+        print("Error: the iteration limit must be a positive integer\n")
+        print(usage_message)
+        sys.exit()
+    network.iteration_limit = int(limit)
+    processes = dict(options).get("-p")
+    if processes is not None and (not processes.isdigit()
+                                  or int(processes) == 0):
+        print("Error: the number of processes must be a positive integer\n")
+        print(usage_message)
+        sys.exit()
 
     for option, path in options:
         if option == "-h":  # print the usage message
             print(usage_message)
             sys.exit()
         elif option == "-c":  # use the command line user interface
-            scanner = Scanner(
-                path=path,
-                names_map=names,
-                devices_map=Names(["CLOCK", "SWITCH", "AND", "NAND",
-                                   "OR", "NOR", "XOR", "DTYPE", "RC"]),
-                keywords_map=Names(
-                    ["DEVICES", "CONNECTIONS", "MONITORS", "DATA",
-                     "CLK", "SET", "CLEAR", "Q", "QBAR", "I"]),
-                punct_map=Names([",", ".", ":", ";", ">", "[", "]", "="])
-            )
+            scanner = make_scanner(path, names, devices)
 
             parser = Parser(names, devices, network, monitors, scanner)
             if parser.parse_network():
+                if "-l" in option_flags:
+                    optimiser = Optimiser(names, devices, network, monitors)
+                    print("Collapsed", optimiser.collapse_luts(),
+                          "devices into look-up tables")
+                if "-o" in option_flags and not optimise_network(
+                        names, devices, network, monitors,
+                        dict(options)["-o"]):
+                    sys.exit()
+                if "-m" in option_flags:
+                    prune_to_monitors(network, monitors)
+                set_engine(engine_name, devices, network, path)
                 # Initialise an instance of the userint.UserInterface() class
                 userint = UserInterface(names, devices, network, monitors)
+                if processes is not None:
+                    userint.runner = ComponentRunner(
+                        devices, network, monitors, int(processes))
                 userint.command_interface()
 
-    if not options:  # no option given, use the graphical user interface
+        elif option == "-b":  # run a batch of jobs in worker processes
+            if len(arguments) != 1:  # wrong number of arguments
+                print("Error: one file path required\n")
+                print(usage_message)
+                sys.exit()
+            [definition_path] = arguments
+            scanner = make_scanner(definition_path, names, devices)
+            parser = Parser(names, devices, network, monitors, scanner)
+            if parser.parse_network():
+                set_engine(engine_name, devices, network, definition_path)
+                jobs = read_jobs(path, names, devices)
+                if jobs is not None:
+                    display_results(monitors, jobs, run_batch(
+                        names, devices, network, monitors, jobs))
+            sys.exit()
+
+        elif option == "-t":  # print the truth tables
+            scanner = make_scanner(path, names, devices)
+            parser = Parser(names, devices, network, monitors, scanner)
+            if parser.parse_network():
+                print_truth_tables(devices, monitors)
+            sys.exit()
+
+        elif option == "-s":  # time the partitioned engine
+            if len(arguments) != 1 or not path.isdigit():
+                print("Error: a number of cycles and one file path "
+                      "required\n")
+                print(usage_message)
+                sys.exit()
+            [definition_path] = arguments
+            scanner = make_scanner(definition_path, names, devices)
+            parser = Parser(names, devices, network, monitors, scanner)
+            if parser.parse_network():
+                processors = multiprocessing.cpu_count()
+                partition_counts = sorted(
+                    {processors} | {2 ** power for power in range(
+                        processors.bit_length()) if 2 ** power < processors})
+                devices.cold_startup()
+                report_speedup(devices, network, int(path), partition_counts)
+            sys.exit()
+
+        elif option == "-f":  # grade a stimulus by its fault coverage
+            if len(arguments) != 1:  # wrong number of arguments
+                print("Error: one file path required\n")
+                print(usage_message)
+                sys.exit()
+            [definition_path] = arguments
+            scanner = make_scanner(definition_path, names, devices)
+            parser = Parser(names, devices, network, monitors, scanner)
+            if parser.parse_network():
+                stimulus = read_jobs(path, names, devices)
+                if stimulus is not None:
+                    devices.cold_startup()
+                    simulator = FaultSimulator(
+                        devices, monitors,
+                        iteration_limit=network.iteration_limit)
+                    if simulator.run(stimulus):
+                        simulator.display_report()
+                    else:
+                        print("Error: the network cannot be fault simulated")
+            sys.exit()
+
+        elif option == "-x":  # simulate from an unknown initial state
+            if len(arguments) != 1 or not path.isdigit():
+                print("Error: a number of cycles and one file path "
+                      "required\n")
+                print(usage_message)
+                sys.exit()
+            [definition_path] = arguments
+            scanner = make_scanner(definition_path, names, devices)
+            parser = Parser(names, devices, network, monitors, scanner)
+            if parser.parse_network():
+                devices.cold_startup()
+                simulator = XPropagationSimulator(
+                    devices, monitors, iteration_limit=network.iteration_limit)
+                traces = simulator.run(int(path))
+                if traces is None:
+                    print("Error: the network cannot be simulated from an "
+                          "unknown state")
+                else:
+                    simulator.display_report(traces)
+            sys.exit()
+
+    if "-c" not in option_flags:  # use the graphical user interface
 
         if len(arguments) != 1:  # wrong number of arguments
             print("Error: one file path required\n")
@@ -79,18 +321,19 @@ def main(arg_list):
             sys.exit()
 
         [path] = arguments
-        scanner = Scanner(
-                path=path,
-                names_map=names,
-                devices_map=Names(["CLOCK", "SWITCH", "AND", "NAND",
-                                   "OR", "NOR", "XOR", "DTYPE","RC"]),
-                keywords_map=Names(
-                    ["DEVICES", "CONNECTIONS", "MONITORS", "DATA",
-                     "CLK", "SET", "CLEAR", "Q", "QBAR", "I"]),
-                punct_map=Names([",", ".", ":", ";", ">", "[", "]", "="])
-                )
+        scanner = make_scanner(path, names, devices)
         parser = Parser(names, devices, network, monitors, scanner)
         if parser.parse_network():
+            if "-l" in option_flags:
+                optimiser = Optimiser(names, devices, network, monitors)
+                print("Collapsed", optimiser.collapse_luts(),
+                      "devices into look-up tables")
+            if "-o" in option_flags and not optimise_network(
+                    names, devices, network, monitors, dict(options)["-o"]):
+                sys.exit()
+            if "-m" in option_flags:
+                prune_to_monitors(network, monitors)
+            set_engine(engine_name, devices, network, path)
             # Initialise an instance of the gui.Gui() class
 
             lang_env = os.getenv('LANG', 'en_GB.utf8')
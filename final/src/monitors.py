@@ -44,6 +44,9 @@ class Monitors:
     get_margin(self): Returns the length of the longest monitor's name.
 
     display_signals(self): Displays signal trace(s) in the text console.
+
+    set_cone(self, cone): Sets the cone of influence to keep up to date with
+                          the monitors.
     """
 
     def __init__(self, names, devices, network):
@@ -59,6 +62,9 @@ class Monitors:
         [self.NO_ERROR, self.NOT_OUTPUT,
          self.MONITOR_PRESENT] = self.names.unique_error_codes(3)
 
+        # cone.ConeOfInfluence() told about every monitor change, if any
+        self.cone = None
+
     def make_monitor(self, device_id, output_id, cycles_completed=0):
         """Add the specified signal to the monitors dictionary.
 
@@ -78,6 +84,8 @@ class Monitors:
             # list.
             self.monitors_dictionary[(device_id, output_id)] = [
                 self.devices.BLANK] * cycles_completed
+            if self.cone is not None:
+                self.cone.add_monitor(device_id, output_id)
             return self.NO_ERROR
 
     def remove_monitor(self, device_id, output_id):
@@ -89,6 +97,8 @@ class Monitors:
             return False
         else:
             del self.monitors_dictionary[(device_id, output_id)]
+            if self.cone is not None:
+                self.cone.remove_monitor(device_id, output_id)
             return True
 
     def get_monitor_signal(self, device_id, output_id):
@@ -173,4 +183,13 @@ class Monitors:
                     print("\\", end="")
                 if signal == self.devices.BLANK:
                     print(" ", end="")
+                if signal == self.devices.UNKNOWN:
+                    print("X", end="")
             print("\n", end="")
+
+    def set_cone(self, cone):
+        """Set the cone of influence to keep up to date with the monitors.
+
+        cone is an instance of the cone.ConeOfInfluence() class, or None.
+        """
+        self.cone = cone
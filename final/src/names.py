@@ -43,6 +43,9 @@ class Names:
             self.names_list = []
         else:
             self.names_list = names_list
+        self.names_dictionary = {}  # stores {name_string: name_id}
+        for name_id, name_string in enumerate(self.names_list):
+            self.names_dictionary.setdefault(name_string, name_id)
         self.error_code_count = 0  # how many error codes have been declared
 
     def unique_error_codes(self, num_error_codes):
@@ -58,10 +61,7 @@ class Names:
 
         If the name string is not present in the names list, return None.
         """
-        try:
-            return self.names_list.index(name_string)
-        except ValueError as e:
-            return None
+        return self.names_dictionary.get(name_string)
 
     def lookup(self, name_string_list):
         """Return a list of name IDs for each name string in name_string_list.
@@ -70,11 +70,10 @@ class Names:
         """
         output = []
         for name in name_string_list:
-            try:
-                output.append(self.names_list.index(name))
-            except ValueError as e:
+            if name not in self.names_dictionary:
+                self.names_dictionary[name] = len(self.names_list)
                 self.names_list.append(name)
-                output.append(self.names_list.index(name))
+            output.append(self.names_dictionary[name])
         return output
 
     def get_name_string(self, name_id):
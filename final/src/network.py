@@ -6,6 +6,20 @@ Classes
 --------
 Network - builds and executes the network.
 """
+import array
+import bisect
+import hashlib
+import heapq
+import struct
+import sys
+import zlib
+
+from graph import strongly_connected_components, get_device_graph
+
+
+# Checkpoints start with these bytes and the version of their format
+CHECKPOINT_MAGIC = b"LSCK"
+CHECKPOINT_VERSION = 2
 
 
 class Network:
@@ -34,6 +48,12 @@ class Network:
                     second_port_id): Connects the first device to the second
                                      device.
 
+    remove_connection(self, device_id, input_id): Disconnects the specified
+                                                  input.
+
+    remove_device(self, device_id): Disconnects the specified device and
+                                    removes it from the network.
+
     check_network(self): Checks if all inputs in the network are connected.
 
     update_signal(self, signal, target): Updates the signal in the direction of
@@ -44,9 +64,15 @@ class Network:
 
     execute_switch(self, device_id): Simulates a switch press.
 
+    execute_siggen(self, device_id): Simulates a signal generator and updates
+                                     its output signal value.
+
     execute_gate(self, device_id, x=None, y=None): Simulates a logic gate and
                                               updates its output signal value.
 
+    execute_lut(self, device_id): Simulates a look-up table device and updates
+                                  its output signal value.
+
     execute_d_type(self, device_id): Simulates a D-type device and updates its
                                      output signal value.
 
@@ -56,6 +82,49 @@ class Network:
     update_clocks(self): If it is time to do so, sets clock signals to RISING
                          or FALLING.
 
+    update_rcs(self): Sets the RC signals to LOW if their timers expire in
+                      this cycle, and returns their IDs.
+
+    execute_kind(self, kind, device_ids): Executes all the devices of the
+                                          given kind.
+
+    set_engine(self, engine): Sets the engine that executes the network.
+
+    set_cone(self, cone): Sets the cone of influence that the default sweep
+                          is restricted to.
+
+    build_plan(self): Builds the execution plan of the network and returns
+                      it.
+
+    get_plan(self): Returns the execution plan, updating it if the topology
+                    changed.
+
+    update_plan(self): Updates the execution plan with the topology edits.
+
+    add_to_plan(self, device_id): Adds a new device to the execution plan.
+
+    remove_from_plan(self, device_id): Removes a device from the execution
+                                       plan.
+
+    update_fanout(self, driver_id, device_id): Makes the plan match the
+                                    connections from one device to another.
+
+    schedule_change(self, position, agenda): Adds the devices that must run
+                                             again after a change to the
+                                             agenda.
+
+    find_loops(self, device_ids): Returns the feedback loops among the
+                                  devices that kept changing.
+
+    get_structure_digest(self): Returns a hash of the devices and connections
+                                of the network.
+
+    checkpoint(self, monitors=None): Returns the state of the simulation as a
+                                     binary blob.
+
+    restore(self, blob, monitors=None): Returns the simulation to the state
+                                        stored in a blob.
+
     execute_network(self): Executes all the devices in the network for one
                            simulation cycle.
     """
@@ -65,6 +134,27 @@ class Network:
         self.names = names
         self.devices = devices
         self.iterations = None
+        self.clock_edges = []  # IDs of the clocks with an edge in this cycle
+        self.engine = None  # None for the default sweep of all devices
+
+        # Number of iterations to wait for the signals to settle before
+        # declaring the network unstable, and the loops found if they do not
+        self.iteration_limit = 20
+        self.oscillating_loops = []
+
+        # Execution plan: (kind, device IDs) in registry order, updated when
+        # the topology changes
+        self.plan = []
+        self.plan_positions = []  # positions of the devices in the plan
+        self.plan_order = []  # (kind, device_id) in execution order, or None
+        self.plan_fanout = []  # positions of the devices each one drives
+        self.plan_rank = {}  # stores {device_id: position}
+        # stores {kind_id: [next free position, end of the kind's positions]}
+        self.plan_regions = {}
+        self.plan_version = None
+        # cone.ConeOfInfluence() of the devices to execute, None for all
+        self.cone = None
+        self.plan_cone_version = None
 
         [self.NO_ERROR, self.INPUT_TO_INPUT, self.OUTPUT_TO_OUTPUT,
          self.INPUT_CONNECTED, self.PORT_ABSENT,
@@ -131,6 +221,9 @@ class Network:
                 # Make connection
                 first_device.inputs[first_port_id] = (second_device_id,
                                                       second_port_id)
+                self.devices.record_edit(
+                    self.devices.CONNECTION_MADE, first_device_id,
+                    first_port_id, (second_device_id, second_port_id))
                 error_type = self.NO_ERROR
             else:  # second_port_id is not a valid input or output port
                 error_type = self.PORT_ABSENT
@@ -146,6 +239,9 @@ class Network:
                 else:
                     second_device.inputs[second_port_id] = (first_device_id,
                                                             first_port_id)
+                    self.devices.record_edit(
+                        self.devices.CONNECTION_MADE, second_device_id,
+                        second_port_id, (first_device_id, first_port_id))
                     error_type = self.NO_ERROR
             else:
                 error_type = self.PORT_ABSENT
@@ -155,6 +251,37 @@ class Network:
 
         return error_type
 
+    def remove_connection(self, device_id, input_id):
+        """Disconnect the specified input from the output that drives it.
+
+        Return True if successful.
+        """
+        device = self.devices.get_device(device_id)
+        if device is None or device.inputs.get(input_id) is None:
+            return False
+        connected_output = device.inputs[input_id]
+        device.inputs[input_id] = None
+        self.devices.record_edit(self.devices.CONNECTION_REMOVED, device_id,
+                                 input_id, connected_output)
+        return True
+
+    def remove_device(self, device_id):
+        """Disconnect the specified device and remove it from the network.
+
+        The inputs that it drives are left unconnected, and the signals of
+        the other devices are kept. Return True if successful.
+        """
+        if self.devices.get_device(device_id) is None:
+            return False
+        for device in self.devices.devices_list:
+            for input_id, connected_output in device.inputs.items():
+                if (connected_output is not None
+                        and connected_output[0] == device_id
+                        or device.device_id == device_id):
+                    self.remove_connection(device.device_id, input_id)
+        self.devices.remove_device(device_id)
+        return True
+
     def check_network(self):
         """Return True if all inputs in the network are connected."""
         for device_id in self.devices.find_devices():
@@ -215,34 +342,41 @@ class Network:
             device.outputs[None] = updated_signal
             return True
 
-    def execute_rc(self, device_id):
-        """
-        Simulate RC circuit and update its output signal value. If it is time to do so, set RC signals to LOW.
-        Return True if successful.
+    def execute_siggen(self, device_id):
+        """Simulate a signal generator.
+
+        The output signal is updated to the bit of the pattern for the current
+        simulation cycle. Return True if successful.
         """
         device = self.devices.get_device(device_id)
-        out = self.get_output_signal(device_id, None)  #device.outputs[None]
-
-        if out == self.devices.LOW:
-            output_signal = self.devices.LOW
-
-        elif out == self.devices.HIGH:
-            if device.rc_counter == device.rc_time: #The output is not steady
-                output_signal = self.devices.LOW #self.update_signal(output_signal, self.devices.LOW)
-                #_________________________________________________
-                #device.outputs[None] = target
-                #return True
-            elif device.rc_counter < device.rc_time:
-                output_signal = self.devices.HIGH
-                device.rc_counter += 1
-            else:
-                return False
-        else:
+        pattern = device.siggen_pattern
+        target = pattern[self.devices.cycle % len(pattern)]
+        signal = self.get_output_signal(device_id, output_id=None)
+        # Update and store the updated signal
+        updated_signal = self.update_signal(signal, target)
+        if updated_signal is None:  # signal update is unsuccessful
             return False
-        if self.iterations > 1:              #TODO If unsteady, run one more time
-            device.rc_counter -= 1           #TODO until the terminal settles down
-        device.outputs[None] = output_signal #TODO if the interpetation is "RUN" RC n iterations,
-        return True                          #TODO then just delete this if statement.
+        else:
+            device.outputs[None] = updated_signal
+            return True
+
+    def update_rcs(self):
+        """Set the RC signals to LOW if their timers expire in this cycle.
+
+        RC devices are only visited when their one-shot timer fires, so they
+        cost nothing while charging or discharged. Return the IDs of the RC
+        devices that have been discharged.
+        """
+        discharged = []
+        rc_schedule = self.devices.rc_schedule
+        while rc_schedule and rc_schedule[0][0] <= self.devices.cycle:
+            fall_cycle, device_id = heapq.heappop(rc_schedule)
+            device = self.devices.get_device(device_id)
+            # Timers of removed or restarted devices are stale
+            if device is not None and device.rc_fall_cycle == fall_cycle:
+                device.outputs[None] = self.devices.LOW
+                discharged.append(device_id)
+        return discharged
 
     def execute_gate(self, device_id, x=None, y=None):
         """Simulate a logic gate and update its output signal value.
@@ -254,28 +388,28 @@ class Network:
         Return True if successful.
         """
         device = self.devices.get_device(device_id)
-        for input_id in device.inputs:
-            input_signal = self.get_input_signal(device_id, input_id)
-            if input_signal is None:  # this input is unconnected
-                return False
-
-        input_signal_list = []
-        for input_id in device.inputs:
-            input_signal = self.get_input_signal(device_id, input_id)
-            input_signal_list.append(input_signal)
-            if device.device_kind != self.devices.XOR:
-                if input_signal != x:
-                    output_signal = self.invert_signal(y)
-                    break
-                output_signal = y
+        connected_outputs = device.inputs.values()
+        if None in connected_outputs:  # an input is unconnected
+            return False
 
         if device.device_kind == self.devices.XOR:
+            [first_signal, second_signal] = [
+                self.get_output_signal(output_device_id, output_port_id)
+                for (output_device_id, output_port_id) in connected_outputs]
             # Output is high only if both inputs are different
-            if input_signal_list[0] == input_signal_list[1]:
-                # assume two inputs
+            if first_signal == second_signal:
                 output_signal = self.devices.LOW
             else:
                 output_signal = self.devices.HIGH
+        else:
+            # The first input that is not x decides the output, so the
+            # remaining inputs of a wide gate are never read
+            output_signal = y
+            for (output_device_id, output_port_id) in connected_outputs:
+                if self.get_output_signal(output_device_id,
+                                          output_port_id) != x:
+                    output_signal = self.invert_signal(y)
+                    break
 
         # Update and store the new signal
         signal = self.get_output_signal(device_id, None)
@@ -286,6 +420,35 @@ class Network:
         device.outputs[None] = updated_signal
         return True
 
+    def execute_lut(self, device_id):
+        """Simulate a look-up table device and update its output signal value.
+
+        The input signals are packed into an index, with I1 as the least
+        significant bit, and the output is the corresponding bit of the table.
+        Return True if successful.
+        """
+        device = self.devices.get_device(device_id)
+        index = 0
+        for bit, input_id in enumerate(device.inputs):
+            input_signal = self.get_input_signal(device_id, input_id)
+            if input_signal is None:  # this input is unconnected
+                return False
+            if input_signal in [self.devices.HIGH, self.devices.FALLING]:
+                index |= 1 << bit
+
+        if (device.lut_table >> index) & 1:
+            target = self.devices.HIGH
+        else:
+            target = self.devices.LOW
+
+        # Update and store the new signal
+        signal = self.get_output_signal(device_id, None)
+        updated_signal = self.update_signal(signal, target)
+        if updated_signal is None:  # if the update is unsuccessful
+            return False
+        device.outputs[None] = updated_signal
+        return True
+
     def execute_d_type(self, device_id):
         """Simulate a D-type device and update its output signal value.
 
@@ -363,80 +526,480 @@ class Network:
             return False
 
     def update_clocks(self):
-        """If it is time to do so, set clock signals to RISING or FALLING."""
-        clock_devices = self.devices.find_devices(self.devices.CLOCK)
-        for device_id in clock_devices:
+        """If it is time to do so, set clock signals to RISING or FALLING.
+
+        Only the clocks with an edge in this cycle are visited. Their IDs are
+        stored in self.clock_edges and their next edges are queued.
+        """
+        self.clock_edges = []
+        clock_schedule = self.devices.clock_schedule
+        cycle = self.devices.cycle
+        while clock_schedule and clock_schedule[0][0] <= cycle:
+            edge_cycle, device_id = heapq.heappop(clock_schedule)
             device = self.devices.get_device(device_id)
-            if device.clock_counter == device.clock_half_period:
-                device.clock_counter = 0
-                output_signal = self.get_output_signal(device_id,
-                                                       output_id=None)
-                if output_signal == self.devices.HIGH:
-                    device.outputs[None] = self.devices.FALLING
-                elif output_signal == self.devices.LOW:
-                    device.outputs[None] = self.devices.RISING
-            device.clock_counter += 1
+            # Edges of removed or restarted clocks are stale
+            if device is None or device.clock_next_edge != edge_cycle:
+                continue
+            signal = self.devices.get_clock_signal(device_id, cycle)
+            if signal == self.devices.get_clock_signal(device_id, cycle - 1):
+                device.outputs[None] = signal
+            elif signal == self.devices.HIGH:
+                device.outputs[None] = self.devices.RISING
+            else:
+                device.outputs[None] = self.devices.FALLING
+            self.clock_edges.append(device_id)
+            self.devices.schedule_clock(device, cycle)
 
-    def execute_network(self):
-        """Execute all the devices in the network for one simulation cycle.
+    def execute_kind(self, kind, device_ids):
+        """Execute all the devices of the given kind.
 
-        Return True if successful and the network does not oscillate.
+        The batched kernel of the kind is used if it has one. Return True if
+        successful.
         """
-        clock_devices = self.devices.find_devices(self.devices.CLOCK)
-        switch_devices = self.devices.find_devices(self.devices.SWITCH)
-        rc_devices = self.devices.find_devices(self.devices.RC)
-        d_type_devices = self.devices.find_devices(self.devices.D_TYPE)
-        and_devices = self.devices.find_devices(self.devices.AND)
-        or_devices = self.devices.find_devices(self.devices.OR)
-        nand_devices = self.devices.find_devices(self.devices.NAND)
-        nor_devices = self.devices.find_devices(self.devices.NOR)
-        xor_devices = self.devices.find_devices(self.devices.XOR)
+        if kind.execute_batch is not None:
+            return kind.execute_batch(self, device_ids)
+        for device_id in device_ids:
+            if not kind.execute(self, device_id):
+                return False
+        return True
 
-        # This sets clock signals to RISING or FALLING, where necessary
-        self.update_clocks()
+    def set_engine(self, engine):
+        """Set the engine that executes the network.
 
-        # Number of iterations to wait for the signals to settle before
-        # declaring the network unstable
-        iteration_limit = 20
+        engine is an object with an execute_network() method, such as an
+        instance of the events.EventEngine() class, or None for the default
+        sweep of all devices.
+        """
+        self.engine = engine
 
-        self.iterations = 0
-        while self.iterations < iteration_limit:
-            self.iterations += 1
-            self.steady_state = True
+    def set_cone(self, cone):
+        """Set the cone of influence that the default sweep is restricted to.
 
-            for device_id in switch_devices:  # execute switch devices
-                if not self.execute_switch(device_id):
-                    return False
-            for device_id in rc_devices: # execute RC devices
-                if not self.execute_rc(device_id):
-                    return False
-            # Execute D-type devices before clocks to catch the rising edge of
-            # the clock
-            for device_id in d_type_devices:  # execute DTYPE devices
-                if not self.execute_d_type(device_id):
-                    return False
-            for device_id in clock_devices:  # complete clock executions
-                if not self.execute_clock(device_id):
-                    return False
-            for device_id in and_devices:  # execute AND gate devices
-                if not self.execute_gate(device_id, self.devices.HIGH,
-                                         self.devices.HIGH):
-                    return False
-            for device_id in or_devices:  # execute OR gate devices
-                if not self.execute_gate(device_id, self.devices.LOW,
-                                         self.devices.LOW):
-                    return False
-            for device_id in nand_devices:  # execute NAND gate devices
-                if not self.execute_gate(device_id, self.devices.HIGH,
-                                         self.devices.LOW):
-                    return False
-            for device_id in nor_devices:  # execute NOR gate devices
-                if not self.execute_gate(device_id, self.devices.LOW,
-                                         self.devices.HIGH):
+        cone is an instance of the cone.ConeOfInfluence() class, or None to
+        execute every device. Only the devices in the cone are executed, so
+        the signals outside it are not kept up to date.
+        """
+        self.cone = cone
+        self.plan_version = None
+
+    def build_plan(self):
+        """Build the execution plan of the network and return it.
+
+        The plan is a list of (kind, device IDs) pairs, for the kinds with
+        devices in the order of the registry, so running a cycle does not
+        need to search the devices list. The positions of the devices in
+        this order, and the positions of the devices each one drives, are
+        kept for the worklist of execute_network. Spare positions are left
+        after the devices of each kind, for devices added later. With a cone
+        of influence, only the devices in the cone are in the plan.
+        """
+        self.plan = []
+        self.plan_positions = []
+        self.plan_order = []
+        self.plan_rank = {}
+        self.plan_regions = {}
+        cone = None if self.cone is None else self.cone.get_devices()
+        for kind in self.devices.registry.kinds:
+            device_ids = self.devices.find_devices(kind.kind_id)
+            if cone is not None:
+                device_ids = [device_id for device_id in device_ids
+                              if device_id in cone]
+            start = len(self.plan_order)
+            if device_ids:
+                self.plan.append((kind, device_ids))
+                self.plan_positions.append(
+                    list(range(start, start + len(device_ids))))
+            for device_id in device_ids:
+                self.plan_rank[device_id] = len(self.plan_order)
+                self.plan_order.append((kind, device_id))
+            spare = len(device_ids) // 4 + 8
+            self.plan_regions[kind.kind_id] = [len(self.plan_order),
+                                               len(self.plan_order) + spare]
+            self.plan_order.extend([None] * spare)
+        self.plan_fanout = [[] for _ in self.plan_order]
+        for device_id, position in self.plan_rank.items():
+            for connected_output in self.devices.get_device(
+                    device_id).inputs.values():
+                if (connected_output is not None
+                        and connected_output[0] in self.plan_rank):
+                    self.plan_fanout[self.plan_rank[
+                        connected_output[0]]].append(position)
+        self.plan_fanout = [sorted(set(targets))
+                            for targets in self.plan_fanout]
+        self.plan_version = self.devices.topology_version
+        if self.cone is not None:
+            self.plan_cone_version = self.cone.version
+        return self.plan
+
+    def get_plan(self):
+        """Return the execution plan, updating it if the topology changed.
+
+        The plan is rebuilt when the cone of influence changes.
+        """
+        if self.cone is not None and (
+                self.plan_cone_version != self.cone.version
+                or self.plan_version != self.devices.topology_version):
+            return self.build_plan()
+        elif self.plan_version != self.devices.topology_version:
+            return self.update_plan()
+        return self.plan
+
+    def update_plan(self):
+        """Update the execution plan with the topology edits and return it.
+
+        The devices and connections added or removed since the plan was
+        built are patched into it, so editing a large network does not
+        rebuild the plan. Return the plan rebuilt instead if some edits were
+        not recorded, a device changed kind, or there is no spare position
+        for a new device.
+        """
+        devices = self.devices
+        edits = devices.get_edits(self.plan_version)
+        if edits is None:
+            return self.build_plan()
+        for (edit_kind, device_id, input_id, signal) in edits:
+            if edit_kind == devices.DEVICE_ADDED:
+                if not self.add_to_plan(device_id):
+                    return self.build_plan()
+            elif edit_kind == devices.DEVICE_REMOVED:
+                self.remove_from_plan(device_id)
+            elif edit_kind == devices.DEVICE_CHANGED:
+                return self.build_plan()  # the device moves to another kind
+            elif edit_kind in [devices.CONNECTION_MADE,
+                               devices.CONNECTION_REMOVED]:
+                self.update_fanout(signal[0], device_id)
+        self.plan_version = devices.topology_version
+        return self.plan
+
+    def add_to_plan(self, device_id):
+        """Add a new device to the execution plan.
+
+        The device takes the next spare position of its kind, so it is
+        executed after the other devices of its kind, as if the plan had
+        been rebuilt. Return False if there is no spare position.
+        """
+        device = self.devices.get_device(device_id)
+        if device is None or device_id in self.plan_rank:
+            return True  # removed again, or added twice by a reused ID
+        region = self.plan_regions.get(device.device_kind)
+        if region is None or region[0] == region[1]:
+            return False
+        position = region[0]
+        region[0] += 1
+        kind = self.devices.registry.get_kind(device.device_kind)
+        self.plan_order[position] = (kind, device_id)
+        self.plan_rank[device_id] = position
+        for index, (plan_kind, device_ids) in enumerate(self.plan):
+            if plan_kind is kind:
+                device_ids.append(device_id)
+                self.plan_positions[index].append(position)
+                return True
+            if self.plan_positions[index][0] > position:
+                break
+        else:
+            index = len(self.plan)
+        self.plan.insert(index, (kind, [device_id]))
+        self.plan_positions.insert(index, [position])
+        return True
+
+    def remove_from_plan(self, device_id):
+        """Remove a device from the execution plan.
+
+        Its position is left empty until the plan is rebuilt.
+        """
+        position = self.plan_rank.pop(device_id, None)
+        if position is None:
+            return
+        kind, device_id = self.plan_order[position]
+        self.plan_order[position] = None
+        self.plan_fanout[position] = []
+        for index, (plan_kind, device_ids) in enumerate(self.plan):
+            if plan_kind is kind:
+                offset = self.plan_positions[index].index(position)
+                del device_ids[offset]
+                del self.plan_positions[index][offset]
+                if not device_ids:
+                    del self.plan[index]
+                    del self.plan_positions[index]
+                return
+
+    def update_fanout(self, driver_id, device_id):
+        """Make the plan match the connections from one device to another.
+
+        The device is in the fan-out of the driver if any of its inputs is
+        connected to one of the driver's outputs.
+        """
+        source = self.plan_rank.get(driver_id)
+        target = self.plan_rank.get(device_id)
+        if source is None or target is None:
+            return
+        device = self.devices.get_device(device_id)
+        connected = device is not None and any(
+            connected_output is not None and connected_output[0] == driver_id
+            for connected_output in device.inputs.values())
+        targets = self.plan_fanout[source]
+        index = bisect.bisect_left(targets, target)
+        present = index < len(targets) and targets[index] == target
+        if connected and not present:
+            targets.insert(index, target)
+        elif present and not connected:
+            del targets[index]
+
+    def execute_network(self):
+        """Execute all the devices in the network for one simulation cycle.
+
+        Unless another engine is set, every device is executed in the first
+        iteration, with the device kinds in the order of the registry. Later
+        iterations only execute the devices whose inputs have changed since
+        they were executed, or whose outputs are still RISING or FALLING, in
+        the same order, since the other devices would not change. Return True
+        if successful and the network settles within iteration_limit
+        iterations. Otherwise, oscillating_loops holds the groups of devices
+        that kept changing, if the sweep or the engine can tell which.
+        """
+        self.oscillating_loops = []
+        if self.engine is not None:
+            return self.engine.execute_network()
+
+        kind_devices = self.get_plan()
+
+        # This sets clock signals to RISING or FALLING, where necessary
+        for kind, device_ids in kind_devices:
+            if kind.start_cycle is not None:
+                kind.start_cycle(self, device_ids)
+
+        self.iterations = 1
+        changed = []  # positions of the devices that changed
+        for (kind, device_ids), positions in zip(kind_devices,
+                                                 self.plan_positions):
+            if kind.execute_batch is not None:
+                self.steady_state = True
+                if not kind.execute_batch(self, device_ids):
                     return False
-            for device_id in xor_devices:  # execute XOR devices
-                if not self.execute_gate(device_id, None, None):
+                if not self.steady_state:  # any of the devices may change
+                    changed.extend(positions)
+            else:
+                for device_id, position in zip(device_ids, positions):
+                    self.steady_state = True
+                    if not kind.execute(self, device_id):
+                        return False
+                    if not self.steady_state:
+                        changed.append(position)
+
+        agenda = set()
+        for position in changed:
+            self.schedule_change(position, agenda)
+        recent_changes = set(changed)  # changes in the last two iterations
+        while changed and self.iterations < self.iteration_limit:
+            self.iterations += 1
+            previous_changes = changed
+            changed = []
+            heap = sorted(agenda)
+            queued = agenda
+            agenda = set()
+            while heap:
+                position = heapq.heappop(heap)
+                kind, device_id = self.plan_order[position]
+                self.steady_state = True
+                if not kind.execute(self, device_id):
                     return False
-            if self.steady_state:
-                break
+                if self.steady_state:  # the outputs have not changed
+                    continue
+                changed.append(position)
+                # Later devices see the change in this iteration, the others
+                # in the next one
+                for target in self.plan_fanout[position]:
+                    if target > position and target not in queued:
+                        queued.add(target)
+                        heapq.heappush(heap, target)
+                self.schedule_change(position, agenda)
+            recent_changes = set(previous_changes) | set(changed)
+
+        self.steady_state = not changed
+        if not self.steady_state:
+            self.oscillating_loops = self.find_loops(
+                [self.plan_order[position][1]
+                 for position in sorted(recent_changes)])
+        self.devices.cycle += 1
         return self.steady_state
+
+    def schedule_change(self, position, agenda):
+        """Add the devices that must run again after a change to the agenda.
+
+        These are the devices driven by the device at the given position of
+        the plan that were executed before it in this iteration, and the
+        device itself if one of its outputs is still RISING or FALLING.
+        """
+        for target in self.plan_fanout[position]:
+            if target > position:
+                break
+            agenda.add(target)
+        kind, device_id = self.plan_order[position]
+        for signal in self.devices.get_device(device_id).outputs.values():
+            if signal in [self.devices.RISING, self.devices.FALLING]:
+                agenda.add(position)
+
+    def find_loops(self, device_ids):
+        """Return the feedback loops among the devices that kept changing.
+
+        Each loop is a strongly connected group of devices, as a list of
+        device IDs, that contains one of the changing devices. If the
+        changing devices are in no loop, they are returned as a single group,
+        since they did not settle within the iteration limit.
+        """
+        changing = set(device_ids)
+        successors = get_device_graph(self.devices)
+        loops = [component for component
+                 in strongly_connected_components(list(successors),
+                                                  successors)
+                 if changing.intersection(component) and (
+                     len(component) > 1
+                     or component[0] in successors[component[0]])]
+        if not loops and device_ids:
+            return [list(device_ids)]
+        return loops
+
+    def get_structure_digest(self):
+        """Return a hash of the devices and connections of the network."""
+        digest = hashlib.sha256()
+        for device in self.devices.devices_list:
+            digest.update(repr((device.device_id, device.device_kind,
+                                list(device.inputs.items()),
+                                list(device.outputs))).encode())
+        return digest.digest()
+
+    def checkpoint(self, monitors=None):
+        """Return the state of the simulation as a compact binary blob.
+
+        The blob holds the cycle count, all device outputs, the D-type
+        memories, switch states, clock phases and RC fall cycles, the
+        traces of the monitors if given, and the changes and evaluations
+        still pending in the engine, if it has any. Its format is
+        CHECKPOINT_MAGIC, the version as an unsigned 16 bit integer and a
+        SHA-256 hash of the structure of the network, followed by a
+        zlib-compressed payload: the lengths of an array of 64 bit integers
+        and of an array of 8 bit signals, then the two arrays, all
+        little-endian. Absent values are stored as -1.
+        """
+        devices = self.devices
+        integers = array.array("q", [devices.cycle])
+        signals = array.array("b")
+        for device in devices.devices_list:
+            signals.extend(-1 if signal is None else signal
+                           for signal in device.outputs.values())
+            integers.extend(-1 if value is None else value for value in [
+                device.dtype_memory, device.switch_state,
+                device.clock_phase, device.rc_fall_cycle])
+
+        traces = monitors.monitors_dictionary if monitors is not None else {}
+        integers.append(len(traces))
+        for (device_id, output_id), signal_list in traces.items():
+            integers.extend([device_id, -1 if output_id is None else output_id,
+                             len(signal_list)])
+            signals.extend(-1 if signal is None else signal
+                           for signal in signal_list)
+
+        events = ()
+        if self.engine is not None and hasattr(self.engine,
+                                               "get_pending_events"):
+            events = self.engine.get_pending_events()
+        changes = [event for event in events if isinstance(event, tuple)]
+        integers.append(len(changes))
+        for (offset, device_id, outputs) in changes:
+            integers.extend([offset, device_id, len(outputs)])
+            signals.extend(-1 if signal is None else signal
+                           for signal in outputs)
+        evaluations = [event for event in events
+                       if not isinstance(event, tuple)]
+        integers.append(len(evaluations))
+        integers.extend(evaluations)
+
+        if sys.byteorder == "big":
+            integers.byteswap()
+        payload = b"".join([struct.pack("<II", len(integers), len(signals)),
+                            integers.tobytes(), signals.tobytes()])
+        return b"".join([CHECKPOINT_MAGIC,
+                         struct.pack("<H", CHECKPOINT_VERSION),
+                         self.get_structure_digest(), zlib.compress(payload)])
+
+    def restore(self, blob, monitors=None):
+        """Return the simulation to the state stored by checkpoint.
+
+        The traces of the monitors are replaced if monitors is given, and the
+        pending changes are handed back to the engine if it takes them.
+        Return True if successful, or False if the blob is invalid or was
+        made from a network with different devices or connections.
+        """
+        devices = self.devices
+        header_length = len(CHECKPOINT_MAGIC) + 2
+        digest = self.get_structure_digest()
+        if (blob[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC
+                or blob[len(CHECKPOINT_MAGIC):header_length] != struct.pack(
+                    "<H", CHECKPOINT_VERSION)
+                or blob[header_length:header_length + len(digest)] != digest):
+            return False
+        try:
+            payload = zlib.decompress(blob[header_length + len(digest):])
+            integer_count, signal_count = struct.unpack_from("<II", payload)
+            integers = array.array("q")
+            integers.frombytes(payload[8:8 + 8 * integer_count])
+            signals = array.array("b")
+            signals.frombytes(payload[8 + 8 * integer_count:])
+        except (zlib.error, struct.error, ValueError):
+            return False
+        if sys.byteorder == "big":
+            integers.byteswap()
+        if len(integers) != integer_count or len(signals) != signal_count:
+            return False
+
+        integers = [None if value == -1 else value for value in integers]
+        signals = [None if signal == -1 else signal for signal in signals]
+        devices.cycle = integers[0]
+        integer_index = 1
+        signal_index = 0
+        for device in devices.devices_list:
+            for output_id in device.outputs:
+                device.outputs[output_id] = signals[signal_index]
+                signal_index += 1
+            [device.dtype_memory, device.switch_state, device.clock_phase,
+             device.rc_fall_cycle] = integers[integer_index:integer_index + 4]
+            integer_index += 4
+
+        devices.reschedule_timers()
+
+        traces = {}
+        for _ in range(integers[integer_index]):
+            device_id, output_id, length = integers[integer_index + 1:
+                                                    integer_index + 4]
+            traces[(device_id, output_id)] = signals[signal_index:
+                                                     signal_index + length]
+            integer_index += 3
+            signal_index += length
+        integer_index += 1
+        if monitors is not None:
+            # Through the monitor API, so that a cone of influence follows
+            for (device_id, output_id) in list(monitors.monitors_dictionary):
+                monitors.remove_monitor(device_id, output_id)
+            for (device_id, output_id), signal_list in traces.items():
+                monitors.make_monitor(device_id, output_id)
+                monitors.monitors_dictionary[(device_id, output_id)].extend(
+                    signal_list)
+
+        events = []
+        for _ in range(integers[integer_index]):
+            offset, device_id, length = integers[integer_index + 1:
+                                                 integer_index + 4]
+            events.append((offset, device_id,
+                           tuple(signals[signal_index:signal_index + length])))
+            integer_index += 3
+            signal_index += length
+        integer_index += 1
+        evaluation_count = integers[integer_index]
+        events.extend(integers[integer_index + 1:
+                               integer_index + 1 + evaluation_count])
+
+        if self.engine is not None:
+            self.engine.next_cycle = None  # the engine reloads its state
+            if events and hasattr(self.engine, "set_pending_events"):
+                self.engine.set_pending_events(events)
+        return True
@@ -0,0 +1,515 @@
+"""Optimise the logic network before it is simulated.
+
+Used in the Logic Simulator project to rewrite a built network into an
+equivalent one with fewer devices, so that each simulation cycle does less
+work.
+
+Classes
+-------
+Optimiser - rewrites the network into an equivalent, smaller network.
+"""
+from graph import strongly_connected_components, get_device_graph
+
+
+class Optimiser:
+    """Rewrite the network into an equivalent, smaller network.
+
+    Monitored signals are never removed, so the monitors keep working on the
+    optimised network. A signal that is removed is recorded as an alias of
+    its equivalent signal with Devices.add_alias, so its name still gives
+    the equivalent signal. Gates in feedback loops are left unchanged.
+
+    Parameters
+    ----------
+    names: instance of the names.Names() class.
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    monitors: instance of the monitors.Monitors() class.
+
+    Public methods
+    --------------
+    get_fanout_counts(self): Returns the number of inputs connected to each
+                             output.
+
+    evaluate_gate(self, device_kind, bits, table=None): Returns the output bit
+                                of a logic gate for the given input bits.
+
+    collapse_luts(self, max_inputs=4): Collapses fan-out-free clusters of
+                                       logic gates into look-up tables.
+
+    get_signal_users(self): Returns the inputs connected to each output.
+
+    get_order(self): Returns the device IDs in signal-flow order and the IDs
+                     of the devices in feedback loops.
+
+    replace_signal(self, signal, equivalent, users): Connects the inputs
+                    driven by a signal to an equivalent signal instead.
+
+    bypass_device(self, device, equivalent, users): Replaces the output of a
+                    device by an equivalent signal and removes the device.
+
+    fold_constants(self): Simplifies the gates driven by constant switches.
+
+    merge_identical_gates(self): Merges gates of the same kind with the same
+                                 inputs.
+
+    remove_buffers(self): Removes buffers and double inversions.
+
+    optimise(self): Runs the passes until they remove no more devices.
+    """
+
+    def __init__(self, names, devices, network, monitors):
+        """Initialise the optimiser."""
+        self.names = names
+        self.devices = devices
+        self.network = network
+        self.monitors = monitors
+
+        self.lut_kinds = self.devices.gate_types + [self.devices.LUT]
+        self.monitored_devices = set()  # IDs of the monitored devices
+
+    def get_fanout_counts(self):
+        """Return the number of inputs connected to each output.
+
+        The result is a dictionary {(device_id, output_id): count}. Monitored
+        outputs count as one extra connection.
+        """
+        fanout_counts = {}
+        for device in self.devices.devices_list:
+            for connected_output in device.inputs.values():
+                if connected_output is not None:
+                    fanout_counts[connected_output] = \
+                        fanout_counts.get(connected_output, 0) + 1
+        for signal in self.monitors.monitors_dictionary:
+            fanout_counts[signal] = fanout_counts.get(signal, 0) + 1
+        return fanout_counts
+
+    def evaluate_gate(self, device_kind, bits, table=None):
+        """Return the output bit of a logic gate for the given input bits."""
+        if device_kind == self.devices.AND:
+            return int(all(bits))
+        elif device_kind == self.devices.NAND:
+            return int(not all(bits))
+        elif device_kind == self.devices.OR:
+            return int(any(bits))
+        elif device_kind == self.devices.NOR:
+            return int(not any(bits))
+        elif device_kind == self.devices.XOR:
+            return sum(bits) % 2
+        elif device_kind == self.devices.LUT:
+            index = 0
+            for bit_number, bit in enumerate(bits):
+                index |= bit << bit_number
+            return (table >> index) & 1
+        return None
+
+    def collapse_luts(self, max_inputs=4):
+        """Collapse fan-out-free clusters of logic gates into look-up tables.
+
+        A gate is absorbed into the gate it drives if its output has no other
+        connections and is not monitored, and the cluster still has at most
+        max_inputs distinct inputs. Each cluster of two or more gates is
+        replaced by a single LUT device with the ID of the cluster's output
+        gate. Return the number of devices removed from the network.
+        """
+        fanout_counts = self.get_fanout_counts()
+        gates = {}
+        for device in self.devices.devices_list:
+            if (device.device_kind in self.lut_kinds
+                    and None not in device.inputs.values()):
+                gates[device.device_id] = device
+
+        # A gate can only be absorbed into the single gate that it drives
+        absorbable = {device_id for device_id in gates
+                      if fanout_counts.get((device_id, None), 0) == 1}
+        for device in self.devices.devices_list:
+            if device.device_id not in gates:
+                for connected_output in device.inputs.values():
+                    if connected_output is not None:
+                        absorbable.discard(connected_output[0])
+        for (device_id, output_id) in self.monitors.monitors_dictionary:
+            absorbable.discard(device_id)
+
+        # Gates whose output is shared, monitored or drives something other
+        # than a gate form the roots of the clusters. Loops made only of
+        # fan-out-free gates have no root and are left unchanged.
+        roots = [device_id for device_id in gates
+                 if device_id not in absorbable]
+
+        absorbed = set()
+        processed = set()
+        while roots:
+            root_id = roots.pop(0)
+            if root_id in processed:
+                continue
+            processed.add(root_id)
+            cluster, leaves = self._grow_cluster(root_id, gates, absorbable,
+                                                 absorbed, max_inputs)
+            # Gates that did not fit into this cluster start their own
+            for device_id in self._cluster_sources(cluster, gates):
+                if device_id not in processed and device_id not in absorbed:
+                    roots.append(device_id)
+            if len(cluster) > 1:
+                self._replace_cluster(root_id, cluster, leaves, gates)
+                absorbed.update(cluster - {root_id})
+
+        for device_id in absorbed:
+            self.devices.remove_device(device_id)
+        return len(absorbed)
+
+    def _grow_cluster(self, root_id, gates, absorbable, absorbed, max_inputs):
+        """Return the cluster of gates rooted at root_id and its inputs."""
+        cluster = {root_id}
+        leaves = list(dict.fromkeys(gates[root_id].inputs.values()))
+        if (root_id, None) in leaves:  # the gate drives itself
+            return cluster, leaves
+        grown = True
+        while grown:
+            grown = False
+            for leaf in leaves:
+                (device_id, port_id) = leaf
+                if (device_id not in absorbable or device_id in cluster
+                        or device_id in absorbed):
+                    continue
+                # Never absorb a gate in a loop through the cluster
+                if any(source_id in cluster or source_id == device_id
+                       for (source_id, port_id)
+                       in gates[device_id].inputs.values()):
+                    continue
+                new_leaves = [signal for signal in leaves if signal != leaf]
+                for signal in gates[device_id].inputs.values():
+                    if signal not in new_leaves:
+                        new_leaves.append(signal)
+                if len(new_leaves) <= max_inputs:
+                    cluster.add(device_id)
+                    leaves = new_leaves
+                    grown = True
+                    break
+        return cluster, leaves
+
+    def _cluster_sources(self, cluster, gates):
+        """Return the IDs of the gates driving the cluster from outside."""
+        sources = []
+        for device_id in cluster:
+            for (source_id, port_id) in gates[device_id].inputs.values():
+                if source_id in gates and source_id not in cluster:
+                    sources.append(source_id)
+        return sources
+
+    def _replace_cluster(self, root_id, cluster, leaves, gates):
+        """Turn the root of the cluster into a LUT with the cluster's logic."""
+        table = 0
+        for index in range(2 ** len(leaves)):
+            values = {leaf: (index >> bit_number) & 1
+                      for bit_number, leaf in enumerate(leaves)}
+            if self._evaluate_signal((root_id, None), values, gates):
+                table |= 1 << index
+
+        root = gates[root_id]
+        old_kind, old_inputs = root.device_kind, root.inputs
+        root.device_kind = self.devices.LUT
+        root.lut_table = table
+        root.inputs = dict(zip(
+            self.devices.get_gate_input_ids(len(leaves)), leaves))
+        self._record_change(root, old_kind, old_inputs)
+
+    def _evaluate_signal(self, signal, values, gates):
+        """Return the bit on signal, given the bits on the cluster inputs."""
+        if signal in values:
+            return values[signal]
+        device = gates[signal[0]]
+        bits = [self._evaluate_signal(connected_output, values, gates)
+                for connected_output in device.inputs.values()]
+        bit = self.evaluate_gate(device.device_kind, bits, device.lut_table)
+        values[signal] = bit
+        return bit
+
+    def get_signal_users(self):
+        """Return the inputs connected to each output.
+
+        The result is a dictionary {(device_id, output_id): list of
+        (Device, input_id)}.
+        """
+        users = {}
+        for device in self.devices.devices_list:
+            for input_id, connected_output in device.inputs.items():
+                if connected_output is not None:
+                    users.setdefault(connected_output, []).append(
+                        (device, input_id))
+        return users
+
+    def get_order(self):
+        """Return the device IDs in signal-flow order, and those in loops.
+
+        The second result is the set of the IDs of the devices in feedback
+        loops. Loops through the DATA input of a D-type are not counted.
+        """
+        successors = get_device_graph(self.devices,
+                                      cut_inputs=[self.devices.DATA_ID])
+        order = []
+        looped = set()
+        for component in strongly_connected_components(
+                self.devices.find_devices(), successors):
+            if len(component) > 1 or component[0] in successors[
+                    component[0]]:
+                looped.update(component)
+            order.extend(component)
+        return order, looped
+
+    def replace_signal(self, signal, equivalent, users):
+        """Connect the inputs driven by signal to the equivalent instead."""
+        devices = self.devices
+        for (device, input_id) in users.pop(signal, []):
+            device.inputs[input_id] = equivalent
+            users.setdefault(equivalent, []).append((device, input_id))
+            devices.record_edit(devices.CONNECTION_REMOVED, device.device_id,
+                                input_id, signal)
+            devices.record_edit(devices.CONNECTION_MADE, device.device_id,
+                                input_id, equivalent)
+
+    def bypass_device(self, device, equivalent, users):
+        """Replace the output of a gate by an equivalent signal.
+
+        The gate is removed unless it is monitored. Return the number of
+        devices removed.
+        """
+        signal = (device.device_id, None)
+        self.replace_signal(signal, equivalent, users)
+        if device.device_id in self.monitored_devices:
+            return 0
+        self._disconnect(device, users)
+        self.devices.add_alias(signal, equivalent)
+        self.devices.remove_device(device.device_id)
+        return 1
+
+    def fold_constants(self):
+        """Simplify the gates driven by constant switches.
+
+        A gate whose output is fixed by its constant inputs becomes an alias
+        of a constant switch with the same signal, or is turned into one if
+        there is none yet. Otherwise, its constant inputs are taken away,
+        and it is turned into a look-up table if it no longer fits its kind.
+        Return the number of devices removed.
+        """
+        devices = self.devices
+        self.monitored_devices = {device_id for (device_id, output_id)
+                                  in self.monitors.monitors_dictionary}
+        users = self.get_signal_users()
+        order, looped = self.get_order()
+        constants = {}  # stores {signal: LOW or HIGH} of constant signals
+        canonical = {}  # stores {LOW or HIGH: a constant switch signal}
+        removed = 0
+        for device_id in order:
+            device = devices.get_device(device_id)
+            if device.device_kind == devices.SWITCH and device.constant:
+                constants[(device_id, None)] = device.switch_state
+                canonical.setdefault(device.switch_state, (device_id, None))
+                continue
+            signals = list(device.inputs.values())
+            if (device.device_kind not in self.lut_kinds
+                    or device_id in looped or None in signals
+                    or not any(signal in constants for signal in signals)):
+                continue
+            result = self._fold_gate(device, signals, constants)
+            if isinstance(result, tuple):  # the gate is simplified
+                self._rewire_gate(device, *result, users)
+                continue
+            target = canonical.get(result)
+            if target is None or device_id in self.monitored_devices:
+                self._make_constant(device, result, users)
+                canonical.setdefault(result, (device_id, None))
+                constants[(device_id, None)] = result
+            else:
+                removed += self.bypass_device(device, target, users)
+        return removed
+
+    def merge_identical_gates(self):
+        """Merge gates of the same kind with the same inputs.
+
+        The inputs of a symmetric gate may come in any order. Every gate but
+        the first becomes an alias of the first. Return the number of
+        devices removed.
+        """
+        devices = self.devices
+        self.monitored_devices = {device_id for (device_id, output_id)
+                                  in self.monitors.monitors_dictionary}
+        users = self.get_signal_users()
+        order, looped = self.get_order()
+        first_gates = {}  # stores {(kind, table, inputs): device_id}
+        removed = 0
+        for device_id in order:
+            device = devices.get_device(device_id)
+            signals = tuple(device.inputs.values())
+            if (device.device_kind not in self.lut_kinds
+                    or device_id in looped or None in signals):
+                continue
+            if device.device_kind != devices.LUT:
+                signals = tuple(sorted(signals, key=self._signal_order))
+            key = (device.device_kind, device.lut_table, signals)
+            if key not in first_gates:
+                first_gates[key] = device_id
+            else:
+                removed += self.bypass_device(
+                    device, (first_gates[key], None), users)
+        return removed
+
+    def remove_buffers(self):
+        """Remove buffers and double inversions.
+
+        A buffer becomes an alias of its input, and an inverter driven by an
+        inverter becomes an alias of the input of the first inverter. Return
+        the number of devices removed.
+        """
+        devices = self.devices
+        self.monitored_devices = {device_id for (device_id, output_id)
+                                  in self.monitors.monitors_dictionary}
+        users = self.get_signal_users()
+        order, looped = self.get_order()
+        removed = 0
+        for device_id in order:
+            device = devices.get_device(device_id)
+            if (device.device_kind not in self.lut_kinds
+                    or device_id in looped or len(device.inputs) != 1):
+                continue
+            [signal] = device.inputs.values()
+            if signal is None:
+                continue
+            if self._is_buffer(device):
+                removed += self.bypass_device(device, signal, users)
+            elif self._is_inverter(device) and signal[1] is None:
+                driver = devices.get_device(signal[0])
+                if (driver.device_kind in self.lut_kinds
+                        and driver.device_id not in looped
+                        and self._is_inverter(driver)
+                        and None not in driver.inputs.values()):
+                    [driver_signal] = driver.inputs.values()
+                    removed += self.bypass_device(device, driver_signal,
+                                                  users)
+        return removed
+
+    def optimise(self):
+        """Run the passes until they remove no more devices.
+
+        Constants are folded first, then identical gates merged, then
+        buffers and double inversions removed. Return the number of devices
+        removed.
+        """
+        removed = 0
+        while True:
+            count = (self.fold_constants() + self.merge_identical_gates()
+                     + self.remove_buffers())
+            if not count:
+                return removed
+            removed += count
+
+    def _signal_order(self, signal):
+        """Return a sort key for a (device_id, output_id) signal."""
+        (device_id, output_id) = signal
+        return (device_id, -1 if output_id is None else output_id)
+
+    def _is_buffer(self, device):
+        """Return True if the gate copies its single input."""
+        devices = self.devices
+        if len(device.inputs) != 1:
+            return False
+        if device.device_kind == devices.LUT:
+            return device.lut_table == 0b10
+        return device.device_kind in [devices.AND, devices.OR]
+
+    def _is_inverter(self, device):
+        """Return True if the gate inverts its single input."""
+        devices = self.devices
+        if len(device.inputs) != 1:
+            return False
+        if device.device_kind == devices.LUT:
+            return device.lut_table == 0b01
+        return device.device_kind in [devices.NAND, devices.NOR]
+
+    def _fold_gate(self, device, signals, constants):
+        """Return the simplified gate, given its constant inputs.
+
+        Return LOW or HIGH if the output is constant, or else a tuple (kind,
+        input signals, table) of the simplified gate, where table is None
+        unless kind is LUT.
+        """
+        devices = self.devices
+        kind = device.device_kind
+        free = list(dict.fromkeys(signal for signal in signals
+                                  if signal not in constants))
+        bits = [constants[signal] for signal in signals if signal in constants]
+        if kind in [devices.AND, devices.NAND, devices.OR, devices.NOR]:
+            # The value that decides the output, and the output it gives
+            controlling = devices.LOW if kind in [devices.AND,
+                                                  devices.NAND] else (
+                devices.HIGH)
+            if controlling in bits or not free:
+                return self.evaluate_gate(kind, bits)
+            return (kind, free, None)
+        elif kind == devices.XOR:
+            if not free:
+                return self.evaluate_gate(kind, bits)
+            # XOR with a constant is a buffer or an inverter
+            buffer_kind = devices.NAND if sum(bits) % 2 else devices.AND
+            return (buffer_kind, free, None)
+        # Look-up table: the part of the table for the constant inputs
+        table = 0
+        values = {signal: constants[signal] for signal in signals
+                  if signal in constants}
+        for index in range(1 << len(free)):
+            values.update((signal, (index >> bit) & 1)
+                          for bit, signal in enumerate(free))
+            if self.evaluate_gate(kind, [values[signal] for signal in signals],
+                                  device.lut_table):
+                table |= 1 << index
+        if table == 0:
+            return devices.LOW
+        elif table == (1 << (1 << len(free))) - 1:
+            return devices.HIGH
+        return (kind, free, table)
+
+    def _rewire_gate(self, device, kind, signals, table, users):
+        """Make the gate a gate of the given kind with the given inputs."""
+        old_kind, old_inputs = device.device_kind, device.inputs
+        self._disconnect(device, users)
+        device.device_kind = kind
+        device.lut_table = table
+        device.inputs = dict(zip(
+            self.devices.get_gate_input_ids(len(signals)), signals))
+        for input_id, signal in device.inputs.items():
+            users.setdefault(signal, []).append((device, input_id))
+        self._record_change(device, old_kind, old_inputs)
+
+    def _make_constant(self, device, signal, users):
+        """Turn the gate into a constant switch with the given signal."""
+        devices = self.devices
+        old_kind, old_inputs = device.device_kind, device.inputs
+        self._disconnect(device, users)
+        device.device_kind = devices.SWITCH
+        device.lut_table = None
+        device.inputs = {}
+        device.outputs[None] = signal
+        device.switch_state = signal
+        device.constant = True
+        self._record_change(device, old_kind, old_inputs)
+
+    def _record_change(self, device, old_kind, old_inputs):
+        """Record the edits of a device changed in place.
+
+        The old inputs are recorded as disconnected and the new ones as
+        connected, with the change of kind in between, if any.
+        """
+        devices = self.devices
+        device_id = device.device_id
+        for input_id, signal in old_inputs.items():
+            devices.record_edit(devices.CONNECTION_REMOVED, device_id,
+                                input_id, signal)
+        if device.device_kind != old_kind:
+            devices.record_edit(devices.DEVICE_CHANGED, device_id)
+        for input_id, signal in device.inputs.items():
+            devices.record_edit(devices.CONNECTION_MADE, device_id, input_id,
+                                signal)
+
+    def _disconnect(self, device, users):
+        """Take the inputs of the device out of the users of its drivers."""
+        for input_id, signal in device.inputs.items():
+            users[signal].remove((device, input_id))
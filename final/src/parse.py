@@ -144,6 +144,7 @@ class Parser:
 
         self.devices_defined: Dict = {}
         self.device_types: List = []
+        self.device_delays: Dict = {}  # stores {definition index: delay}
 
         self.out_ports: List[Tuple[str, Union[str, int]]] = []
         self.connections_defined: List = []
@@ -297,13 +298,21 @@ class Parser:
             - False for unexpected keyword
             - None for unexpected EOF
         EBNF:
-        device type = ("CLOCK", parameter) | ("SWITCH", parameter) |
+        device type = ("CLOCK", clock_parameter) | ("SWITCH", parameter) |
                       ("AND", parameter) | ("NAND", parameter) |
                       ("OR", parameter) | ("NOR", parameter) |
-                       "XOR" | "DTYPE" | ("RC", parameter);
+                       "XOR" | "DTYPE" | ("RC", parameter) |
+                      ("LUT", "[", number, ",", table, "]") |
+                      ("SIGGEN", "[", bit, {bit}, "]");
               parameter = "[", digit, {digit}, "]" ;
+              clock_parameter = "[", number, [",", number, ",", number],
+                                "]" ;
+              table = number | ("0x", hexdigit, {hexdigit}) ;
+              delay = ":", digit, {digit} ;
+        The optional delay follows the device type.
         """
-        if self.symbol.type != self.scanner.DEVICE:
+        kind = self.devices.registry.query(self.decode())
+        if self.symbol.type != self.scanner.DEVICE or kind is None:
             #  Invalid Symbol
             self.error_handler.log_error("Syn", 6, 0)
             self.scanner.print_line_error()
@@ -319,9 +328,7 @@ class Parser:
 
         parameter = None
 
-        if device_type in {
-                "CLOCK", "SWITCH", "AND", "NAND", "OR", "NOR", "RC"
-                }:  # PARAMETER REQUIRED
+        if kind.parameter is not None:  # PARAMETER REQUIRED
 
             if self.decode() != "[":
                 self.counter -= 1
@@ -349,28 +356,54 @@ class Parser:
                 self.scanner.print_line_error()
                 return False
 
-            parameter = int(self.scanner.decode(self.symbol))  # self.symbol.id
-
-            if device_type == "SWITCH" and parameter not in {0, 1}:
-                self.counter -= 1
-                self.devices_defined.popitem()
-                self.error_handler.log_error("Sem", 10, 0)
-                self.scanner.print_line_error()
-                return False
-            elif device_type not in {"CLOCK", "RC" } and parameter > 16:
+            parameter_string = self.scanner.decode(self.symbol)
+            try:
+                parameter = int(parameter_string)  # self.symbol.id
+            except ValueError:  # hexadecimal parameter
                 self.counter -= 1
                 self.devices_defined.popitem()
-                self.error_handler.log_error("Sem", 10, 0)
+                self.error_handler.log_error("Syn", 4, 0)
                 self.scanner.print_line_error()
                 return False
-            elif device_type in {"CLOCK", "RC"} and parameter == 0:
+
+            if kind.parameter == "bits":
+                # The bit pattern keeps its leading zeros
+                parameter = parameter_string
+            elif kind.parameter == "table":
+                # The truth table follows the number of inputs
+                table_check = 0
+                if parameter != 0:
+                    table_check = self._lut_table(parameter)
+                if table_check is None or table_check is False:
+                    self.counter -= 1
+                    self.devices_defined.popitem()
+                    return table_check
+                parameter = (parameter, table_check)
+            elif kind.parameter == "clock":
+                # The high time and phase may follow the half period
+                timing = self._clock_timing()
+                if timing is None or timing is False:
+                    self.counter -= 1
+                    self.devices_defined.popitem()
+                    return timing
+                if timing:
+                    parameter = (parameter,) + timing
+
+            if kind.validate(self.devices, parameter) != self.devices.NO_ERROR:
                 self.counter -= 1
                 self.devices_defined.popitem()
-                self.error_handler.log_error("Sem", 3, 0)
+                if parameter == 0 and not kind.input_names(parameter):
+                    # Clocks and RC devices cannot have a zero period
+                    self.error_handler.log_error("Sem", 3, 0)
+                else:
+                    self.error_handler.log_error("Sem", 10, 0)
                 self.scanner.print_line_error()
                 return False
 
-            if not self.next_symbol():
+            if kind.parameter == "clock":
+                pass  # the closing bracket has been read with the timing
+
+            elif not self.next_symbol():
                 #  Unexpected EOF
                 self.counter -= 1
                 self.devices_defined.popitem()
@@ -395,7 +428,7 @@ class Parser:
                 self.scanner.print_line_error()
                 return None
         else:
-            if self.decode() != ";":
+            if self.decode() not in [";", ":"]:
                 self.counter -= 1
                 self.devices_defined.popitem()
                 # self.devices_defined.pop(list(self.devices_defined)[-1])
@@ -403,6 +436,14 @@ class Parser:
                 self.scanner.print_line_error()
                 return False
 
+        if self.decode() == ":":  # the propagation delay follows
+            delay = self._device_delay()
+            if delay is None or delay is False:
+                self.counter -= 1
+                self.devices_defined.popitem()
+                return delay
+            self.device_delays[self.counter] = delay
+
         self.device_types.append((device_type, parameter))
 
         if self.decode() != ";":
@@ -413,6 +454,146 @@ class Parser:
 
         return True
 
+    def _device_kind(self, device_name):
+        """Return the kind and the parameter of a defined device."""
+        device_type, parameter = self.device_types[
+            self.devices_defined[device_name]]
+        return self.devices.registry.query(device_type), parameter
+
+    def _clock_timing(self) -> Union[tuple, bool, None]:
+        """
+        Return the following.
+
+            - The pair (high time, phase) if they are given
+            - An empty tuple if they are not
+            - False for invalid timing
+            - None for unexpected EOF
+        The closing bracket is read too.
+        EBNF: [",", number, ",", number], "]" ;
+        """
+        timing = []
+        while True:
+            if not self.next_symbol():
+                #  Unexpected EOF
+                self.error_handler.log_error("Syn", 5, 0)
+                self.scanner.print_line_error()
+                return None
+
+            elif self.decode() == "]" and len(timing) != 1:
+                return tuple(timing)
+
+            elif self.decode() != "," or len(timing) == 2:
+                self.error_handler.log_error("Syn", 8, 0)
+                self.scanner.print_line_error()
+                return False
+
+            if not self.next_symbol():
+                #  Unexpected EOF
+                self.error_handler.log_error("Syn", 5, 0)
+                self.scanner.print_line_error()
+                return None
+
+            elif self.symbol.type != self.scanner.NUMBER:
+                # Parameter Letter Error
+                self.error_handler.log_error("Syn", 4, 0)
+                self.scanner.print_line_error()
+                return False
+
+            try:
+                timing.append(int(self.decode()))
+            except ValueError:  # hexadecimal number
+                self.error_handler.log_error("Syn", 4, 0)
+                self.scanner.print_line_error()
+                return False
+
+    def _device_delay(self) -> Union[int, bool, None]:
+        """
+        Return the following.
+
+            - The propagation delay for successful parsing
+            - False for an invalid delay
+            - None for unexpected EOF
+        The symbol after the delay is read too.
+        EBNF: ":", digit, {digit} ;
+        """
+        if not self.next_symbol():
+            #  Unexpected EOF
+            self.error_handler.log_error("Syn", 5, 0)
+            self.scanner.print_line_error()
+            return None
+
+        elif self.symbol.type != self.scanner.NUMBER:
+            # Parameter Letter Error
+            self.error_handler.log_error("Syn", 4, 0)
+            self.scanner.print_line_error()
+            return False
+
+        try:
+            delay = int(self.decode())
+        except ValueError:  # hexadecimal number
+            self.error_handler.log_error("Syn", 4, 0)
+            self.scanner.print_line_error()
+            return False
+
+        if not self.next_symbol():
+            #  Unexpected EOF
+            self.error_handler.log_error("Syn", 5, 0)
+            self.scanner.print_line_error()
+            return None
+        return delay
+
+    def _lut_table(self, no_of_inputs: int) -> Union[int, bool, None]:
+        """
+        Return the following.
+
+            - The truth table for successful parsing
+            - False for an invalid table
+            - None for unexpected EOF
+        EBNF: ",", table ;
+        """
+        if not self.next_symbol():
+            #  Unexpected EOF
+            self.error_handler.log_error("Syn", 5, 0)
+            self.scanner.print_line_error()
+            return None
+
+        elif self.decode() != ",":
+            self.error_handler.log_error("Syn", 8, 0)
+            self.scanner.print_line_error()
+            return False
+
+        if not self.next_symbol():
+            #  Unexpected EOF
+            self.error_handler.log_error("Syn", 5, 0)
+            self.scanner.print_line_error()
+            return None
+
+        elif self.symbol.type != self.scanner.NUMBER:
+            # Parameter Letter Error
+            self.error_handler.log_error("Syn", 4, 0)
+            self.scanner.print_line_error()
+            return False
+
+        table_string = self.decode()
+        try:
+            if table_string[:2] in {"0x", "0X"}:
+                table = int(table_string, 16)
+            else:
+                table = int(table_string)
+        except ValueError:  # "0x" without any digits
+            self.error_handler.log_error("Syn", 4, 0)
+            self.scanner.print_line_error()
+            return False
+
+        if (no_of_inputs not in range(1, self.devices.max_lut_inputs + 1)
+                or table.bit_length() > 1 << no_of_inputs):
+            # Bad input count, or the table has more than 2^k bits
+            self.error_handler.log_error("Sem", 10, 0)
+            self.scanner.print_line_error()
+            return False
+
+        return table
+
     def _device_def(self) -> Union[bool, None]:
         """
         Return the following.
@@ -583,10 +764,9 @@ class Parser:
             return None
 
         out_pin_arg = None
+        out_kind, out_parameter = self._device_kind(out_pin)
         # Check the case when the output port needs arguments
-        if self.device_types[
-                self.devices_defined[out_pin]
-                ][0] == "DTYPE":
+        if out_kind.output_names != [None]:
             if self.decode() != ".":
                 self.error_handler.log_error("Syn", 6, 1)
                 #  Invalid Symbol for now
@@ -598,7 +778,7 @@ class Parser:
                 self.scanner.print_line_error()
                 return None
 
-            if not (self.decode() in {"Q", "QBAR"} and
+            if not (self.decode() in out_kind.output_names and
                     self.symbol.type == self.scanner.KEYWORD
                     ):
                 self.error_handler.log_error("Syn", 6, 1)
@@ -648,34 +828,12 @@ class Parser:
             self.scanner.print_line_error()
             return None
         in_pin_arg = self.decode()
-        # Check the case when the input port needs arguments
-        if self.device_types[self.devices_defined[in_pin]][0] == "DTYPE":
-            if in_pin_arg not in {"DATA", "CLK", "SET", "CLEAR"}:
-                self.error_handler.log_error("Sem", 9, 1)
-                self.scanner.print_line_error()
-                return False
-
-        elif self.device_types[self.devices_defined[in_pin]][0] == "XOR":
-            if in_pin_arg not in {"I1", "I2"}:
-                self.error_handler.log_error("Sem", 9, 1)
-                self.scanner.print_line_error()
-                return False
-        else:
-            # The current symbol is of the form  I + number
-            if in_pin_arg[0] != "I":
-                self.error_handler.log_error("Syn", 6, 1)
-                self.scanner.print_line_error()
-                return False
-            try:
-                x = int(in_pin_arg[1:])  # TODO !!!!!
-                if x > self.device_types[self.devices_defined[in_pin]][1]:
-                    self.error_handler.log_error("Sem", 9, 1)
-                    self.scanner.print_line_error()
-                    return False
-            except ValueError as e:  # invalid input
-                self.error_handler.log_error("Sem", 9, 1)
-                self.scanner.print_line_error()
-                return False
+        # Check the input port is one of the ports of the device
+        in_kind, in_parameter = self._device_kind(in_pin)
+        if in_pin_arg not in in_kind.input_names(in_parameter):
+            self.error_handler.log_error("Sem", 9, 1)
+            self.scanner.print_line_error()
+            return False
 
         # want to check if connection already exists
         for conn2 in self.connections_defined:
@@ -822,8 +980,8 @@ class Parser:
                 self.scanner.print_line_error()
                 return None
             param = self.decode()
-            devType = self.device_types[self.devices_defined[monitor]][0]
-            if devType != "DTYPE" or param not in {"Q", "QBAR"}:
+            monitor_kind, monitor_parameter = self._device_kind(monitor)
+            if param not in monitor_kind.output_names:
                 self.error_handler.log_error("Sem", 11, 2)
                 self.scanner.print_line_error()
                 return False
@@ -872,9 +1030,9 @@ class Parser:
                     self.scanner.print_line_error()
                     return None
                 param = self.decode()
-                devType = self.device_types[self.devices_defined[monitor]][0]
+                monitor_kind, monitor_parameter = self._device_kind(monitor)
 
-                if devType != "DTYPE" or param not in {"Q", "QBAR"}:
+                if param not in monitor_kind.output_names:
                     self.error_handler.log_error("Sem", 11, 2)
                     self.scanner.print_line_error()
                     return False
@@ -910,6 +1068,11 @@ class Parser:
                 )
 
             if errorOut == self.devices.NO_ERROR:
+                delay = self.device_delays.get(
+                    self.devices_defined[device_name])
+                if delay is not None:
+                    self.devices.get_device(
+                        self.names.query(device_name)).delay = delay
                 print(f"SUCCESFUL CREATION OF {device_name},"
                       f" {device_kind}, {device_property}")
             else:
@@ -947,13 +1110,11 @@ class Parser:
         # Check each input pin has been assigned:
         errorCount = 0
         for deviceToCheck in self.devices_defined:
-            deviceType = self.device_types[
-                self.devices_defined[deviceToCheck]][0]
-            numConnects = self.device_types[
-                self.devices_defined[deviceToCheck]][1]
+            deviceKind, deviceParameter = self._device_kind(deviceToCheck)
+            numConnects = len(deviceKind.input_names(deviceParameter))
 
-            # Exceptions for SWITCH, RC and CLOCK; they cannot have inputs
-            if deviceType in ["SWITCH", "CLOCK","RC"]:
+            # Exceptions for devices without inputs, such as SWITCH
+            if numConnects == 0:
                 continue
             # Count up number of connections
             conCount = 0
@@ -963,23 +1124,7 @@ class Parser:
                     conCount += 1
                 # print(conCount) # DEBUG
             # If not equal to specified number, error
-            if deviceType == "DTYPE":
-                if conCount == 4:
-                    continue
-                else:
-                    self.error_handler.log_error("Sem", 1, 1)
-                    print("        Device:", deviceToCheck)
-                    errorCount += 1
-                    continue
-            elif deviceType == "XOR":
-                if conCount == 2:
-                    continue
-                else:
-                    self.error_handler.log_error("Sem", 1, 1)
-                    print("        Device:", deviceToCheck)
-                    errorCount += 1
-                    continue
-            elif conCount != numConnects:
+            if conCount != numConnects:
                 self.error_handler.log_error("Sem", 1, 1)
                 print("        Device:", deviceToCheck)
                 errorCount += 1
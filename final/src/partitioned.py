@@ -0,0 +1,613 @@
+"""Execute one large network in several worker processes.
+
+Used in the Logic Simulator project to simulate networks too large for one
+processor. The devices are split into partitions with few connections
+between them, each partition is executed by its own worker process, and
+only the signals that cross between partitions are exchanged, through
+shared memory.
+
+Classes
+-------
+PartitionedEngine - executes the partitions of the network in worker
+                    processes.
+
+Functions
+---------
+report_speedup(devices, network, cycles, partition_counts) - prints the time
+                taken with each number of partitions and returns the
+                speedups.
+"""
+import collections
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+import weakref
+from multiprocessing import shared_memory
+
+from levelize import LevelizedEngine
+
+# Value stored in shared memory for a signal that is not set
+NO_SIGNAL = 255
+# Signal stored as each value in shared memory
+DECODE = list(range(5)) + [None] * (NO_SIGNAL - 4)
+# Commands given to the workers at the start of each cycle
+[RUN, RELOAD, STOP] = range(3)
+# Statuses reported by the workers at the end of each cycle
+[FAILED, SETTLED, UNSETTLED] = range(3)
+
+
+class PartitionedEngine:
+    """Execute the partitions of the network in worker processes.
+
+    The network is sorted into strongly connected components as in the
+    levelized.LevelizedEngine() class, and each component is placed in one
+    partition, so feedback loops are always settled by a single worker. The
+    components are placed in topological order, each in the partition that
+    holds most of its drivers unless that partition is full, and are then
+    moved to the partition that holds most of their neighbours whenever
+    that cuts fewer connections.
+
+    In each cycle, this process updates the switches, clocks, signal
+    generators and RC devices, and the workers then evaluate their
+    components in phases. A phase only ends where a signal crosses to
+    another partition, and the crossing signals are exchanged through
+    shared memory between phases, so every device sees the same signals as
+    in the levelized engine and the traces are the same. At the end of the
+    cycle the outputs and D-type memories are copied back into the Device
+    objects, so monitors and get_output_signal keep working. The workers
+    reload the whole state after a cold start-up or a restored checkpoint.
+
+    The workers are started when the plan is built, and stopped by close()
+    or when the engine is garbage collected. A daemonic process, such as a
+    worker of a multiprocessing pool, cannot start workers, so there the
+    network is executed by the levelized engine in the same process.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    partitions: number of partitions, and of worker processes, all the
+                available processors by default.
+    iteration_limit: number of passes through a feedback loop to wait for
+                     its signals to settle before declaring the network
+                     unstable.
+
+    Public methods
+    --------------
+    build_plan(self): Splits the network into partitions and starts the
+                      worker processes.
+
+    split(self, drivers, weights, count): Returns the partition of each
+                                          component.
+
+    get_cut_size(self): Returns the number of connections between
+                        partitions.
+
+    execute_network(self): Executes all the devices for one simulation
+                           cycle.
+
+    close(self): Stops the worker processes.
+    """
+
+    def __init__(self, devices, network, partitions=None,
+                 iteration_limit=20):
+        """Initialise the engine. The plan is built on the first cycle."""
+        self.devices = devices
+        self.network = network
+        self.partitions = partitions or multiprocessing.cpu_count()
+        self.iteration_limit = iteration_limit
+        self.levelized = LevelizedEngine(devices, network, iteration_limit)
+
+        self.topology_version = None  # version the plan was built for
+        self.next_cycle = None  # cycle expected to be executed next
+        self.partition_of = []  # partition of each component
+        self.phase_count = 0
+        self.cut_size = 0
+
+        self.workers = []
+        self.finalizer = None  # stops the workers and frees shared memory
+        self.signals = None  # shared signals, as bytes
+        self.control = None  # shared commands and statuses, as integers
+        self.start_barrier = None
+        self.end_barrier = None
+        self.ports = []  # (outputs, output ID, slot) of every signal
+        self.source_ports = []  # (outputs, output ID, slot) of the sources
+        self.synced_ports = []  # (outputs, output ID, slot) of the others
+        self.d_type_slots = []  # (device, memory slot, CLK slot)
+        self.data_slots = []  # (device, DATA sample slot)
+
+    def __getstate__(self):
+        """Return the state to pickle, without the worker processes."""
+        return {"devices": self.devices, "network": self.network,
+                "partitions": self.partitions,
+                "iteration_limit": self.iteration_limit}
+
+    def __setstate__(self, state):
+        """Restore a pickled engine. The plan is built on the first cycle."""
+        self.__init__(state["devices"], state["network"],
+                      state["partitions"], state["iteration_limit"])
+
+    def build_plan(self):
+        """Split the network into partitions and start the worker processes.
+
+        Each worker gets the list of components it evaluates in each phase,
+        and the shared memory slots of the signals it sends and receives.
+        """
+        self.close()
+        devices = self.devices
+        levelized = self.levelized
+        levelized.build_plan()
+        components = levelized.components
+        component_of = {}
+        for number, members in enumerate(components):
+            for (kind, device, inputs) in members:
+                component_of[device.device_id] = number
+
+        # Connections between components that carry signals within a cycle
+        drivers = [[] for _ in components]
+        for number, members in enumerate(components):
+            for (kind, device, inputs) in members:
+                for input_id, connected_output in device.inputs.items():
+                    if (connected_output is None
+                            or input_id == devices.DATA_ID):
+                        continue
+                    driver = component_of.get(connected_output[0])
+                    if driver is not None and driver != number:
+                        drivers[number].append(driver)
+        count = min(self.partitions, len(components))
+        self.partition_of = self.split(drivers, [len(members) for members
+                                                 in components], count)
+        partition_of = self.partition_of
+        self.cut_size = sum(partition_of[driver] != partition_of[number]
+                            for number in range(len(components))
+                            for driver in drivers[number])
+
+        # A new phase starts at the first level reached by a signal that
+        # crosses from another partition in the current phase
+        levels = []
+        for number in range(len(components)):
+            levels.append(max((levels[driver] + 1 for driver
+                               in drivers[number]), default=0))
+        crossing_from = {}  # stores {level: latest level crossed from}
+        for number in range(len(components)):
+            for driver in drivers[number]:
+                if partition_of[driver] != partition_of[number]:
+                    crossing_from[levels[number]] = max(
+                        crossing_from.get(levels[number], -1),
+                        levels[driver])
+        phase_of_level = []
+        phase_start = 0
+        for level in range(max(levels, default=-1) + 1):
+            if crossing_from.get(level, -1) >= phase_start:
+                phase_start = level
+                phase_of_level.append(phase_of_level[-1] + 1)
+            else:
+                phase_of_level.append(phase_of_level[-1] if phase_of_level
+                                      else 0)
+        phase_of = [phase_of_level[level] for level in levels]
+        self.phase_count = phase_of_level[-1] + 1 if phase_of_level else 0
+
+        # Shared memory holds every signal, then the memory, last CLK signal
+        # and DATA sample of every D-type, then the commands and statuses
+        slot_of = {}
+        self.ports = []
+        self.source_ports = []
+        self.synced_ports = []
+        for device in devices.devices_list:
+            for output_id in device.outputs:
+                port = (device.outputs, output_id, len(self.ports))
+                slot_of[(device.device_id, output_id)] = len(self.ports)
+                self.ports.append(port)
+                if device.device_id in component_of:
+                    self.synced_ports.append(port)
+                else:
+                    self.source_ports.append(port)
+        d_types = [device for (device, data_driver, data_port)
+                   in levelized.d_types]
+        self.d_type_slots = [
+            (device, len(self.ports) + number,
+             len(self.ports) + len(d_types) + number)
+            for number, device in enumerate(d_types)]
+        self.data_slots = [(device, len(self.ports) + 2 * len(d_types)
+                            + number)
+                           for number, device in enumerate(d_types)]
+        signal_count = len(self.ports) + 3 * len(d_types)
+        control_offset = -(-signal_count // 8) * 8
+        control_count = 2 + 2 * count
+
+        specs = [{"phases": [[] for _ in range(self.phase_count)],
+                  "start_imports": set(), "outputs": [], "d_types": [],
+                  "data_slots": [],
+                  "imports": [set() for _ in range(self.phase_count)],
+                  "exports": [set() for _ in range(self.phase_count)]}
+                 for _ in range(count)]
+        for number, members in enumerate(components):
+            spec = specs[partition_of[number]]
+            spec["phases"][phase_of[number]].append(number)
+            for (kind, device, inputs) in members:
+                for output_id in device.outputs:
+                    spec["outputs"].append((device.device_id, output_id,
+                                            slot_of[(device.device_id,
+                                                     output_id)]))
+                for input_id, connected_output in device.inputs.items():
+                    if connected_output is None:
+                        continue
+                    slot = slot_of[connected_output]
+                    driver = component_of.get(connected_output[0])
+                    if driver is None or input_id == devices.DATA_ID:
+                        if driver is None or partition_of[driver] != \
+                                partition_of[number]:
+                            spec["start_imports"].add(connected_output +
+                                                      (slot,))
+                    elif partition_of[driver] != partition_of[number]:
+                        specs[partition_of[driver]]["exports"][
+                            phase_of[driver]].add(connected_output + (slot,))
+                        spec["imports"][phase_of[driver]].add(
+                            connected_output + (slot,))
+        for (device, memory_slot, clock_slot) in self.d_type_slots:
+            specs[partition_of[component_of[device.device_id]]][
+                "d_types"].append((device.device_id, memory_slot,
+                                   clock_slot))
+        for (device, data_slot) in self.data_slots:
+            specs[partition_of[component_of[device.device_id]]][
+                "data_slots"].append((device.device_id, data_slot))
+
+        self.topology_version = devices.topology_version
+        self.next_cycle = None
+        if count == 0 or multiprocessing.current_process().daemon:
+            return  # daemonic processes cannot start workers
+
+        context = multiprocessing.get_context()
+        memory = shared_memory.SharedMemory(
+            create=True, size=control_offset + 4 * control_count)
+        self.start_barrier = context.Barrier(count + 1)
+        self.end_barrier = context.Barrier(count + 1)
+        barriers = (self.start_barrier, context.Barrier(count),
+                    self.end_barrier)
+        network_blob = pickle.dumps((devices, self.network))
+        for partition, spec in enumerate(specs):
+            spec.update(partition=partition, signal_count=signal_count,
+                        control_offset=control_offset,
+                        control_count=control_count,
+                        iteration_limit=self.iteration_limit)
+            worker = context.Process(target=_run_worker, daemon=True,
+                                     args=(network_blob, memory, spec,
+                                           barriers))
+            worker.start()
+            self.workers.append(worker)
+        # Made after starting the workers, so that forked workers can close
+        # the shared memory
+        self.signals = memory.buf[:signal_count]
+        raw_control = memory.buf[control_offset:
+                                 control_offset + 4 * control_count]
+        self.control = raw_control.cast("i")
+        self.finalizer = weakref.finalize(
+            self, _stop_workers, os.getpid(), self.workers, memory,
+            [self.control, raw_control, self.signals], self.start_barrier)
+
+    def split(self, drivers, weights, count):
+        """Return the partition of each component, among count partitions.
+
+        drivers holds the list of driving components of each component, in
+        topological order, and weights the number of devices in each. The
+        components are placed one at a time, each in the partition holding
+        most of its neighbours placed so far, weighted against how full the
+        partition is. The partitions may be up to 5% larger than an even
+        share, or as large as the largest component.
+        """
+        capacity = max(sum(weights) * 1.05 / max(count, 1),
+                       max(weights, default=0))
+        neighbours = [list(component_drivers)
+                      for component_drivers in drivers]
+        for number, component_drivers in enumerate(drivers):
+            for driver in component_drivers:
+                neighbours[driver].append(number)
+
+        # The components are placed in breadth-first order, so connected
+        # components are placed one after another
+        order = []
+        visited = [False] * len(weights)
+        for root in range(len(weights)):
+            if visited[root]:
+                continue
+            visited[root] = True
+            queue = collections.deque([root])
+            while queue:
+                number = queue.popleft()
+                order.append(number)
+                for neighbour in neighbours[number]:
+                    if not visited[neighbour]:
+                        visited[neighbour] = True
+                        queue.append(neighbour)
+
+        sizes = [0] * count
+        partition_of = [None] * len(weights)
+        for number in order:
+            weight = weights[number]
+            links = [0] * count
+            for neighbour in neighbours[number]:
+                if partition_of[neighbour] is not None:
+                    links[partition_of[neighbour]] += 1
+            partition = max(range(count), key=lambda candidate: (
+                sizes[candidate] + weight <= capacity,
+                links[candidate] * (1 - sizes[candidate] / capacity),
+                -sizes[candidate]))
+            partition_of[number] = partition
+            sizes[partition] += weight
+
+        # Move components towards their neighbours while it cuts fewer
+        # connections and the partitions stay within capacity
+        for _ in range(4):
+            moved = False
+            for number, weight in enumerate(weights):
+                links = [0] * count
+                for neighbour in neighbours[number]:
+                    links[partition_of[neighbour]] += 1
+                current = partition_of[number]
+                best = max(range(count), key=links.__getitem__)
+                if (links[best] > links[current]
+                        and sizes[best] + weight <= capacity):
+                    sizes[current] -= weight
+                    sizes[best] += weight
+                    partition_of[number] = best
+                    moved = True
+            if not moved:
+                break
+        return partition_of
+
+    def get_cut_size(self):
+        """Return the number of connections between partitions."""
+        if self.topology_version != self.devices.topology_version:
+            self.build_plan()
+        return self.cut_size
+
+    def execute_network(self):
+        """Execute all the devices for one simulation cycle.
+
+        Return True if successful and the network does not oscillate.
+        """
+        if multiprocessing.current_process().daemon:
+            # In a pool worker, the network is executed in this process
+            return self.levelized.execute_network()
+        devices = self.devices
+        network = self.network
+        levelized = self.levelized
+        if self.topology_version != devices.topology_version:
+            self.build_plan()
+        signals = self.signals
+        command = RUN
+        if self.next_cycle != devices.cycle and self.workers:
+            # After a cold start-up, the workers reload the whole state, and
+            # clock edges are counted from the current CLK signals
+            command = RELOAD
+            for (outputs, output_id, slot) in self.ports:
+                signal = outputs[output_id]
+                signals[slot] = NO_SIGNAL if signal is None else signal
+            for (device, memory_slot, clock_slot) in self.d_type_slots:
+                clock_signal = levelized.get_input(device, devices.CLK_ID)
+                signals[memory_slot] = (NO_SIGNAL if device.dtype_memory
+                                        is None else device.dtype_memory)
+                signals[clock_slot] = (NO_SIGNAL if clock_signal is None
+                                       else clock_signal)
+
+        # D-types sample DATA before the sources change it
+        if not levelized.sample_data():
+            return False
+        for kind, device_ids in levelized.kind_devices:
+            if kind.start_cycle is not None:
+                kind.start_cycle(network, device_ids)
+        for kind, device in levelized.sources:
+            if not levelized.settle(kind, device):
+                return False
+        network.steady_state = True
+        network.iterations = 1
+
+        if self.workers:
+            data_samples = levelized.data_samples
+            for (device, slot) in self.data_slots:
+                signals[slot] = data_samples[device.device_id]
+            for (outputs, output_id, slot) in self.source_ports:
+                signal = outputs[output_id]
+                signals[slot] = NO_SIGNAL if signal is None else signal
+            control = self.control
+            control[0] = command
+            control[1] = devices.cycle
+            self.wait(self.start_barrier)
+            self.wait(self.end_barrier)
+            statuses = control[2::2]
+            if FAILED in statuses:
+                self.next_cycle = None  # the workers are out of step
+                return False
+            values = bytes(signals)
+            for (outputs, output_id, slot) in self.synced_ports:
+                outputs[output_id] = DECODE[values[slot]]
+            for (device, memory_slot, clock_slot) in self.d_type_slots:
+                device.dtype_memory = DECODE[values[memory_slot]]
+            network.steady_state = UNSETTLED not in statuses
+            network.iterations = max(control[3::2])
+
+        devices.cycle += 1
+        self.next_cycle = devices.cycle
+        return network.steady_state
+
+    def wait(self, barrier):
+        """Wait for the workers, raising RuntimeError if one has failed."""
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            self.close()
+            raise RuntimeError("a worker process of the partitioned engine "
+                               "has failed")
+
+    def close(self):
+        """Stop the worker processes and free the shared memory."""
+        if self.finalizer is not None:
+            self.finalizer()
+        self.finalizer = None
+        self.workers = []
+        self.signals = None
+        self.control = None
+        self.topology_version = None
+
+
+def _stop_workers(owner_pid, workers, memory, views, start_barrier):
+    """Stop the worker processes and free the shared memory.
+
+    Nothing is done in processes forked from the one that started the
+    workers, since only that process can join them.
+    """
+    if os.getpid() != owner_pid:
+        return
+    control = views[0]
+    control[0] = STOP
+    try:
+        start_barrier.wait(timeout=5)
+    except threading.BrokenBarrierError:
+        pass  # a worker has already stopped
+    for worker in workers:
+        worker.join(timeout=5)
+        if worker.is_alive():
+            worker.terminate()
+    for view in views:
+        view.release()
+    memory.close()
+    memory.unlink()
+
+
+def _run_worker(network_blob, memory, spec, barriers):
+    """Evaluate one partition of the network in every cycle.
+
+    The worker waits at the start barrier for each command, exchanges the
+    crossing signals at the phase barrier, and reports its status at the
+    end barrier. An error breaks the barriers, so the engine stops.
+    """
+    (devices, network) = pickle.loads(network_blob)
+    (start_barrier, phase_barrier, end_barrier) = barriers
+    engine = LevelizedEngine(devices, network, spec["iteration_limit"])
+    engine.build_plan()
+    signals = memory.buf[:spec["signal_count"]]
+    raw_control = memory.buf[spec["control_offset"]:spec["control_offset"]
+                             + 4 * spec["control_count"]]
+    control = raw_control.cast("i")
+    status_index = 2 + 2 * spec["partition"]
+
+    def get_ports(ports):
+        """Return (outputs, output ID, slot) for (device, output, slot)."""
+        return [(devices.get_device(device_id).outputs, output_id, slot)
+                for (device_id, output_id, slot) in ports]
+
+    phases = [[engine.components[number] for number in numbers]
+              for numbers in spec["phases"]]
+    outputs_ports = get_ports(spec["outputs"])
+    start_imports = get_ports(spec["start_imports"])
+    imports = [get_ports(ports) for ports in spec["imports"]]
+    exports = [get_ports(ports) for ports in spec["exports"]]
+    d_type_slots = [(devices.get_device(device_id), memory_slot, clock_slot)
+                    for (device_id, memory_slot, clock_slot)
+                    in spec["d_types"]]
+    data_slots = spec["data_slots"]
+    try:
+        while True:
+            start_barrier.wait()
+            command = control[0]
+            if command == STOP:
+                break
+            devices.cycle = control[1]
+            if command == RELOAD:
+                for (outputs, output_id, slot) in outputs_ports:
+                    outputs[output_id] = DECODE[signals[slot]]
+                for (device, memory_slot, clock_slot) in d_type_slots:
+                    device.dtype_memory = DECODE[signals[memory_slot]]
+                    engine.last_clock[device.device_id] = \
+                        DECODE[signals[clock_slot]]
+            for (outputs, output_id, slot) in start_imports:
+                outputs[output_id] = DECODE[signals[slot]]
+            # No worker may export into a slot before all have read it
+            phase_barrier.wait()
+
+            succeeded = True
+            network.steady_state = True
+            network.iterations = 1
+            engine.unsettled = []
+            for (device_id, slot) in data_slots:
+                engine.data_samples[device_id] = DECODE[signals[slot]]
+            for phase, components in enumerate(phases):
+                for members in components:
+                    if not succeeded:
+                        break
+                    succeeded = engine.execute_component(members)
+                if phase == len(phases) - 1:
+                    break
+                for (outputs, output_id, slot) in exports[phase]:
+                    signal = outputs[output_id]
+                    signals[slot] = NO_SIGNAL if signal is None else signal
+                phase_barrier.wait()
+                for (outputs, output_id, slot) in imports[phase]:
+                    outputs[output_id] = DECODE[signals[slot]]
+
+            for (outputs, output_id, slot) in outputs_ports:
+                signal = outputs[output_id]
+                signals[slot] = NO_SIGNAL if signal is None else signal
+            for (device, memory_slot, clock_slot) in d_type_slots:
+                signals[memory_slot] = (NO_SIGNAL if device.dtype_memory
+                                        is None else device.dtype_memory)
+            if not succeeded:
+                control[status_index] = FAILED
+            elif network.steady_state:
+                control[status_index] = SETTLED
+            else:
+                control[status_index] = UNSETTLED
+            control[status_index + 1] = network.iterations
+            end_barrier.wait()
+    except Exception:
+        for barrier in barriers:
+            barrier.abort()
+        raise
+    finally:
+        control.release()
+        raw_control.release()
+        signals.release()
+        memory.close()
+
+
+def report_speedup(devices, network, cycles, partition_counts):
+    """Print the time taken to run the network with each partition count.
+
+    Each run starts from the current state of the network, and the time to
+    start the workers is left out. The speedup is relative to the levelized
+    engine in a single process. The state and engine of the network are
+    restored afterwards. Return a dictionary {partitions: speedup}.
+    """
+    checkpoint = network.checkpoint()
+    engine = network.engine
+    limit = network.iteration_limit
+    trials = [(None, LevelizedEngine(devices, network, limit))]
+    trials.extend((partitions, PartitionedEngine(devices, network,
+                                                 partitions, limit))
+                  for partitions in partition_counts)
+    times = {}
+    for partitions, trial in trials:
+        network.set_engine(trial)
+        network.restore(checkpoint)
+        trial.build_plan()
+        start = time.perf_counter()
+        for _ in range(cycles):
+            if not network.execute_network():
+                break
+        times[partitions] = time.perf_counter() - start
+        if partitions is not None:
+            trial.close()
+    network.set_engine(engine)
+    network.restore(checkpoint)
+
+    print("Single process (levelized): {:.3f} s".format(times[None]))
+    speedups = {}
+    for partitions, trial in trials[1:]:
+        speedups[partitions] = times[None] / max(times[partitions], 1e-9)
+        print("{} partition{}: {:.3f} s, speedup {:.2f}, {} connections "
+              "cut".format(partitions, "s" if partitions > 1 else "",
+                           times[partitions], speedups[partitions],
+                           trial.cut_size))
+    return speedups
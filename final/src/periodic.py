@@ -0,0 +1,174 @@
+"""Run the network, skipping the cycles of a periodic steady state.
+
+Used in the Logic Simulator project to run clocked networks for many cycles.
+Once the switches stop changing, such a network soon repeats its state every
+few clock periods, so the rest of the run can be copied from the recorded
+signals instead of being simulated.
+
+Classes
+-------
+PeriodicRunner - runs the network and records the monitors, fast-forwarding
+                 through periodic behaviour.
+"""
+import collections
+import hashlib
+import math
+
+
+class PeriodicRunner:
+    """Run the network and record the monitors, skipping repeated periods.
+
+    The state of the network is captured at the boundaries of its
+    hyper-period, the least common multiple of the periods of all clocks and
+    signal generators. The state holds the outputs of all devices, the
+    D-type memories, the switch states and the cycles left before each RC
+    device discharges. When the state at a boundary repeats an earlier one,
+    the network is periodic from then on, so the monitored signals since the
+    earlier boundary are replayed for as many whole periods as fit in the
+    rest of the run, and the cycle count is moved on without executing any
+    device. The remaining cycles are simulated normally. Only the states at
+    the last few boundaries are kept, looked up by a hash and compared in
+    full on a match, so the memory used does not grow with the run.
+
+    A switch set between runs changes the state, so the simulation resumes
+    normally until the state repeats again. Networks with devices of kinds
+    that are not built in are always simulated normally, since their state
+    is unknown. The output changes still pending in an engine with delays,
+    such as timed.TimedEngine(), are part of the state, and no cycles are
+    skipped while there are any, since skipping would drop them.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    monitors: instance of the monitors.Monitors() class.
+    history_size: number of boundary states kept to look for a repeat.
+
+    Public methods
+    --------------
+    get_hyper_period(self): Returns the hyper-period of the network, or None
+                            if its state cannot be captured.
+
+    get_state(self): Returns the state of the network in the current cycle.
+
+    get_digest(self, state): Returns a hash of a state of the network.
+
+    get_pending_events(self): Returns the work still pending in the engine.
+
+    run(self, cycles): Runs the network for the specified number of cycles,
+                       recording the monitors, and returns True if
+                       successful.
+    """
+
+    def __init__(self, devices, network, monitors, history_size=64):
+        """Initialise the runner."""
+        self.devices = devices
+        self.network = network
+        self.monitors = monitors
+        self.history_size = history_size
+        self.skipped_cycles = 0  # cycles replayed in the last run
+
+    def get_hyper_period(self):
+        """Return the hyper-period of the network in cycles.
+
+        Return None if the network has devices of kinds that are not built
+        in.
+        """
+        devices = self.devices
+        built_in = devices.gate_types + [
+            devices.SWITCH, devices.SIGGEN, devices.RC, devices.D_TYPE,
+            devices.CLOCK, devices.LUT]
+        hyper_period = 1
+        for device in devices.devices_list:
+            if device.device_kind not in built_in:
+                return None
+            if device.clock_half_period is not None:
+                hyper_period = math.lcm(hyper_period,
+                                        2 * device.clock_half_period)
+            elif device.siggen_pattern is not None:
+                hyper_period = math.lcm(hyper_period,
+                                        len(device.siggen_pattern))
+        return hyper_period
+
+    def get_state(self):
+        """Return the state of the network in the current cycle."""
+        cycle = self.devices.cycle
+        state = [self.get_pending_events()]
+        for device in self.devices.devices_list:
+            state.append(tuple(device.outputs.values()))
+            state.append(device.dtype_memory)
+            state.append(device.switch_state)
+            if device.rc_fall_cycle is not None:
+                state.append(max(device.rc_fall_cycle - cycle, 0))
+        return tuple(state)
+
+    def get_digest(self, state):
+        """Return a SHA-256 hash of a state of the network."""
+        return hashlib.sha256(repr(state).encode()).digest()
+
+    def get_pending_events(self):
+        """Return the work still pending in the engine of the network.
+
+        Return an empty tuple if the engine does not delay any changes.
+        """
+        engine = self.network.engine
+        if engine is None or not hasattr(engine, "get_pending_events"):
+            return ()
+        return engine.get_pending_events()
+
+    def run(self, cycles):
+        """Run the network for the specified number of cycles.
+
+        The monitors record the signals of every cycle. Return True if
+        successful, or False as soon as the network oscillates.
+        """
+        devices = self.devices
+        hyper_period = self.get_hyper_period()
+        # Stores {digest: (cycle, state)} at the latest hyper-period
+        # boundaries, oldest first
+        history = collections.OrderedDict()
+        self.skipped_cycles = 0
+        cycles_left = cycles
+        while cycles_left > 0:
+            if hyper_period is not None and devices.cycle % hyper_period == 0:
+                state = self.get_state()
+                digest = self.get_digest(state)
+                (cycle, earlier_state) = history.pop(digest, (None, None))
+                if state[0]:  # the engine has changes still to apply
+                    history.clear()
+                elif earlier_state == state:  # not just the same hash
+                    period = devices.cycle - cycle
+                    repeats = cycles_left // period
+                    if repeats and self.replay(period, repeats):
+                        cycles_left -= repeats * period
+                        self.skipped_cycles += repeats * period
+                        history.clear()
+                        continue
+                history[digest] = (devices.cycle, state)
+                if len(history) > self.history_size:
+                    history.popitem(last=False)
+            if not self.network.execute_network():
+                return False
+            self.monitors.record_signals()
+            cycles_left -= 1
+        return True
+
+    def replay(self, period, repeats):
+        """Repeat the monitored signals of the last period.
+
+        The cycle count is moved on, and the clocks queue their next edges
+        from the new cycle. Return True if successful, or False if a monitor
+        has not recorded the whole period.
+        """
+        devices = self.devices
+        traces = self.monitors.monitors_dictionary.values()
+        if any(len(signal_list) < period for signal_list in traces):
+            return False
+        for signal_list in traces:
+            signal_list.extend(signal_list[-period:] * repeats)
+
+        devices.cycle += period * repeats
+        for device_id in devices.find_devices(devices.CLOCK):
+            devices.schedule_clock(devices.get_device(device_id),
+                                   devices.cycle - 1)
+        return True
@@ -0,0 +1,490 @@
+"""Describe the kinds of device that the logic simulator supports.
+
+Used in the Logic Simulator project to declare, in one place, how each kind
+of device is parsed, built and simulated. The devices, network and parser
+modules all read the registry instead of hard-coding the device kinds.
+
+Classes
+-------
+DeviceKind - stores how one kind of device is built and simulated.
+DeviceRegistry - stores all the device kinds known to the simulator.
+
+Functions
+---------
+builtin_kinds() - returns the built-in device kinds in execution order.
+"""
+
+
+class DeviceKind:
+    """Store how one kind of device is built and simulated.
+
+    Parameters
+    ----------
+    name: name string of the kind, as written in definition files.
+    make: function make(devices, device_id, device_property) that makes a
+          device of this kind.
+    validate: function validate(devices, device_property) that returns
+              devices.NO_ERROR if the property is valid, or the corresponding
+              error if not.
+    execute: function execute(network, device_id) that simulates one device
+             of this kind and returns True if successful.
+    input_names: function input_names(device_property) that returns the list
+                 of input port name strings. Defaults to no inputs.
+    output_names: list of output port name strings. None is the single
+                  unnamed output.
+    parameter: syntax of the parameter in definition files. None if the kind
+               takes no parameter, "number" for "[n]", "bits" for a bit
+               pattern such as "[0110]", "table" for "[n, table]" and
+               "clock" for "[n]" or "[n, high_time, phase]".
+    state: names of the Device attributes that hold the state of the device,
+           besides its outputs.
+    execute_batch: optional function execute_batch(network, device_ids) that
+                   simulates all the devices of this kind at once and returns
+                   True if successful. Used instead of execute when given.
+    start_cycle: optional function start_cycle(network, device_ids) called
+                 once at the start of every simulation cycle. It returns the
+                 IDs of the devices whose outputs it changed, or None if any
+                 of them may have changed.
+    cold_start: optional function cold_start(devices, device) that sets the
+                initial state of a device on cold start-up.
+    every_cycle: True if the outputs of the devices can change in a new cycle
+                 although their inputs have not, so event-driven engines
+                 execute them in every cycle.
+    evaluate: optional function evaluate(devices, device, input_signals) of
+              a combinational kind. It returns the list of settled output
+              signals, in the order of device.outputs, for the LOW or HIGH
+              input signals given in the order of device.inputs.
+
+    Public methods
+    --------------
+    No public methods.
+    """
+
+    def __init__(self, name, make, validate, execute, input_names=None,
+                 output_names=None, parameter=None, state=(),
+                 execute_batch=None, start_cycle=None, cold_start=None,
+                 every_cycle=False, evaluate=None):
+        """Initialise the kind properties."""
+        self.name = name
+        self.kind_id = None  # set when the kind is registered
+        self.make = make
+        self.validate = validate
+        self.execute = execute
+        self.input_names = input_names or no_input_names
+        self.output_names = output_names or [None]
+        self.parameter = parameter
+        self.state = tuple(state)
+        self.execute_batch = execute_batch
+        self.start_cycle = start_cycle
+        self.cold_start = cold_start
+        self.every_cycle = every_cycle
+        self.evaluate = evaluate
+
+
+class DeviceRegistry:
+    """Store all the device kinds known to the simulator.
+
+    The kinds are kept in registration order, which is also the order in
+    which the network executes them in every iteration.
+
+    Parameters
+    ----------
+    names: instance of the names.Names() class.
+
+    Public methods
+    --------------
+    register(self, kind): Adds the kind to the registry and returns its ID.
+
+    get_kind(self, kind_id): Returns the kind with the given ID.
+
+    query(self, name_string): Returns the kind with the given name string.
+
+    get_names(self): Returns the name strings of all kinds.
+    """
+
+    def __init__(self, names):
+        """Initialise the list of kinds."""
+        self.names = names
+        self.kinds = []
+        self.kinds_dictionary = {}  # stores {kind_id: kind}
+
+    def register(self, kind):
+        """Add the kind to the registry and return its kind ID.
+
+        A kind registered under an existing name replaces the old kind.
+        """
+        [kind.kind_id] = self.names.lookup([kind.name])
+        if kind.kind_id in self.kinds_dictionary:
+            old_kind = self.kinds_dictionary[kind.kind_id]
+            self.kinds[self.kinds.index(old_kind)] = kind
+        else:
+            self.kinds.append(kind)
+        self.kinds_dictionary[kind.kind_id] = kind
+        return kind.kind_id
+
+    def get_kind(self, kind_id):
+        """Return the kind with the given ID, or None if it is absent."""
+        return self.kinds_dictionary.get(kind_id)
+
+    def query(self, name_string):
+        """Return the kind with the given name string, or None."""
+        kind_id = self.names.query(name_string)
+        if kind_id is None:
+            return None
+        return self.get_kind(kind_id)
+
+    def get_names(self):
+        """Return a list of the name strings of all kinds."""
+        return [kind.name for kind in self.kinds]
+
+
+def no_input_names(device_property):
+    """Return the input names of a device without inputs."""
+    return []
+
+
+def gate_input_names(device_property):
+    """Return the input names "I1" to "In" of an n-input gate."""
+    return ["".join(["I", str(input_number)])
+            for input_number in range(1, device_property + 1)]
+
+
+def xor_input_names(device_property):
+    """Return the input names of a XOR gate."""
+    return ["I1", "I2"]
+
+
+def lut_input_names(device_property):
+    """Return the input names of a look-up table."""
+    no_of_inputs, table = device_property
+    return gate_input_names(no_of_inputs)
+
+
+def dtype_input_names(device_property):
+    """Return the input names of a D-type."""
+    return ["CLK", "SET", "CLEAR", "DATA"]
+
+
+def validate_no_property(devices, device_property):
+    """Check that no property is given."""
+    if device_property is not None:
+        return devices.QUALIFIER_PRESENT
+    return devices.NO_ERROR
+
+
+def validate_switch(devices, device_property):
+    """Check that the switch initial state is 0 (LOW) or 1 (HIGH)."""
+    if device_property is None:
+        return devices.NO_QUALIFIER
+    elif device_property not in [devices.LOW, devices.HIGH]:
+        return devices.INVALID_QUALIFIER
+    return devices.NO_ERROR
+
+
+def validate_positive(devices, device_property):
+    """Check that the property is a number of cycles greater than 0."""
+    if device_property is None:
+        return devices.NO_QUALIFIER
+    elif device_property <= 0:
+        return devices.INVALID_QUALIFIER
+    return devices.NO_ERROR
+
+
+def validate_clock(devices, device_property):
+    """Check the half period, and the high time and phase if given."""
+    if device_property is None:
+        return devices.NO_QUALIFIER
+    elif not isinstance(device_property, tuple):
+        return validate_positive(devices, device_property)
+    half_period, high_time, phase = device_property
+    if half_period <= 0:
+        return devices.INVALID_QUALIFIER
+    elif high_time not in range(1, 2 * half_period):
+        return devices.INVALID_QUALIFIER
+    elif phase not in range(2 * half_period):
+        return devices.INVALID_QUALIFIER
+    return devices.NO_ERROR
+
+
+def validate_gate(devices, device_property):
+    """Check that the number of gate inputs is in range."""
+    if device_property is None:
+        return devices.NO_QUALIFIER
+    elif device_property not in range(1, devices.max_gate_inputs + 1):
+        return devices.INVALID_QUALIFIER
+    return devices.NO_ERROR
+
+
+def validate_lut(devices, device_property):
+    """Check the number of inputs and the truth table of a look-up table."""
+    if device_property is None:
+        return devices.NO_QUALIFIER
+    no_of_inputs, table = device_property
+    if no_of_inputs not in range(1, devices.max_lut_inputs + 1):
+        return devices.INVALID_QUALIFIER
+    elif table < 0 or table.bit_length() > 1 << no_of_inputs:
+        return devices.INVALID_QUALIFIER
+    return devices.NO_ERROR
+
+
+def validate_siggen(devices, device_property):
+    """Check that the pattern is a non-empty sequence of 0s and 1s."""
+    if device_property is None:
+        return devices.NO_QUALIFIER
+    elif (not device_property
+          or set(str(bit) for bit in device_property) - {"0", "1"}):
+        return devices.INVALID_QUALIFIER
+    return devices.NO_ERROR
+
+
+def make_switch(devices, device_id, device_property):
+    """Make a switch device."""
+    devices.make_switch(device_id, device_property)
+
+
+def make_siggen(devices, device_id, device_property):
+    """Make a signal generator device."""
+    devices.make_siggen(device_id, device_property)
+
+
+def make_rc(devices, device_id, device_property):
+    """Make a RC device."""
+    devices.make_rc(device_id, device_property)
+
+
+def make_d_type(devices, device_id, device_property):
+    """Make a D-type device."""
+    devices.make_d_type(device_id)
+
+
+def make_clock(devices, device_id, device_property):
+    """Make a clock device."""
+    if isinstance(device_property, tuple):
+        devices.make_clock(device_id, *device_property)
+    else:
+        devices.make_clock(device_id, device_property)
+
+
+def make_and(devices, device_id, device_property):
+    """Make an AND gate."""
+    devices.make_gate(device_id, devices.AND, device_property)
+
+
+def make_or(devices, device_id, device_property):
+    """Make an OR gate."""
+    devices.make_gate(device_id, devices.OR, device_property)
+
+
+def make_nand(devices, device_id, device_property):
+    """Make a NAND gate."""
+    devices.make_gate(device_id, devices.NAND, device_property)
+
+
+def make_nor(devices, device_id, device_property):
+    """Make a NOR gate."""
+    devices.make_gate(device_id, devices.NOR, device_property)
+
+
+def make_xor(devices, device_id, device_property):
+    """Make a XOR gate."""
+    devices.make_gate(device_id, devices.XOR, 2)
+
+
+def make_lut(devices, device_id, device_property):
+    """Make a look-up table device."""
+    no_of_inputs, table = device_property
+    devices.make_lut(device_id, no_of_inputs, table)
+
+
+def execute_switch(network, device_id):
+    """Simulate a switch."""
+    return network.execute_switch(device_id)
+
+
+def execute_siggen(network, device_id):
+    """Simulate a signal generator."""
+    return network.execute_siggen(device_id)
+
+
+def execute_rc(network, device_id):
+    """Simulate a RC device.
+
+    The output only changes when the timer of the device fires at the start
+    of a cycle, so there is nothing to do.
+    """
+    return True
+
+
+def execute_rcs(network, device_ids):
+    """Simulate all the RC devices, which is free between timer events."""
+    return True
+
+
+def execute_d_type(network, device_id):
+    """Simulate a D-type device."""
+    return network.execute_d_type(device_id)
+
+
+def execute_clock(network, device_id):
+    """Simulate a clock."""
+    return network.execute_clock(device_id)
+
+
+def execute_and(network, device_id):
+    """Simulate an AND gate."""
+    return network.execute_gate(device_id, network.devices.HIGH,
+                                network.devices.HIGH)
+
+
+def execute_or(network, device_id):
+    """Simulate an OR gate."""
+    return network.execute_gate(device_id, network.devices.LOW,
+                                network.devices.LOW)
+
+
+def execute_nand(network, device_id):
+    """Simulate a NAND gate."""
+    return network.execute_gate(device_id, network.devices.HIGH,
+                                network.devices.LOW)
+
+
+def execute_nor(network, device_id):
+    """Simulate a NOR gate."""
+    return network.execute_gate(device_id, network.devices.LOW,
+                                network.devices.HIGH)
+
+
+def execute_xor(network, device_id):
+    """Simulate a XOR gate."""
+    return network.execute_gate(device_id, None, None)
+
+
+def execute_clocks(network, device_ids):
+    """Simulate the clocks with an edge in this cycle.
+
+    The other clocks keep their level, so they are not visited.
+    """
+    for device_id in network.clock_edges:
+        if not network.execute_clock(device_id):
+            return False
+    return True
+
+
+def execute_lut(network, device_id):
+    """Simulate a look-up table device."""
+    return network.execute_lut(device_id)
+
+
+def evaluate_and(devices, device, input_signals):
+    """Return the output of an AND gate."""
+    if devices.LOW in input_signals:
+        return [devices.LOW]
+    return [devices.HIGH]
+
+
+def evaluate_or(devices, device, input_signals):
+    """Return the output of an OR gate."""
+    if devices.HIGH in input_signals:
+        return [devices.HIGH]
+    return [devices.LOW]
+
+
+def evaluate_nand(devices, device, input_signals):
+    """Return the output of a NAND gate."""
+    if devices.LOW in input_signals:
+        return [devices.HIGH]
+    return [devices.LOW]
+
+
+def evaluate_nor(devices, device, input_signals):
+    """Return the output of a NOR gate."""
+    if devices.HIGH in input_signals:
+        return [devices.LOW]
+    return [devices.HIGH]
+
+
+def evaluate_xor(devices, device, input_signals):
+    """Return the output of a XOR gate, HIGH for an odd number of HIGHs."""
+    if input_signals.count(devices.HIGH) % 2:
+        return [devices.HIGH]
+    return [devices.LOW]
+
+
+def evaluate_lut(devices, device, input_signals):
+    """Return the output of a look-up table, with I1 as the index LSB."""
+    index = 0
+    for bit, input_signal in enumerate(input_signals):
+        if input_signal == devices.HIGH:
+            index |= 1 << bit
+    if (device.lut_table >> index) & 1:
+        return [devices.HIGH]
+    return [devices.LOW]
+
+
+def start_clocks(network, device_ids):
+    """Set clock signals to RISING or FALLING, where necessary."""
+    network.update_clocks()
+    return network.clock_edges
+
+
+def start_rcs(network, device_ids):
+    """Set RC signals to LOW if their timers expire in this cycle."""
+    return network.update_rcs()
+
+
+def cold_start_d_type(devices, device):
+    """Set the memory of the D-type to a random state."""
+    devices.cold_start_d_type(device)
+
+
+def cold_start_clock(devices, device):
+    """Make the clock begin from a random point in its cycle."""
+    devices.cold_start_clock(device)
+
+
+def cold_start_rc(devices, device):
+    """Restart the RC device charging."""
+    devices.cold_start_rc(device)
+
+
+def builtin_kinds():
+    """Return the built-in device kinds in execution order.
+
+    D-types are executed before clocks to catch the rising edge of the clock.
+    """
+    return [
+        DeviceKind("SWITCH", make_switch, validate_switch, execute_switch,
+                   parameter="number", state=["switch_state"],
+                   every_cycle=True),
+        DeviceKind("SIGGEN", make_siggen, validate_siggen, execute_siggen,
+                   parameter="bits", every_cycle=True),
+        DeviceKind("RC", make_rc, validate_positive, execute_rc,
+                   parameter="number", state=["rc_fall_cycle"],
+                   execute_batch=execute_rcs, start_cycle=start_rcs,
+                   cold_start=cold_start_rc),
+        DeviceKind("DTYPE", make_d_type, validate_no_property,
+                   execute_d_type, input_names=dtype_input_names,
+                   output_names=["Q", "QBAR"], state=["dtype_memory"],
+                   cold_start=cold_start_d_type),
+        DeviceKind("CLOCK", make_clock, validate_clock, execute_clock,
+                   parameter="clock", state=["clock_phase"],
+                   execute_batch=execute_clocks, start_cycle=start_clocks,
+                   cold_start=cold_start_clock),
+        DeviceKind("AND", make_and, validate_gate, execute_and,
+                   input_names=gate_input_names, parameter="number",
+                   evaluate=evaluate_and),
+        DeviceKind("OR", make_or, validate_gate, execute_or,
+                   input_names=gate_input_names, parameter="number",
+                   evaluate=evaluate_or),
+        DeviceKind("NAND", make_nand, validate_gate, execute_nand,
+                   input_names=gate_input_names, parameter="number",
+                   evaluate=evaluate_nand),
+        DeviceKind("NOR", make_nor, validate_gate, execute_nor,
+                   input_names=gate_input_names, parameter="number",
+                   evaluate=evaluate_nor),
+        DeviceKind("XOR", make_xor, validate_no_property, execute_xor,
+                   input_names=xor_input_names, evaluate=evaluate_xor),
+        DeviceKind("LUT", make_lut, validate_lut, execute_lut,
+                   input_names=lut_input_names, parameter="table",
+                   evaluate=evaluate_lut),
+    ]
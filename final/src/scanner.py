@@ -112,11 +112,21 @@ class Scanner:
             self.get_next_character()
 
     def get_number(self) -> str:
-        """Return full number as a str."""
+        """Return full number as a str.
+
+        Hexadecimal numbers are written with a "0x" prefix, e.g. 0xE8.
+        """
         number = ""
         while self.current_character.isdigit():
             number = number + self.current_character
             self.current_character = self.get_next_character()
+        if number == "0" and self.current_character in {"x", "X"}:
+            number = number + self.current_character
+            self.current_character = self.get_next_character()
+            while (self.current_character != ""
+                   and self.current_character in "0123456789abcdefABCDEF"):
+                number = number + self.current_character
+                self.current_character = self.get_next_character()
         return number
 
     def get_name(self):
@@ -0,0 +1,46 @@
+"""Test the batch module."""
+import random
+
+from batch import read_jobs, run_batch
+from testing_helpers import parse_example
+
+
+def test_read_jobs(tmp_path):
+    """Test if jobs files are read and invalid settings are refused."""
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    names = network.names
+    [SW1_ID, SW2_ID] = names.lookup(["SW1", "SW2"])
+    jobs_path = tmp_path / "jobs.txt"
+    jobs_path.write_text("# cycles and switches\n10\n\n20 SW1=0 SW2=1\n")
+    assert read_jobs(str(jobs_path), names, network.devices) == [
+        ({}, 10), ({SW1_ID: 0, SW2_ID: 1}, 20)]
+
+    for line in ["SW1=0", "10 SW1=2", "10 X=1", "10 C=1"]:
+        jobs_path.write_text(line + "\n")
+        assert read_jobs(str(jobs_path), names, network.devices) is None
+
+
+def test_run_batch():
+    """Test if worker processes give the same traces as running each job."""
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    devices = network.devices
+    [SW1_ID, SW2_ID] = network.names.lookup(["SW1", "SW2"])
+    jobs = [({}, 20), ({SW1_ID: 0}, 30), ({SW2_ID: 1}, 25),
+            ({SW1_ID: 0, SW2_ID: 0}, 5)]
+    results = run_batch(network.names, devices, network, monitors, jobs,
+                        processes=2, seed=7)
+    assert results == run_batch(network.names, devices, network, monitors,
+                                jobs, processes=1, seed=7)
+
+    for job_number, ((switches, cycles), traces) in enumerate(
+            zip(jobs, results)):
+        network, monitors = parse_example("flipflop.txt", seed=1)
+        devices = network.devices
+        for switch_id, signal in switches.items():
+            devices.set_switch(switch_id, signal)
+        random.seed("7:{}".format(job_number))
+        devices.cold_startup()
+        for _ in range(cycles):
+            assert network.execute_network()
+            monitors.record_signals()
+        assert traces == dict(monitors.monitors_dictionary)
@@ -0,0 +1,126 @@
+"""Test the bitparallel module."""
+import itertools
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from bitparallel import BitParallelSimulator
+from testing_helpers import EXAMPLE_FILES, parse_example
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_as_sweep(file_name):
+    """Test if every pattern gives the same traces as the default sweep."""
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        pytest.skip("not a valid network")
+    network, monitors = parsed
+    devices = network.devices
+    switch_ids = devices.find_devices(devices.SWITCH)
+    patterns = [list(pattern) for pattern in itertools.islice(
+        itertools.product([0, 1], repeat=len(switch_ids)), 64)]
+    simulator = BitParallelSimulator(devices, monitors)
+    results = simulator.run_patterns(patterns, cycles=12)
+
+    expected = []
+    for pattern in patterns:
+        network, monitors = parse_example(file_name, seed=file_name)
+        devices = network.devices
+        for switch_id, signal in zip(switch_ids, pattern):
+            devices.set_switch(switch_id, signal)
+        traces = {monitor: [] for monitor in monitors.monitors_dictionary}
+        for cycle in range(12):
+            if not network.execute_network():
+                assert results is None  # the network oscillates
+                return
+            for (device_id, output_id) in traces:
+                traces[(device_id, output_id)].append(
+                    network.get_output_signal(device_id, output_id))
+        expected.append(traces)
+    assert results == expected
+
+
+def test_full_adder():
+    """Test if all the patterns of a full adder are evaluated in one pass."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    [A, B, C, X1, X2, A1, A2, O1, I1, I2] = names.lookup(
+        ["A", "B", "C", "X1", "X2", "A1", "A2", "O1", "I1", "I2"])
+    for switch_id in [A, B, C]:
+        devices.make_device(switch_id, devices.SWITCH, 0)
+    devices.make_device(X1, devices.XOR)
+    devices.make_device(X2, devices.XOR)
+    devices.make_device(A1, devices.AND, 2)
+    devices.make_device(A2, devices.AND, 2)
+    devices.make_device(O1, devices.OR, 2)
+    for (first, second, gate) in [(A, B, X1), (X1, C, X2), (A, B, A1),
+                                  (X1, C, A2), (A1, A2, O1)]:
+        network.make_connection(first, None, gate, I1)
+        network.make_connection(second, None, gate, I2)
+    monitors.make_monitor(X2, None)
+    monitors.make_monitor(O1, None)
+
+    patterns = [list(pattern)
+                for pattern in itertools.product([0, 1], repeat=3)]
+    outputs = [device.outputs.copy() for device in devices.devices_list]
+    simulator = BitParallelSimulator(devices, monitors)
+    results = simulator.run_patterns(patterns)
+    for pattern, result in zip(patterns, results):
+        total = sum(pattern)
+        assert result == {(X2, None): [total % 2], (O1, None): [total // 2]}
+    # The Device objects are left unchanged
+    assert [device.outputs for device in devices.devices_list] == outputs
+
+
+def test_truth_tables():
+    """Test if the truth tables match simulating every assignment."""
+    network, monitors = parse_example("adder.txt", seed=1)
+    devices = network.devices
+    switch_ids = devices.find_devices(devices.SWITCH)
+    simulator = BitParallelSimulator(devices, monitors)
+    for block_bits in [1, 2, 16]:
+        tables = simulator.get_truth_tables(block_bits=block_bits)
+        for index in range(1 << len(switch_ids)):
+            pattern = [(index >> bit) & 1 for bit in range(len(switch_ids))]
+            [result] = simulator.run_patterns([pattern])
+            for monitor, table in tables.items():
+                assert (table[index // 8] >> (index % 8)) & 1 == \
+                    result[monitor][0]
+
+    # Networks whose outputs depend on time have no truth table
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    simulator = BitParallelSimulator(network.devices, monitors)
+    assert simulator.get_truth_tables() is None
+
+
+def test_wide_truth_table():
+    """Test the truth table of the parity of twenty switches."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    [I1, I2] = names.lookup(["I1", "I2"])
+    switch_ids = names.lookup(["Sw" + str(number) for number in range(20)])
+    previous_id = switch_ids[0]
+    devices.make_device(previous_id, devices.SWITCH, 0)
+    for number, switch_id in enumerate(switch_ids[1:]):
+        [XOR_ID] = names.lookup(["Xor" + str(number)])
+        devices.make_device(switch_id, devices.SWITCH, 0)
+        devices.make_device(XOR_ID, devices.XOR)
+        network.make_connection(previous_id, None, XOR_ID, I1)
+        network.make_connection(switch_id, None, XOR_ID, I2)
+        previous_id = XOR_ID
+    monitors.make_monitor(previous_id, None)
+
+    simulator = BitParallelSimulator(devices, monitors)
+    table = simulator.get_truth_tables()[(previous_id, None)]
+    assert len(table) == (1 << 20) // 8
+    word = int.from_bytes(table, "little")
+    for index in list(range(300)) + [(1 << 20) - 1, 123456]:
+        assert (word >> index) & 1 == bin(index).count("1") % 2
+    assert table[0] == 0x96  # the parity of the patterns 0 to 7
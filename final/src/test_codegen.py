@@ -0,0 +1,80 @@
+"""Test the codegen module."""
+import os
+
+import pytest
+
+from codegen import CodeGenerator, CompiledEngine
+from testing_helpers import (EXAMPLE_FILES, parse_example, get_traces,
+                             check_engine_traces, get_switched_data_traces)
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if the generated code gives the same traces as the sweep."""
+    check_engine_traces(file_name, CompiledEngine)
+
+
+def test_cached_module(tmp_path):
+    """Test if the cached module is reused only for the same structure."""
+    cache_path = str(tmp_path / "cache" / "flipflop.py")
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    expected = get_traces(network, monitors)
+
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    engine = CompiledEngine(network.devices, network, cache_path=cache_path)
+    network.set_engine(engine)
+    assert get_traces(network, monitors) == expected
+    assert not engine.loaded_from_cache
+    assert os.path.exists(cache_path)
+
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    engine = CompiledEngine(network.devices, network, cache_path=cache_path)
+    network.set_engine(engine)
+    assert get_traces(network, monitors) == expected
+    assert engine.loaded_from_cache
+
+    # A different network with the same cache path is generated again
+    network, monitors = parse_example("circuit1.txt", seed=1)
+    engine = CompiledEngine(network.devices, network, cache_path=cache_path)
+    network.set_engine(engine)
+    network.execute_network()
+    assert not engine.loaded_from_cache
+    with open(cache_path) as cache_file:
+        assert CodeGenerator(network.devices).get_fingerprint() in \
+            cache_file.read()
+
+
+def test_cache_checked_before_running(tmp_path):
+    """Test if a cached module is only run for the same iteration limit."""
+    cache_path = str(tmp_path / "cache" / "flipflop.py")
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    engine = CompiledEngine(network.devices, network, cache_path=cache_path,
+                            iteration_limit=20)
+    network.set_engine(engine)
+    network.execute_network()
+
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    engine = CompiledEngine(network.devices, network, cache_path=cache_path,
+                            iteration_limit=3)
+    network.set_engine(engine)
+    network.execute_network()
+    assert not engine.loaded_from_cache
+    assert CodeGenerator(network.devices, 3).get_fingerprint() != \
+        CodeGenerator(network.devices, 20).get_fingerprint()
+
+    # A cached file with another fingerprint is not executed
+    with open(cache_path, "w") as cache_file:
+        cache_file.write('"""Stale."""\nFINGERPRINT = "old"\n'
+                         'raise RuntimeError("executed")\n')
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    engine = CompiledEngine(network.devices, network, cache_path=cache_path,
+                            iteration_limit=3)
+    network.set_engine(engine)
+    network.execute_network()
+    assert not engine.loaded_from_cache
+
+
+def test_data_sampled_before_edge():
+    """Test if a D-type stores its DATA from before the clock edge."""
+    expected = get_switched_data_traces(None)
+    assert get_switched_data_traces(CompiledEngine) == expected
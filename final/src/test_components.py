@@ -0,0 +1,34 @@
+"""Test the components module."""
+
+import pytest
+
+from components import ComponentRunner
+from levelize import LevelizedEngine
+from testing_helpers import (EXAMPLE_FILES, parse_example, run_plain,
+                             check_runner_results)
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if running the components apart gives the same traces."""
+    network = check_runner_results(
+        file_name, lambda devices, network, monitors: ComponentRunner(
+            devices, network, monitors, processes=1), (30, 21))
+    assert network.devices.cycle == 51
+
+
+def test_worker_processes():
+    """Test if worker processes give the same traces and final state."""
+    network, monitors = parse_example("rc2.txt", seed=1)
+    run_plain(network, monitors, 40)
+    expected = (network.checkpoint(monitors), monitors.monitors_dictionary)
+
+    network, monitors = parse_example("rc2.txt", seed=1)
+    devices = network.devices
+    network.set_engine(LevelizedEngine(devices, network))
+    runner = ComponentRunner(devices, network, monitors, processes=2)
+    assert len(runner.get_components()) > 1
+    assert runner.run(25)
+    assert runner.run(15)  # continues from the state copied back
+    assert (network.checkpoint(monitors),
+            monitors.monitors_dictionary) == expected
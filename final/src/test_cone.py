@@ -0,0 +1,149 @@
+"""Test the cone module."""
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from cone import ConeOfInfluence
+from graph import get_fan_in_cone
+from testing_helpers import EXAMPLE_FILES, parse_example, get_traces
+
+
+def get_plan_devices(network):
+    """Return the set of the IDs of the devices in the plan."""
+    return {device_id for kind, device_ids in network.get_plan()
+            for device_id in device_ids}
+
+
+@pytest.fixture
+def two_blocks():
+    """Return a network made of two blocks, and its monitors.
+
+    The first block is a switch driving a chain of two inverters, and the
+    second a D-type whose QBAR drives its DATA input, clocked by a clock.
+    The switch also drives the SET input of the D-type.
+    """
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    [SW1, N1, N2, CLK, D1, I1] = names.lookup(
+        ["Sw1", "N1", "N2", "Clk", "D1", "I1"])
+    devices.make_device(SW1, devices.SWITCH, devices.LOW)
+    devices.make_device(N1, devices.NAND, 1)
+    devices.make_device(N2, devices.NAND, 1)
+    network.make_connection(SW1, None, N1, I1)
+    network.make_connection(N1, None, N2, I1)
+
+    devices.make_device(CLK, devices.CLOCK, 1)
+    devices.make_device(D1, devices.D_TYPE)
+    network.make_connection(CLK, None, D1, devices.CLK_ID)
+    network.make_connection(SW1, None, D1, devices.SET_ID)
+    network.make_connection(D1, devices.QBAR_ID, D1, devices.DATA_ID)
+    [CLEAR] = names.lookup(["Clear"])
+    devices.make_device(CLEAR, devices.SWITCH, devices.LOW)
+    network.make_connection(CLEAR, None, D1, devices.CLEAR_ID)
+    devices.cold_startup()
+    return network, monitors
+
+
+def test_get_fan_in_cone(two_blocks):
+    """Test if the cone holds every driver, through DATA inputs too."""
+    network, monitors = two_blocks
+    devices = network.devices
+    [SW1, N1, N2, CLK, D1, CLEAR] = devices.names.lookup(
+        ["Sw1", "N1", "N2", "Clk", "D1", "Clear"])
+    assert get_fan_in_cone(devices, [N1]) == {SW1, N1}
+    assert get_fan_in_cone(devices, [D1]) == {SW1, CLK, D1, CLEAR}
+    assert get_fan_in_cone(devices, [N2, CLK]) == {SW1, N1, N2, CLK}
+
+
+def test_incremental_cone(two_blocks):
+    """Test if the plan follows the monitors as they are made and removed."""
+    network, monitors = two_blocks
+    devices = network.devices
+    [SW1, N1, N2, CLK, D1, CLEAR] = devices.names.lookup(
+        ["Sw1", "N1", "N2", "Clk", "D1", "Clear"])
+    monitors.make_monitor(N1, None)
+    cone = ConeOfInfluence(devices, monitors)
+    monitors.set_cone(cone)
+    network.set_cone(cone)
+    assert get_plan_devices(network) == {SW1, N1}
+
+    monitors.make_monitor(D1, devices.Q_ID)
+    monitors.make_monitor(D1, devices.QBAR_ID)
+    assert get_plan_devices(network) == {SW1, N1, CLK, D1, CLEAR}
+    assert cone.counts[SW1] == 2
+
+    monitors.remove_monitor(D1, devices.Q_ID)
+    assert get_plan_devices(network) == {SW1, N1, CLK, D1, CLEAR}
+    monitors.remove_monitor(N1, None)
+    assert get_plan_devices(network) == {SW1, CLK, D1, CLEAR}
+    monitors.remove_monitor(D1, devices.QBAR_ID)
+    assert get_plan_devices(network) == set()
+    assert cone.counts == {}
+
+    # A new connection brings its driver into the cone
+    monitors.make_monitor(N2, None)
+    assert get_plan_devices(network) == {SW1, N1, N2}
+    [N3, I1] = devices.names.lookup(["N3", "I1"])
+    devices.make_device(N3, devices.NAND, 1)
+    network.make_connection(CLK, None, N3, I1)
+    assert get_plan_devices(network) == {SW1, N1, N2}
+    monitors.make_monitor(N3, None)
+    assert get_plan_devices(network) == {SW1, N1, N2, CLK, N3}
+
+
+def test_restored_monitors_update_cone(two_blocks):
+    """Test if restoring a checkpoint brings its monitors into the cone."""
+    network, monitors = two_blocks
+    devices = network.devices
+    [SW1, N1, CLK, D1, CLEAR] = devices.names.lookup(
+        ["Sw1", "N1", "Clk", "D1", "Clear"])
+    monitors.make_monitor(D1, devices.Q_ID)
+    blob = network.checkpoint(monitors)
+    monitors.remove_monitor(D1, devices.Q_ID)
+    monitors.make_monitor(N1, None)
+    cone = ConeOfInfluence(devices, monitors)
+    monitors.set_cone(cone)
+    network.set_cone(cone)
+    assert get_plan_devices(network) == {SW1, N1}
+
+    assert network.restore(blob, monitors)
+    assert list(monitors.monitors_dictionary) == [(D1, devices.Q_ID)]
+    assert get_plan_devices(network) == {SW1, CLK, D1, CLEAR}
+
+
+def test_pruned_devices_are_not_executed(two_blocks):
+    """Test if the devices outside the cone keep their outputs."""
+    network, monitors = two_blocks
+    devices = network.devices
+    [SW1, N2, D1] = devices.names.lookup(["Sw1", "N2", "D1"])
+    monitors.make_monitor(N2, None)
+    cone = ConeOfInfluence(devices, monitors)
+    monitors.set_cone(cone)
+    network.set_cone(cone)
+    outputs = dict(devices.get_device(D1).outputs)
+    for _ in range(4):
+        assert network.execute_network()
+    assert network.get_output_signal(N2, None) == devices.LOW
+    assert devices.get_device(D1).outputs == outputs
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if the monitored signals are the same as without pruning."""
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        pytest.skip("not a valid network")
+    expected = get_traces(*parsed)
+
+    network, monitors = parse_example(file_name, seed=file_name)
+    cone = ConeOfInfluence(network.devices, monitors)
+    monitors.set_cone(cone)
+    network.set_cone(cone)
+    traces = get_traces(network, monitors)
+    assert [signals for steady, signals in traces] == [
+        signals for steady, signals in expected]
@@ -84,13 +84,13 @@ def test_make_device(new_devices):
                                     new_devices.QBAR_ID: new_devices.LOW}
 
     assert clock_device.clock_half_period == 5
-    # Clock counter and D-type memory are initially at random states
-    assert clock_device.clock_counter in range(5)
+    # Clock phase and D-type memory are initially at random states
+    assert clock_device.clock_phase in range(10)
     assert dtype_device.dtype_memory in [new_devices.LOW, new_devices.HIGH]
 
 
 @pytest.mark.parametrize("function_args, error", [
-    ("(AND1_ID, new_devices.AND, 17)", "new_devices.INVALID_QUALIFIER"),
+    ("(AND1_ID, new_devices.AND, 4097)", "new_devices.INVALID_QUALIFIER"),
     ("(SW1_ID, new_devices.SWITCH, None)", "new_devices.NO_QUALIFIER"),
     ("(X1_ID, new_devices.XOR, 2)", "new_devices.QUALIFIER_PRESENT"),
     ("(D_ID, D_ID, None)", "new_devices.BAD_DEVICE"),
@@ -135,6 +135,30 @@ def test_get_signal_ids(devices_with_items):
     assert devices.get_signal_ids("And1") == [AND1, None]
 
 
+def test_get_edits(new_devices):
+    """Test if the recorded edits are returned since a given version."""
+    devices = new_devices
+    [SW1, AND1, I1] = devices.names.lookup(["Sw1", "And1", "I1"])
+    devices.make_device(SW1, devices.SWITCH, 0)
+    version = devices.topology_version
+    devices.make_device(AND1, devices.AND, 1)
+    assert devices.get_edits(version) == [
+        (devices.DEVICE_ADDED, AND1, None, None),
+        (devices.PORT_ADDED, AND1, None, None)]
+    assert devices.get_edits(devices.topology_version) == []
+
+    devices.get_device(AND1).inputs[I1] = (SW1, None)
+    devices.remove_device(AND1)
+    assert devices.get_edits(version)[2:] == [
+        (devices.CONNECTION_REMOVED, AND1, I1, (SW1, None)),
+        (devices.DEVICE_REMOVED, AND1, None, None)]
+
+    # Changes that were not recorded cannot be replayed
+    devices.topology_version += 1
+    assert devices.get_edits(version) is None
+    assert devices.get_edits(None) is None
+
+
 def test_set_switch(new_devices):
     """Test if set_switch changes the switch state correctly."""
     names = new_devices.names
@@ -148,3 +172,70 @@ def test_set_switch(new_devices):
     # Set switch Sw1 to LOW
     new_devices.set_switch(SW1_ID, new_devices.LOW)
     assert switch_object.switch_state == new_devices.LOW
+
+
+def test_make_lut(new_devices):
+    """Test if make_device correctly makes look-up table devices."""
+    names = new_devices.names
+    [LUT1_ID, LUT2_ID, I1_ID, I2_ID] = names.lookup(["Lut1", "Lut2", "I1",
+                                                     "I2"])
+
+    # 2-input AND gate as a look-up table
+    assert new_devices.make_device(LUT1_ID, new_devices.LUT,
+                                   (2, 0x8)) == new_devices.NO_ERROR
+    lut_device = new_devices.get_device(LUT1_ID)
+    assert lut_device.inputs == {I1_ID: None, I2_ID: None}
+    assert lut_device.outputs == {None: new_devices.LOW}
+    assert lut_device.lut_table == 0x8
+    assert new_devices.get_property(LUT1_ID) == (2, 0x8)
+
+    # The table of a 2-input LUT has only 4 bits
+    assert new_devices.make_device(LUT2_ID, new_devices.LUT,
+                                   (2, 0x10)) == new_devices.INVALID_QUALIFIER
+    assert new_devices.make_device(LUT2_ID, new_devices.LUT,
+                                   (17, 0x1)) == new_devices.INVALID_QUALIFIER
+    assert new_devices.make_device(LUT2_ID, new_devices.LUT,
+                                   (64, 0x1)) == new_devices.INVALID_QUALIFIER
+    assert new_devices.make_device(LUT2_ID, new_devices.LUT,
+                                   (2, -1)) == new_devices.INVALID_QUALIFIER
+    assert new_devices.make_device(LUT2_ID,
+                                   new_devices.LUT) == new_devices.NO_QUALIFIER
+
+
+def test_make_siggen(new_devices):
+    """Test if make_device correctly makes signal generator devices."""
+    names = new_devices.names
+    [SG1_ID, SG2_ID] = names.lookup(["Siggen1", "Siggen2"])
+
+    assert new_devices.make_device(SG1_ID, new_devices.SIGGEN,
+                                   "0011010") == new_devices.NO_ERROR
+    siggen_device = new_devices.get_device(SG1_ID)
+    assert siggen_device.inputs == {}
+    assert siggen_device.outputs == {None: new_devices.LOW}
+    assert siggen_device.siggen_pattern == [0, 0, 1, 1, 0, 1, 0]
+    assert new_devices.get_property(SG1_ID) == "0011010"
+
+    assert new_devices.make_device(SG2_ID, new_devices.SIGGEN,
+                                   "0120") == new_devices.INVALID_QUALIFIER
+    assert new_devices.make_device(SG2_ID, new_devices.SIGGEN,
+                                   "") == new_devices.INVALID_QUALIFIER
+    assert new_devices.make_device(
+        SG2_ID, new_devices.SIGGEN) == new_devices.NO_QUALIFIER
+
+
+def test_clock_signal(new_devices):
+    """Test if the clock level and edges follow from the cycle number."""
+    [CLOCK1_ID] = new_devices.names.lookup(["Clock1"])
+    # Period of 6 cycles, HIGH for the first 2, starting 1 cycle in
+    new_devices.make_device(CLOCK1_ID, new_devices.CLOCK, (3, 2, 1))
+
+    levels = [new_devices.get_clock_signal(CLOCK1_ID, cycle)
+              for cycle in range(-1, 12)]
+    assert levels == [1, 1, 0, 0, 0, 0, 1, 1, 0, 0, 0, 0, 1]
+    assert new_devices.get_next_clock_edge(CLOCK1_ID, -1) == 1
+    assert new_devices.get_next_clock_edge(CLOCK1_ID, 1) == 5
+    assert new_devices.get_next_clock_edge(CLOCK1_ID, 5) == 7
+    assert new_devices.get_next_clock_edge(CLOCK1_ID, 1000) == 1001
+
+    assert new_devices.get_property(CLOCK1_ID) == (3, 2, 1)
+    assert new_devices.get_device(CLOCK1_ID).outputs[None] == new_devices.HIGH
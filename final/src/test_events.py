@@ -0,0 +1,107 @@
+"""Test the events module."""
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from events import EventEngine
+from testing_helpers import (EXAMPLE_FILES, check_engine_traces,
+                             get_edited_traces)
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if the event-driven engine gives the same traces as the sweep."""
+    check_engine_traces(file_name, EventEngine)
+
+
+def test_quiet_devices_are_skipped():
+    """Test if only the devices whose inputs change are executed."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    engine = EventEngine(devices, network)
+    network.set_engine(engine)
+
+    # A switch driving a long chain of inverters
+    [SW1_ID, I1, I2] = names.lookup(["Sw1", "I1", "I2"])
+    devices.make_device(SW1_ID, devices.SWITCH, 0)
+    previous_id = SW1_ID
+    chain_ids = names.lookup(["Nand" + str(number) for number in range(100)])
+    for device_id in chain_ids:
+        devices.make_device(device_id, devices.NAND, 2)
+        network.make_connection(previous_id, None, device_id, I1)
+        network.make_connection(SW1_ID, None, device_id, I2)
+        previous_id = device_id
+
+    assert network.execute_network()
+    executions = engine.executions
+    assert network.execute_network()
+    # Only the switch is executed while nothing changes
+    assert engine.executions - executions == 1
+
+    # A new switch state ripples through the whole chain in one cycle
+    devices.set_switch(SW1_ID, devices.HIGH)
+    assert network.execute_network()
+    outputs = [network.get_output_signal(device_id, None)
+               for device_id in chain_ids]
+    assert outputs == [devices.LOW, devices.HIGH] * 50
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_incremental_edits(file_name):
+    """Test if updating the plan after edits gives the same traces."""
+    expected = get_edited_traces(file_name, EventEngine, rebuild=True)
+    if expected is None:
+        pytest.skip("no gate to edit")
+    assert get_edited_traces(file_name, EventEngine, rebuild=False) == (
+        expected)
+
+
+def test_edits_keep_state():
+    """Test if an edit only executes the devices whose inputs changed."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    engine = EventEngine(devices, network)
+    network.set_engine(engine)
+    [SW1_ID, G1_ID, G2_ID, I1] = names.lookup(["Sw1", "G1", "G2", "I1"])
+    devices.make_device(SW1_ID, devices.SWITCH, devices.HIGH)
+    devices.make_device(G1_ID, devices.NAND, 1)
+    network.make_connection(SW1_ID, None, G1_ID, I1)
+    assert network.execute_network()
+    order = engine.order
+
+    devices.make_device(G2_ID, devices.NAND, 1)
+    network.make_connection(G1_ID, None, G2_ID, I1)
+    executions = engine.executions
+    assert network.execute_network()
+    assert engine.order is order  # updated rather than rebuilt
+    # The switch, which runs every cycle, and the new gate, twice as its
+    # output rises
+    assert engine.executions - executions == 3
+    assert network.get_output_signal(G2_ID, None) == devices.HIGH
+
+    assert network.remove_device(G1_ID)
+    assert devices.get_device(G2_ID).inputs[I1] is None
+    network.make_connection(SW1_ID, None, G2_ID, I1)
+    assert network.execute_network()
+    assert engine.order is order
+    assert network.get_output_signal(G2_ID, None) == devices.LOW
+
+
+@pytest.mark.parametrize("engine_class", [None, EventEngine])
+def test_self_loop(engine_class):
+    """Test if a gate driving its own input is executed again."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    if engine_class is not None:
+        network.set_engine(engine_class(devices, network))
+    [SW1_ID, G1_ID, I1, I2] = names.lookup(["Sw1", "G1", "I1", "I2"])
+    devices.make_device(SW1_ID, devices.SWITCH, devices.HIGH)
+    devices.make_device(G1_ID, devices.NAND, 2)
+    network.make_connection(G1_ID, None, G1_ID, I1)
+    network.make_connection(SW1_ID, None, G1_ID, I2)
+    # The gate inverts its own output, so it never settles
+    assert not network.execute_network()
@@ -0,0 +1,124 @@
+"""Test the faults module."""
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from levelize import LevelizedEngine
+from faults import FaultSimulator
+from testing_helpers import EXAMPLE_FILES, parse_example
+
+
+def get_stimulus(devices):
+    """Return a stimulus that runs, toggles every switch and runs again."""
+    toggled = {}
+    for switch_id in devices.find_devices(devices.SWITCH):
+        toggled[switch_id] = 1 - devices.get_device(switch_id).switch_state
+    return [({}, 12), (toggled, 9)]
+
+
+def get_reference_traces(file_name, stimulus, fault=None):
+    """Return the monitored traces with the fault wired in by hand.
+
+    The faulty port is connected to an extra switch stuck at the level of
+    the fault instead.
+    """
+    network, monitors = parse_example(file_name, seed=file_name)
+    devices = network.devices
+    monitored = {monitor: monitor for monitor in monitors.monitors_dictionary}
+    if fault is not None:
+        (device_id, port_id, is_input, signal) = fault
+        [STUCK] = network.names.lookup(["StuckSource"])
+        devices.make_device(STUCK, devices.SWITCH, signal)
+        devices.get_device(STUCK).outputs[None] = signal
+        for device in devices.devices_list:
+            for input_id, connected_output in device.inputs.items():
+                if (is_input and (device.device_id, input_id) == (
+                        device_id, port_id)) or (
+                        not is_input and connected_output == (device_id,
+                                                              port_id)):
+                    device.inputs[input_id] = (STUCK, None)
+        if not is_input and (device_id, port_id) in monitored:
+            monitored[(device_id, port_id)] = (STUCK, None)
+        devices.topology_version += 1
+    network.set_engine(LevelizedEngine(devices, network))
+    traces = []
+    for switches, cycles in stimulus:
+        for switch_id, signal in switches.items():
+            devices.set_switch(switch_id, signal)
+        for _ in range(cycles):
+            if not network.execute_network():
+                return None
+            traces.append({monitor: network.get_output_signal(*port)
+                           for monitor, port in monitored.items()})
+    return traces
+
+
+@pytest.mark.parametrize("file_name", ["adder.txt", "circuit1.txt",
+                                       "flipflop.txt", "lut.txt",
+                                       "siggen.txt"])
+def test_same_as_wired_faults(file_name):
+    """Test if faults are detected in the cycle that wiring them shows."""
+    network, monitors = parse_example(file_name, seed=file_name)
+    stimulus = get_stimulus(network.devices)
+    simulator = FaultSimulator(network.devices, monitors, batch_size=7)
+    assert simulator.run(stimulus)
+    expected_good = get_reference_traces(file_name, stimulus)
+    for fault in simulator.faults:
+        traces = get_reference_traces(file_name, stimulus, fault)
+        if traces is None:
+            assert fault in simulator.oscillating
+            continue
+        differences = [cycle for cycle, (good, faulty) in enumerate(
+            zip(expected_good, traces)) if good != faulty]
+        assert simulator.detected.get(fault) == (
+            differences[0] if differences else None)
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_batch_size(file_name):
+    """Test if the batch size does not change which faults are detected."""
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        pytest.skip("not a valid network")
+    network, monitors = parsed
+    stimulus = get_stimulus(network.devices)
+    results = []
+    for batch_size in [1, 5, 1000]:
+        simulator = FaultSimulator(network.devices, monitors,
+                                   batch_size=batch_size)
+        results.append((simulator.run(stimulus), simulator.detected,
+                        simulator.oscillating))
+    assert results[0] == results[1] == results[2]
+
+
+def test_coverage_report(capsys):
+    """Test the coverage of an AND gate with two stimuli."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    [SW1, SW2, G1, I1, I2] = names.lookup(["SW1", "SW2", "G1", "I1", "I2"])
+    devices.make_device(SW1, devices.SWITCH, 1)
+    devices.make_device(SW2, devices.SWITCH, 1)
+    devices.make_device(G1, devices.AND, 2)
+    network.make_connection(SW1, None, G1, I1)
+    network.make_connection(SW2, None, G1, I2)
+    monitors.make_monitor(G1, None)
+    simulator = FaultSimulator(devices, monitors)
+    assert len(simulator.get_faults()) == 10
+
+    assert simulator.run([({}, 1)])
+    assert simulator.get_coverage() == 0.5  # only the stuck-at-0 faults
+    simulator.display_report()
+    output = capsys.readouterr().out
+    assert "50.0% (5 of 10 faults detected)" in output
+    assert "G1.I1 stuck-at-1" in output
+    assert "G1.I1 stuck-at-0" not in output
+
+    assert simulator.run([({}, 1), ({SW1: 0}, 1), ({SW1: 1, SW2: 0}, 1)])
+    assert simulator.get_coverage() == 1.0
+    assert simulator.detected[(SW1, None, False, devices.HIGH)] == 1
+    assert simulator.detected[(G1, I2, True, devices.HIGH)] == 2
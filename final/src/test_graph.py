@@ -0,0 +1,64 @@
+"""Test the graph module."""
+from names import Names
+from devices import Devices
+from network import Network
+from graph import (strongly_connected_components, get_device_graph,
+                   get_connected_components)
+
+
+def test_strongly_connected_components():
+    """Test if the components are found in topological order."""
+    successors = {"a": ["b"], "b": ["c", "e"], "c": ["d"], "d": ["c"],
+                  "e": ["e", "f"], "f": []}
+    components = strongly_connected_components(list("abcdef"), successors)
+    assert sorted(sorted(component) for component in components) == [
+        ["a"], ["b"], ["c", "d"], ["e"], ["f"]]
+    position = {node: number for number, component in enumerate(components)
+                for node in component}
+    for node, children in successors.items():
+        for child in children:
+            assert position[node] <= position[child]
+
+
+def test_deep_chain():
+    """Test if very deep graphs do not reach the recursion limit."""
+    successors = {number: [number + 1] for number in range(100000)}
+    components = strongly_connected_components(range(100001), successors)
+    assert components == [[number] for number in range(100001)]
+
+
+def test_get_device_graph():
+    """Test if the device graph follows the connections."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    [SW1, G1, D1, I1, I2] = names.lookup(["Sw1", "G1", "D1", "I1", "I2"])
+    devices.make_device(SW1, devices.SWITCH, 0)
+    devices.make_device(G1, devices.AND, 2)
+    devices.make_device(D1, devices.D_TYPE)
+    network.make_connection(SW1, None, G1, I1)
+    network.make_connection(SW1, None, G1, I2)
+    network.make_connection(G1, None, D1, devices.DATA_ID)
+    network.make_connection(SW1, None, D1, devices.CLK_ID)
+
+    assert get_device_graph(devices) == {SW1: [G1, D1], G1: [D1], D1: []}
+    assert get_device_graph(devices, cut_inputs=[devices.DATA_ID]) == {
+        SW1: [G1, D1], G1: [], D1: []}
+
+
+def test_get_connected_components():
+    """Test if unconnected groups of devices are found in device order."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    [SW1, SW2, G1, G2, SW3, I1, I2] = names.lookup(
+        ["Sw1", "Sw2", "G1", "G2", "Sw3", "I1", "I2"])
+    devices.make_device(SW1, devices.SWITCH, 0)
+    devices.make_device(SW2, devices.SWITCH, 0)
+    devices.make_device(G1, devices.AND, 2)
+    devices.make_device(G2, devices.NAND, 2)
+    devices.make_device(SW3, devices.SWITCH, 1)
+    network.make_connection(SW1, None, G2, I1)
+    network.make_connection(G2, None, G1, I1)
+    network.make_connection(SW2, None, G1, I2)
+    assert get_connected_components(devices) == [[SW1, SW2, G1, G2], [SW3]]
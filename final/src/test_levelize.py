@@ -0,0 +1,137 @@
+"""Test the levelize module."""
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from levelize import LevelizedEngine
+from testing_helpers import (EXAMPLE_FILES, check_engine_traces,
+                             get_edited_traces, get_switched_data_traces)
+
+
+@pytest.fixture
+def new_network():
+    """Return a new Network instance that uses the levelized engine."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    network.set_engine(LevelizedEngine(devices, network))
+    return network
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if the levelized engine gives the same traces as the sweep."""
+    check_engine_traces(file_name, LevelizedEngine)
+
+
+def test_deep_chain(new_network):
+    """Test if a chain deeper than the iteration limit settles in one pass."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW1_ID, I1] = names.lookup(["Sw1", "I1"])
+    chain_ids = names.lookup(["Nand" + str(number) for number in range(100)])
+    # Made from the end of the chain, so a sweep needs one iteration per gate
+    for device_id in chain_ids[::-1]:
+        devices.make_device(device_id, devices.NAND, 1)
+    devices.make_device(SW1_ID, devices.SWITCH, devices.HIGH)
+    previous_id = SW1_ID
+    for device_id in chain_ids:
+        network.make_connection(previous_id, None, device_id, I1)
+        previous_id = device_id
+
+    assert network.execute_network()
+    assert network.iterations == 1
+    assert [network.get_output_signal(device_id, None)
+            for device_id in chain_ids] == [devices.LOW, devices.HIGH] * 50
+
+
+def test_feedback_loops(new_network):
+    """Test if latches settle and ring oscillators are detected."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SET_ID, RESET_ID, N1_ID, N2_ID, I1, I2] = names.lookup(
+        ["Set", "Reset", "Nor1", "Nor2", "I1", "I2"])
+    devices.make_device(SET_ID, devices.SWITCH, devices.HIGH)
+    devices.make_device(RESET_ID, devices.SWITCH, devices.LOW)
+    devices.make_device(N1_ID, devices.NOR, 2)
+    devices.make_device(N2_ID, devices.NOR, 2)
+    # SR latch: Q is the output of Nor1
+    network.make_connection(RESET_ID, None, N1_ID, I1)
+    network.make_connection(N2_ID, None, N1_ID, I2)
+    network.make_connection(SET_ID, None, N2_ID, I1)
+    network.make_connection(N1_ID, None, N2_ID, I2)
+
+    assert network.execute_network()
+    assert network.get_output_signal(N1_ID, None) == devices.HIGH
+    devices.set_switch(SET_ID, devices.LOW)
+    assert network.execute_network()
+    assert network.get_output_signal(N1_ID, None) == devices.HIGH  # held
+    devices.set_switch(RESET_ID, devices.HIGH)
+    assert network.execute_network()
+    assert network.get_output_signal(N1_ID, None) == devices.LOW
+
+    # A NAND gate driving its own input oscillates
+    [OSC_ID] = names.lookup(["Osc"])
+    devices.make_device(OSC_ID, devices.NAND, 1)
+    network.make_connection(OSC_ID, None, OSC_ID, I1)
+    assert not network.execute_network()
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_incremental_edits(file_name):
+    """Test if updating the plan after edits gives the same traces."""
+    expected = get_edited_traces(file_name, LevelizedEngine, rebuild=True)
+    if expected is None:
+        pytest.skip("no gate to edit")
+    assert get_edited_traces(file_name, LevelizedEngine,
+                             rebuild=False) == expected
+
+
+def test_edit_reorders_components(new_network):
+    """Test if a new connection moves only the components it must."""
+    network = new_network
+    devices = network.devices
+    engine = network.engine
+    names = devices.names
+    [SW1_ID, I1] = names.lookup(["Sw1", "I1"])
+    devices.make_device(SW1_ID, devices.SWITCH, devices.LOW)
+    gate_ids = names.lookup(["G" + str(number) for number in range(4)])
+    for gate_id in gate_ids:
+        devices.make_device(gate_id, devices.NAND, 1)
+    # G0 drives G1, and G2 drives G3
+    network.make_connection(SW1_ID, None, gate_ids[0], I1)
+    network.make_connection(gate_ids[0], None, gate_ids[1], I1)
+    network.make_connection(SW1_ID, None, gate_ids[2], I1)
+    network.make_connection(gate_ids[2], None, gate_ids[3], I1)
+    assert network.execute_network()
+    components = engine.components
+
+    # A new gate at the start of the chain G0, G1
+    [NEW_ID] = names.lookup(["New"])
+    devices.make_device(NEW_ID, devices.NAND, 1)
+    assert network.remove_connection(gate_ids[0], I1)
+    network.make_connection(SW1_ID, None, NEW_ID, I1)
+    network.make_connection(NEW_ID, None, gate_ids[0], I1)
+    assert network.execute_network()
+    assert engine.components is components
+    order = [members[0][1].device_id for members in components if members]
+    assert order.index(NEW_ID) < order.index(gate_ids[0]) < order.index(
+        gate_ids[1])
+    assert network.get_output_signal(gate_ids[1], None) == devices.HIGH
+
+    # A connection that makes a loop rebuilds the plan
+    assert network.remove_connection(NEW_ID, I1)
+    network.make_connection(gate_ids[1], None, NEW_ID, I1)
+    network.execute_network()
+    assert engine.components is not components
+
+
+def test_data_sampled_before_edge():
+    """Test if a D-type stores its DATA from before the clock edge."""
+    expected = get_switched_data_traces(None)
+    assert get_switched_data_traces(LevelizedEngine) == expected
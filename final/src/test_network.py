@@ -1,9 +1,14 @@
 """Test the network module."""
+
 import pytest
 
 from names import Names
 from devices import Devices
 from network import Network
+from events import EventEngine
+from levelize import LevelizedEngine
+from timed import TimedEngine
+from testing_helpers import EXAMPLE_FILES, parse_example, get_edited_traces
 
 
 @pytest.fixture
@@ -95,6 +100,42 @@ def test_get_output_signal(network_with_devices):
     assert network.get_output_signal(OR1_ID, None) == devices.HIGH
 
 
+def test_remove_connection(network_with_devices):
+    """Test if remove_connection disconnects only connected inputs."""
+    network = network_with_devices
+    devices = network.devices
+    [SW1_ID, OR1_ID, I1, I2] = devices.names.lookup(["Sw1", "Or1", "I1",
+                                                      "I2"])
+    network.make_connection(SW1_ID, None, OR1_ID, I1)
+    assert network.remove_connection(OR1_ID, I1)
+    assert network.get_connected_output(OR1_ID, I1) is None
+    assert not network.remove_connection(OR1_ID, I1)
+    assert not network.remove_connection(OR1_ID, I2)
+    assert not network.remove_connection(SW1_ID, None)
+    assert network.make_connection(SW1_ID, None, OR1_ID,
+                                   I1) == network.NO_ERROR
+
+
+def test_remove_device(network_with_devices):
+    """Test if remove_device disconnects the device and removes it."""
+    network = network_with_devices
+    devices = network.devices
+    [SW1_ID, SW2_ID, OR1_ID, I1, I2] = devices.names.lookup(
+        ["Sw1", "Sw2", "Or1", "I1", "I2"])
+    network.make_connection(SW1_ID, None, OR1_ID, I1)
+    network.make_connection(SW2_ID, None, OR1_ID, I2)
+    devices.set_switch(SW2_ID, devices.HIGH)
+    assert network.execute_network()
+
+    assert network.remove_device(SW1_ID)
+    assert devices.get_device(SW1_ID) is None
+    assert network.get_connected_output(OR1_ID, I1) is None
+    assert not network.remove_device(SW1_ID)
+    # The other devices keep their signals
+    assert network.get_output_signal(OR1_ID, None) == devices.HIGH
+    assert network.get_output_signal(SW2_ID, None) == devices.HIGH
+
+
 def test_check_network(network_with_devices):
     """Test if the signal at a given input port is correct."""
     network = network_with_devices
@@ -292,11 +333,11 @@ def test_execute_non_gates(new_network):
     dtype_Q = "network.get_output_signal(D_ID, devices.Q_ID)"
     dtype_QBAR = "network.get_output_signal(D_ID, devices.QBAR_ID)"
 
-    # Execute devices until the clock is LOW at the start of its
+    # Execute devices until the clock is LOW at the end of its
     # period
-    clock_device = devices.get_device(CL_ID)
     network.execute_network()
-    while clock_device.clock_counter != 1 or eval(clock_output) != LOW:
+    while (eval(clock_output) != LOW
+           or devices.get_clock_signal(CL_ID, devices.cycle) != HIGH):
         network.execute_network()
 
     # The clock is not rising yet, Q could be (randomly) HIGH or LOW
@@ -348,3 +389,266 @@ def test_oscillating_network(new_network):
     network.make_connection(NOR1, None, NOR1, I1)
 
     assert not network.execute_network()
+
+
+@pytest.mark.parametrize("switch_outputs, lut_output", [
+    (["LOW", "LOW", "LOW"], "LOW"),
+    (["HIGH", "LOW", "LOW"], "HIGH"),
+    (["HIGH", "HIGH", "LOW"], "LOW"),
+    (["HIGH", "HIGH", "HIGH"], "HIGH"),
+])
+def test_execute_lut(new_network, switch_outputs, lut_output):
+    """Test if execute_network returns the correct output for LUT devices."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [LUT1_ID, SW1_ID, SW2_ID, SW3_ID, I1, I2, I3] = names.lookup(
+        ["Lut1", "Sw1", "Sw2", "Sw3", "I1", "I2", "I3"])
+
+    LOW = devices.LOW
+    HIGH = devices.HIGH
+
+    # Make a 3-input parity function
+    devices.make_device(LUT1_ID, devices.LUT, (3, 0x96))
+    switches = [SW1_ID, SW2_ID, SW3_ID]
+    for switch_id, input_id, switch_output in zip(switches, [I1, I2, I3],
+                                                  switch_outputs):
+        devices.make_device(switch_id, devices.SWITCH, eval(switch_output))
+        network.make_connection(switch_id, None, LUT1_ID, input_id)
+
+    assert network.execute_network()
+    assert network.get_output_signal(LUT1_ID, None) == eval(lut_output)
+
+
+def test_execute_siggen(new_network):
+    """Test if execute_network repeats the pattern of signal generators."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SG1_ID] = names.lookup(["Siggen1"])
+    devices.make_device(SG1_ID, devices.SIGGEN, "0011010")
+    devices.cold_startup()
+
+    outputs = []
+    for _ in range(14):
+        assert network.execute_network()
+        outputs.append(network.get_output_signal(SG1_ID, None))
+    assert outputs == [0, 0, 1, 1, 0, 1, 0] * 2
+    assert devices.cycle == 14
+
+    # The pattern restarts after a cold start-up
+    devices.cold_startup()
+    network.execute_network()
+    network.execute_network()
+    network.execute_network()
+    assert network.get_output_signal(SG1_ID, None) == devices.HIGH
+
+
+@pytest.mark.parametrize("gate_kind, low_inputs, gate_output", [
+    ("AND", [], "HIGH"),
+    ("AND", [2999], "LOW"),
+    ("NAND", [0, 1500], "HIGH"),
+    ("OR", list(range(3000)), "LOW"),
+    ("NOR", list(range(2999)), "LOW"),
+])
+def test_execute_wide_gates(new_network, gate_kind, low_inputs, gate_output):
+    """Test if execute_network simulates gates with thousands of inputs."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [G1_ID, SW_LOW, SW_HIGH] = names.lookup(["G1", "SwLow", "SwHigh"])
+    devices.make_device(SW_LOW, devices.SWITCH, devices.LOW)
+    devices.make_device(SW_HIGH, devices.SWITCH, devices.HIGH)
+    assert devices.make_device(G1_ID, eval("devices." + gate_kind),
+                               3000) == devices.NO_ERROR
+
+    input_ids = devices.get_gate_input_ids(3000)
+    assert names.get_name_string(input_ids[-1]) == "I3000"
+    low_inputs = set(low_inputs)
+    for input_number, input_id in enumerate(input_ids):
+        switch_id = SW_LOW if input_number in low_inputs else SW_HIGH
+        network.make_connection(switch_id, None, G1_ID, input_id)
+
+    assert network.execute_network()
+    assert network.get_output_signal(G1_ID, None) == eval(
+        "devices." + gate_output)
+
+
+def test_execute_rc(new_network):
+    """Test if the RC output falls in cycle rc_time, whatever the network."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [RC1_ID, RC2_ID, SW1_ID, G1_ID, G2_ID, I1, I2] = names.lookup(
+        ["Rc1", "Rc2", "Sw1", "G1", "G2", "I1", "I2"])
+    devices.make_device(RC1_ID, devices.RC, 3)
+    devices.make_device(RC2_ID, devices.RC, 1)
+    devices.make_device(SW1_ID, devices.SWITCH, devices.HIGH)
+    # A chain of gates needs several iterations to settle
+    devices.make_device(G1_ID, devices.NAND, 2)
+    devices.make_device(G2_ID, devices.NAND, 2)
+    network.make_connection(RC1_ID, None, G1_ID, I1)
+    network.make_connection(SW1_ID, None, G1_ID, I2)
+    network.make_connection(G1_ID, None, G2_ID, I1)
+    network.make_connection(SW1_ID, None, G2_ID, I2)
+    devices.cold_startup()
+
+    outputs = []
+    for _ in range(5):
+        assert network.execute_network()
+        outputs.append((network.get_output_signal(RC1_ID, None),
+                        network.get_output_signal(RC2_ID, None),
+                        network.get_output_signal(G2_ID, None)))
+    assert outputs == [(1, 0, 1), (1, 0, 1), (0, 0, 0), (0, 0, 0), (0, 0, 0)]
+    assert devices.rc_schedule == []  # no timers left once discharged
+
+    # The RC devices charge again after a cold start-up
+    devices.cold_startup()
+    assert network.execute_network()
+    assert network.get_output_signal(RC1_ID, None) == devices.HIGH
+
+
+def test_execution_plan(new_network):
+    """Test if the plan is reused, and updated when the topology changes."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW1_ID, G1_ID, I1] = names.lookup(["Sw1", "G1", "I1"])
+    devices.make_device(SW1_ID, devices.SWITCH, devices.HIGH)
+    plan = network.get_plan()
+    assert [(kind.kind_id, device_ids) for kind, device_ids
+            in plan] == [(devices.SWITCH, [SW1_ID])]
+    assert network.execute_network()
+    assert network.get_plan() is plan
+
+    devices.make_device(G1_ID, devices.NAND, 1)
+    network.make_connection(SW1_ID, None, G1_ID, I1)
+    assert network.get_plan() is plan
+    assert [(kind.kind_id, device_ids) for kind, device_ids
+            in plan] == [(devices.SWITCH, [SW1_ID]), (devices.NAND, [G1_ID])]
+    assert network.execute_network()
+    assert network.get_output_signal(G1_ID, None) == devices.LOW
+
+
+def make_zero_delay_engine(devices, network):
+    """Return a timed engine in which the gates have no delay."""
+    return TimedEngine(devices, network, delays={devices.NAND: 0})
+
+
+@pytest.mark.parametrize("make_engine", [None, EventEngine, LevelizedEngine,
+                                         make_zero_delay_engine])
+def test_oscillating_loops(new_network, make_engine):
+    """Test if the devices of an oscillating loop are reported."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+    if make_engine is not None:
+        network.set_engine(make_engine(devices, network))
+
+    [SW1_ID, I1, I2] = names.lookup(["Sw1", "I1", "I2"])
+    devices.make_device(SW1_ID, devices.SWITCH, devices.HIGH)
+    # A ring of three inverters, driving a gate outside the ring
+    ring_ids = names.lookup(["Ring1", "Ring2", "Ring3", "Out"])
+    for device_id in ring_ids:
+        devices.make_device(device_id, devices.NAND, 2)
+    for device_id, driver_id in zip(ring_ids, ring_ids[2:3] + ring_ids):
+        network.make_connection(driver_id, None, device_id, I1)
+        network.make_connection(SW1_ID, None, device_id, I2)
+    [OUT_ID] = ring_ids[3:]
+
+    assert not network.execute_network()
+    assert network.oscillating_loops == [ring_ids[:3]]
+    assert OUT_ID not in network.oscillating_loops[0]
+
+    # Stopping the ring settles the network
+    devices.set_switch(SW1_ID, devices.LOW)
+    assert network.execute_network()
+    assert network.oscillating_loops == []
+
+
+def test_iteration_limit(new_network):
+    """Test if a chain that needs more iterations than the limit fails."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW1_ID, I1] = names.lookup(["Sw1", "I1"])
+    chain_ids = names.lookup(["Nand" + str(number) for number in range(5)])
+    # Made from the end of the chain, so each gate needs another iteration
+    for device_id in chain_ids[::-1]:
+        devices.make_device(device_id, devices.NAND, 1)
+    devices.make_device(SW1_ID, devices.SWITCH, devices.HIGH)
+    previous_id = SW1_ID
+    for device_id in chain_ids:
+        network.make_connection(previous_id, None, device_id, I1)
+        previous_id = device_id
+
+    network.iteration_limit = 3
+    assert not network.execute_network()
+    assert network.iterations == 3
+    # Not a loop, so the devices still changing are reported as one group
+    assert len(network.oscillating_loops) == 1
+    assert chain_ids[-1] in network.oscillating_loops[0]
+
+    network.iteration_limit = 20
+    assert network.execute_network()
+
+
+@pytest.mark.parametrize("file_name", ["flipflop.txt", "rc.txt",
+                                       "siggen.txt", "clock_duty.txt"])
+@pytest.mark.parametrize("use_engine", [False, True])
+def test_checkpoint_restore(file_name, use_engine):
+    """Test if a restored checkpoint continues like the original run."""
+    network, monitors = parse_example(file_name, seed=file_name)
+    devices = network.devices
+    if use_engine:
+        network.set_engine(LevelizedEngine(devices, network))
+
+    def run(cycles):
+        for _ in range(cycles):
+            assert network.execute_network()
+            monitors.record_signals()
+        return {monitor: list(signal_list) for monitor, signal_list
+                in monitors.monitors_dictionary.items()}
+
+    run(7)
+    blob = network.checkpoint(monitors)
+    expected = run(23)
+    # Change the state before returning to the checkpoint
+    for switch_id in devices.find_devices(devices.SWITCH):
+        devices.set_switch(switch_id, devices.HIGH)
+    devices.cold_startup()
+    run(3)
+
+    assert network.restore(blob, monitors)
+    assert devices.cycle == 7
+    assert run(23) == expected
+
+
+def test_restore_invalid_checkpoint():
+    """Test if checkpoints of other networks and corrupt blobs are refused."""
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    other_network, other_monitors = parse_example("circuit1.txt", seed=1)
+    blob = network.checkpoint(monitors)
+    assert not other_network.restore(blob, other_monitors)
+    assert not network.restore(blob[:-5], monitors)
+    assert not network.restore(b"", monitors)
+    assert network.restore(blob, monitors)
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_incremental_edits(file_name):
+    """Test if updating the plan after edits gives the same traces."""
+    def make_sweep(devices, network):
+        return None
+
+    expected = get_edited_traces(file_name, make_sweep, rebuild=True)
+    if expected is None:
+        pytest.skip("no gate to edit")
+    assert get_edited_traces(file_name, make_sweep, rebuild=False) == (
+        expected)
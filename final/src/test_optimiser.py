@@ -0,0 +1,217 @@
+"""Test the optimiser module."""
+import itertools
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from optimiser import Optimiser
+from events import EventEngine
+from levelize import LevelizedEngine
+from testing_helpers import EXAMPLE_FILES, parse_example, get_traces
+
+
+@pytest.fixture
+def full_adder():
+    """Return an Optimiser instance for a gate-level full adder."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+    new_monitors = Monitors(new_names, new_devices, new_network)
+
+    [SW1, SW2, SW3, X1, X2, A1, A2, O1, I1, I2] = new_names.lookup(
+        ["Sw1", "Sw2", "Sw3", "Xor1", "Xor2", "And1", "And2", "Or1", "I1",
+         "I2"])
+    for switch_id in [SW1, SW2, SW3]:
+        new_devices.make_device(switch_id, new_devices.SWITCH, 0)
+    new_devices.make_device(X1, new_devices.XOR)
+    new_devices.make_device(X2, new_devices.XOR)
+    new_devices.make_device(A1, new_devices.AND, 2)
+    new_devices.make_device(A2, new_devices.AND, 2)
+    new_devices.make_device(O1, new_devices.OR, 2)
+
+    connections = [(SW1, X1, I1), (SW2, X1, I2), (X1, X2, I1), (SW3, X2, I2),
+                   (SW1, A1, I1), (SW2, A1, I2), (X1, A2, I1), (SW3, A2, I2),
+                   (A1, O1, I1), (A2, O1, I2)]
+    for (output_device, input_device, input_id) in connections:
+        new_network.make_connection(output_device, None, input_device,
+                                    input_id)
+
+    # Sum and carry out
+    new_monitors.make_monitor(X2, None)
+    new_monitors.make_monitor(O1, None)
+
+    return Optimiser(new_names, new_devices, new_network, new_monitors)
+
+
+def get_outputs(optimiser, switch_states):
+    """Return the monitored outputs for the given switch states."""
+    devices = optimiser.devices
+    network = optimiser.network
+    [SW1, SW2, SW3] = devices.names.lookup(["Sw1", "Sw2", "Sw3"])
+    for switch_id, state in zip([SW1, SW2, SW3], switch_states):
+        devices.set_switch(switch_id, state)
+    assert network.execute_network()
+    return [network.get_output_signal(device_id, output_id)
+            for (device_id, output_id) in optimiser.monitors.monitors_dictionary]
+
+
+def test_evaluate_gate(full_adder):
+    """Test if evaluate_gate returns the correct output bits."""
+    devices = full_adder.devices
+    assert full_adder.evaluate_gate(devices.AND, [1, 1, 0]) == 0
+    assert full_adder.evaluate_gate(devices.NAND, [1, 1, 0]) == 1
+    assert full_adder.evaluate_gate(devices.OR, [0, 0, 1]) == 1
+    assert full_adder.evaluate_gate(devices.NOR, [0, 0, 1]) == 0
+    assert full_adder.evaluate_gate(devices.XOR, [1, 0]) == 1
+    assert full_adder.evaluate_gate(devices.LUT, [0, 1], 0x4) == 1
+
+
+def test_collapse_luts(full_adder):
+    """Test if collapse_luts keeps the behaviour with fewer devices."""
+    devices = full_adder.devices
+    expected = {}
+    for switch_states in itertools.product([0, 1], repeat=3):
+        expected[switch_states] = get_outputs(full_adder, switch_states)
+
+    # The carry gates And1, And2 and Or1 collapse into one LUT. Xor1 is
+    # shared by the sum and the carry, so it is kept.
+    assert full_adder.collapse_luts(max_inputs=4) == 2
+    [OR1, AND1, AND2] = devices.names.lookup(["Or1", "And1", "And2"])
+    assert devices.get_device(OR1).device_kind == devices.LUT
+    assert devices.get_device(AND1) is None
+    assert devices.get_device(AND2) is None
+
+    for switch_states in itertools.product([0, 1], repeat=3):
+        assert get_outputs(full_adder, switch_states) == \
+            expected[switch_states]
+
+
+def test_collapse_luts_input_limit(full_adder):
+    """Test if collapse_luts respects the maximum number of LUT inputs."""
+    assert full_adder.collapse_luts(max_inputs=2) == 0
+
+
+def test_fold_constants(full_adder):
+    """Test if gates driven by a constant switch are simplified."""
+    devices = full_adder.devices
+    [SW3, X2, A2, O1] = devices.names.lookup(["Sw3", "Xor2", "And2", "Or1"])
+    expected = [get_outputs(full_adder, states + (0,))
+                for states in itertools.product([0, 1], repeat=2)]
+
+    assert devices.set_constant(SW3)
+    assert not devices.set_switch(SW3, devices.HIGH)
+    assert full_adder.optimise() == 1
+    # And2 is always LOW, so it is removed in favour of the switch
+    assert devices.get_device(A2) is None
+    assert devices.get_signal_ids("And2") == [SW3, None]
+    assert devices.get_signal_name(A2, None) == "Sw3"
+    # The monitored gates stay, as a buffer and a one-input OR gate
+    assert devices.get_device(X2).device_kind == devices.AND
+    assert list(devices.get_device(O1).inputs) == devices.get_gate_input_ids(1)
+    assert [get_outputs(full_adder, states + (0,))
+            for states in itertools.product([0, 1], repeat=2)] == expected
+
+
+def test_merge_and_remove_buffers():
+    """Test if identical gates, buffers and double inversions are removed."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    [A, B, C, AND1, AND2, N1, N2, BUF, OR1, X1, I1, I2] = names.lookup(
+        ["A", "B", "C", "And1", "And2", "Nand1", "Nand2", "Buf", "Or1",
+         "Xor1", "I1", "I2"])
+    for switch_id in [A, B, C]:
+        devices.make_device(switch_id, devices.SWITCH, 0)
+    devices.make_device(AND1, devices.AND, 2)
+    devices.make_device(AND2, devices.AND, 2)
+    devices.make_device(N1, devices.NAND, 1)
+    devices.make_device(N2, devices.LUT, (1, 0b01))
+    devices.make_device(BUF, devices.OR, 1)
+    devices.make_device(OR1, devices.OR, 2)
+    devices.make_device(X1, devices.XOR)
+    connections = [(A, AND1, I1), (B, AND1, I2), (B, AND2, I1),
+                   (A, AND2, I2), (AND1, N1, I1), (N1, N2, I1),
+                   (AND2, BUF, I1), (N2, OR1, I1), (C, OR1, I2),
+                   (BUF, X1, I1), (C, X1, I2)]
+    for (output_device, input_device, input_id) in connections:
+        network.make_connection(output_device, None, input_device, input_id)
+    monitors.make_monitor(OR1, None)
+    monitors.make_monitor(X1, None)
+
+    def get_all_outputs():
+        outputs = []
+        for states in itertools.product([0, 1], repeat=3):
+            for switch_id, state in zip([A, B, C], states):
+                devices.set_switch(switch_id, state)
+            assert network.execute_network()
+            outputs.append([network.get_output_signal(OR1, None),
+                            network.get_output_signal(X1, None)])
+        return outputs
+
+    expected = get_all_outputs()
+    optimiser = Optimiser(names, devices, network, monitors)
+    assert optimiser.optimise() == 3
+    # One of the two AND gates is merged into the other
+    [kept] = [device_id for device_id in [AND1, AND2]
+              if devices.get_device(device_id) is not None]
+    for device_id in [N2, BUF]:
+        assert devices.get_device(device_id) is None
+    assert devices.get_device(OR1).inputs[I1] == (kept, None)
+    assert devices.get_device(X1).inputs[I1] == (kept, None)
+    assert devices.get_signal_ids("Nand2") == [kept, None]
+    assert devices.get_signal_ids("And1") == [kept, None]
+    assert devices.get_signal_name(BUF, None) == names.get_name_string(kept)
+    assert get_all_outputs() == expected
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if optimising keeps the monitored signals the same."""
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        pytest.skip("not a valid network")
+    network, monitors = parsed
+    devices = network.devices
+    # Hold the first switch, if any, so there are constants to fold
+    for switch_id in devices.find_devices(devices.SWITCH)[:1]:
+        devices.set_constant(switch_id)
+    expected = get_traces(network, monitors)
+
+    network, monitors = parse_example(file_name, seed=file_name)
+    devices = network.devices
+    for switch_id in devices.find_devices(devices.SWITCH)[:1]:
+        devices.set_constant(switch_id)
+    Optimiser(devices.names, devices, network, monitors).optimise()
+    assert get_traces(network, monitors) == expected
+
+
+@pytest.mark.parametrize("engine_class", [None, EventEngine,
+                                          LevelizedEngine])
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_plans_follow_edits(file_name, engine_class):
+    """Test if the plans updated from the recorded edits give the traces."""
+    traces = []
+    for rebuild in [True, False]:
+        parsed = parse_example(file_name, seed=file_name)
+        if parsed is None:
+            pytest.skip("not a valid network")
+        network, monitors = parsed
+        devices = network.devices
+        for switch_id in devices.find_devices(devices.SWITCH)[:1]:
+            devices.set_constant(switch_id)
+        if engine_class is not None:
+            network.set_engine(engine_class(devices, network))
+        result = get_traces(network, monitors, cycles=12)
+        version = devices.topology_version
+        Optimiser(devices.names, devices, network, monitors).optimise()
+        if rebuild:
+            devices.topology_edits.clear()
+        else:
+            assert devices.get_edits(version) is not None
+        result += get_traces(network, monitors, cycles=12)
+        traces.append(result)
+    assert traces[0] == traces[1]
@@ -1,3 +1,6 @@
+import contextlib
+import io
+
 import pytest
 
 from monitors import Monitors
@@ -148,3 +151,85 @@ def test_skip_block(parser):
     assert parser.decode() == ";"
     parser.next_block()
     assert parser.decode() == "MONITORS"
+
+
+def parse_example(file_name):
+    """Return the names, devices and network parsed from an example file."""
+    pNames = Names()
+    pDevices = Devices(pNames)
+    pNetwork = Network(pNames, pDevices)
+    pMonitors = Monitors(pNames, pDevices, pNetwork)
+    scanner = Scanner(
+        path=os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                          "..", "doc", "net_definition",
+                                          file_name)),
+        names_map=pNames,
+        devices_map=Names(["CLOCK", "SWITCH", "AND", "NAND", "OR", "NOR",
+                           "XOR", "DTYPE", "RC", "LUT", "SIGGEN"]),
+        keywords_map=Names(["DEVICES", "CONNECTIONS", "MONITORS",
+                            "DATA", "CLK", "SET", "CLEAR", "Q", "QBAR", "I"]),
+        punct_map=Names([",", ".", ":", ";", ">", "[", "]", "="])
+    )
+    parser = Parser(pNames, pDevices, pNetwork, pMonitors, scanner)
+    assert parser.parse_network() is True
+    return pNames, pDevices, pNetwork
+
+
+def test_parse_lut():
+    pNames, pDevices, pNetwork = parse_example("lut.txt")
+
+    [CARRY] = pNames.lookup(["CARRY"])
+    assert pDevices.get_property(CARRY) == (3, 0xE8)
+    assert pNetwork.check_network()
+
+
+@pytest.mark.parametrize("lut", ["LUT[64, 0x1]", "LUT[0, 0x1]",
+                                 "LUT[2, 0x10]"])
+def test_parse_bad_lut(tmp_path, lut):
+    """Test if a bad input count or table is rejected at once."""
+    path = tmp_path / "bad_lut.txt"
+    path.write_text("DEVICES: SW1 = SWITCH[0]; L1 = " + lut
+                    + "; CONNECTIONS: SW1 > L1.I1; MONITORS: L1;")
+    pNames = Names()
+    pDevices = Devices(pNames)
+    pNetwork = Network(pNames, pDevices)
+    pMonitors = Monitors(pNames, pDevices, pNetwork)
+    scanner = Scanner(
+        path=str(path),
+        names_map=pNames,
+        devices_map=Names(pDevices.registry.get_names()),
+        keywords_map=Names(["DEVICES", "CONNECTIONS", "MONITORS",
+                            "DATA", "CLK", "SET", "CLEAR", "Q", "QBAR", "I"]),
+        punct_map=Names([",", ".", ":", ";", ">", "[", "]", "="])
+    )
+    parser = Parser(pNames, pDevices, pNetwork, pMonitors, scanner)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert not parser.parse_network()
+
+
+def test_parse_siggen():
+    pNames, pDevices, pNetwork = parse_example("siggen.txt")
+
+    [P1, P2] = pNames.lookup(["P1", "P2"])
+    assert pDevices.get_property(P1) == "0011010"
+    assert pDevices.get_property(P2) == "01"
+    assert pNetwork.check_network()
+
+
+def test_parse_clock_duty():
+    pNames, pDevices, pNetwork = parse_example("clock_duty.txt")
+
+    [CK1, CK2, CK3, G1] = pNames.lookup(["CK1", "CK2", "CK3", "G1"])
+    assert pDevices.get_property(CK1) == 2
+    assert pDevices.get_property(CK2) == (4, 2, 0)
+    assert pDevices.get_property(CK3) == (4, 6, 3)
+    assert pNetwork.check_network()
+
+    pDevices.cold_startup()
+    outputs = []
+    for _ in range(8):
+        assert pNetwork.execute_network()
+        outputs.append([pNetwork.get_output_signal(device_id, None)
+                        for device_id in [CK2, CK3, G1]])
+    assert outputs == [[1, 1, 1], [1, 1, 1], [0, 1, 0], [0, 0, 0],
+                       [0, 0, 0], [0, 1, 0], [0, 1, 0], [0, 1, 0]]
@@ -0,0 +1,137 @@
+"""Test the partitioned module."""
+import multiprocessing
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from levelize import LevelizedEngine
+from partitioned import PartitionedEngine, report_speedup
+from testing_helpers import (EXAMPLE_FILES, parse_example, run_plain,
+                             toggle_switches, get_switched_data_traces)
+
+
+def get_traces(file_name, engine_class, **options):
+    """Return the traces of an example run with the given engine."""
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        return None
+    network, monitors = parsed
+    devices = network.devices
+    engine = engine_class(devices, network, **options)
+    network.set_engine(engine)
+    results = [run_plain(network, monitors, 40)]
+    toggle_switches(devices)
+    results.append(run_plain(network, monitors, 25))
+    results.append(dict(monitors.monitors_dictionary))
+    if engine_class is PartitionedEngine:
+        engine.close()
+    return results
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if the partitioned engine gives the same traces."""
+    expected = get_traces(file_name, LevelizedEngine)
+    if expected is None:
+        pytest.skip("not a valid network")
+    assert get_traces(file_name, PartitionedEngine, partitions=2) == expected
+
+
+def make_blocks(block_count):
+    """Return a network of counters joined by a chain of gates.
+
+    Each block is a 2-bit counter clocked by a shared clock, and each
+    block's output is combined with that of the block before it.
+    """
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    [CLK, I1, I2] = names.lookup(["CLK", "I1", "I2"])
+    devices.make_device(CLK, devices.CLOCK, 1)
+    previous = None
+    for block in range(block_count):
+        [D1, D2, N1, X1, G1] = names.lookup(
+            ["{}{}".format(name, block) for name in
+             ["Da", "Db", "Na", "Xa", "Ga"]])
+        devices.make_device(D1, devices.D_TYPE)
+        devices.make_device(D2, devices.D_TYPE)
+        devices.make_device(N1, devices.NAND, 1)
+        devices.make_device(X1, devices.XOR, None)
+        devices.make_device(G1, devices.OR, 2)
+        for d_type in [D1, D2]:
+            network.make_connection(CLK, None, d_type, devices.CLK_ID)
+        network.make_connection(D1, devices.Q_ID, N1, I1)
+        network.make_connection(N1, None, D1, devices.DATA_ID)
+        network.make_connection(D1, devices.Q_ID, X1, I1)
+        network.make_connection(D2, devices.Q_ID, X1, I2)
+        network.make_connection(X1, None, D2, devices.DATA_ID)
+        network.make_connection(D2, devices.Q_ID, G1, I1)
+        network.make_connection(previous or X1, None, G1, I2)
+        previous = G1
+        monitors.make_monitor(G1, None)
+    [SW] = names.lookup(["SW"])
+    devices.make_device(SW, devices.SWITCH, 0)
+    for block in range(block_count):
+        [D1, D2] = names.lookup(["Da{}".format(block), "Db{}".format(block)])
+        for d_type in [D1, D2]:
+            network.make_connection(SW, None, d_type, devices.SET_ID)
+            network.make_connection(SW, None, d_type, devices.CLEAR_ID)
+    assert network.check_network()
+    return network, monitors
+
+
+def test_daemonic_process():
+    """Test if the engine runs in a pool worker, which has no children."""
+    expected = get_traces("circuit1.txt", LevelizedEngine)
+    with multiprocessing.Pool(1) as pool:
+        assert pool.apply(get_traces, ("circuit1.txt", PartitionedEngine),
+                          {"partitions": 2}) == expected
+
+
+def test_partitions_and_restore():
+    """Test if the blocks are split with few cuts and state is reloaded."""
+    network, monitors = make_blocks(12)
+    devices = network.devices
+    network.set_engine(LevelizedEngine(devices, network))
+    devices.cold_startup()
+    checkpoint = network.checkpoint()
+    run_plain(network, monitors, 30)
+    expected = dict(monitors.monitors_dictionary)
+
+    engine = PartitionedEngine(devices, network, partitions=3)
+    network.set_engine(engine)
+    network.restore(checkpoint)
+    monitors.reset_monitors()
+    assert run_plain(network, monitors, 12)
+    assert engine.cut_size <= 2 * 3
+    assert sorted(engine.partition_of.count(partition)
+                  for partition in range(3))[0] > 0
+    network.restore(checkpoint)  # the workers must reload the state
+    monitors.reset_monitors()
+    assert run_plain(network, monitors, 30)
+    assert dict(monitors.monitors_dictionary) == expected
+    engine.close()
+
+
+def test_report_speedup(capsys):
+    """Test if the speedup is reported and the network left unchanged."""
+    network, monitors = make_blocks(4)
+    devices = network.devices
+    devices.cold_startup()
+    checkpoint = network.checkpoint()
+    speedups = report_speedup(devices, network, 10, [1, 2])
+    assert list(speedups) == [1, 2]
+    assert "2 partitions" in capsys.readouterr().out
+    assert network.engine is None
+    assert network.checkpoint() == checkpoint
+
+
+def test_data_sampled_before_edge():
+    """Test if a D-type stores its DATA from before the clock edge."""
+    assert get_switched_data_traces(
+        lambda devices, network: PartitionedEngine(
+            devices, network, partitions=2)) == get_switched_data_traces(None)
@@ -0,0 +1,80 @@
+"""Test the periodic module."""
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from periodic import PeriodicRunner
+from timed import TimedEngine
+from testing_helpers import (EXAMPLE_FILES, parse_example, run_plain,
+                             toggle_switches, check_runner_results)
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if fast-forwarding gives the same traces as simulating."""
+    check_runner_results(file_name, PeriodicRunner, (300, 101))
+
+
+def test_clocked_network_is_skipped():
+    """Test if most cycles of a clocked network are replayed."""
+    network, monitors = parse_example("flipflop.txt", seed=1)
+    devices = network.devices
+    runner = PeriodicRunner(devices, network, monitors)
+    assert runner.get_hyper_period() == 8
+    assert runner.run(10000)
+    assert runner.skipped_cycles > 9900
+    assert devices.cycle == 10000
+    assert all(len(signal_list) == 10000 for signal_list
+               in monitors.monitors_dictionary.values())
+
+
+def test_timed_engine_events_are_kept():
+    """Test if no cycles are skipped while delayed changes are pending."""
+    expected = []
+    for use_runner in [False, True]:
+        network, monitors = parse_example("glitch.txt", seed=1)
+        devices = network.devices
+        network.set_engine(TimedEngine(devices, network))
+        runner = PeriodicRunner(devices, network, monitors)
+        assert runner.run(3)
+        toggle_switches(devices)
+        if use_runner:
+            assert runner.run(10)
+            assert runner.skipped_cycles < 10
+        else:
+            assert run_plain(network, monitors, 10)
+        expected.append(dict(monitors.monitors_dictionary))
+    [plain, fast] = expected
+    assert fast == plain
+    [N1, G1] = network.devices.names.lookup(["N1", "G1"])
+    assert plain[(N1, None)] == [0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0]
+    assert plain[(G1, None)] == [0, 0, 0, 0, 1, 1, 1, 0, 0, 0, 0, 0, 0]
+
+
+@pytest.mark.parametrize("history_size", [1, 2])
+def test_history_is_bounded(history_size):
+    """Test if a repeat further back than the kept states is not skipped."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    [SW1_ID, CLK_ID, D1_ID] = names.lookup(["Sw1", "Clk", "D1"])
+    devices.make_device(SW1_ID, devices.SWITCH, devices.LOW)
+    devices.make_clock(CLK_ID, 1, clock_phase=0)
+    devices.make_device(D1_ID, devices.D_TYPE)
+    network.make_connection(SW1_ID, None, D1_ID, devices.SET_ID)
+    network.make_connection(SW1_ID, None, D1_ID, devices.CLEAR_ID)
+    # D1 halves the clock, so its state repeats every two hyper-periods
+    network.make_connection(D1_ID, devices.QBAR_ID, D1_ID, devices.DATA_ID)
+    network.make_connection(CLK_ID, None, D1_ID, devices.CLK_ID)
+    monitors.make_monitor(D1_ID, devices.Q_ID)
+    runner = PeriodicRunner(devices, network, monitors,
+                            history_size=history_size)
+    assert runner.get_hyper_period() == 2
+    assert runner.run(100)
+    assert (runner.skipped_cycles > 90) == (history_size == 2)
+    assert monitors.monitors_dictionary[(D1_ID, devices.Q_ID)][-4:] in [
+        [0, 0, 1, 1], [0, 1, 1, 0], [1, 1, 0, 0], [1, 0, 0, 1]]
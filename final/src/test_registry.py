@@ -0,0 +1,97 @@
+"""Test the registry module."""
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from registry import DeviceKind, validate_no_property
+
+
+def make_not(devices, device_id, device_property):
+    """Make an inverter with the single input "I1"."""
+    devices.make_gate(device_id, devices.registry.query("NOT").kind_id, 1)
+
+
+def execute_not(network, device_id):
+    """Simulate an inverter."""
+    [I1] = network.names.lookup(["I1"])
+    input_signal = network.get_input_signal(device_id, I1)
+    device = network.devices.get_device(device_id)
+    target = network.devices.HIGH
+    if input_signal in [network.devices.HIGH, network.devices.RISING]:
+        target = network.devices.LOW
+    device.outputs[None] = network.update_signal(device.outputs[None], target)
+    return device.outputs[None] is not None
+
+
+@pytest.fixture
+def network_with_not():
+    """Return a Network class instance with a registered NOT kind."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    new_network = Network(new_names, new_devices)
+    new_devices.register_kind(DeviceKind(
+        "NOT", make_not, validate_no_property, execute_not,
+        input_names=lambda device_property: ["I1"]))
+
+    [SW1, NOT1, I1] = new_names.lookup(["Sw1", "Not1", "I1"])
+    NOT = new_devices.registry.query("NOT").kind_id
+    new_devices.make_device(SW1, new_devices.SWITCH, 0)
+    assert new_devices.make_device(NOT1, NOT) == new_devices.NO_ERROR
+    new_network.make_connection(SW1, None, NOT1, I1)
+    return new_network
+
+
+def test_builtin_kinds():
+    """Test if the built-in kinds keep their name IDs."""
+    new_names = Names()
+    new_devices = Devices(new_names)
+    registry = new_devices.registry
+    for kind_id in [new_devices.AND, new_devices.CLOCK, new_devices.D_TYPE,
+                    new_devices.LUT, new_devices.SIGGEN]:
+        kind = registry.get_kind(kind_id)
+        assert kind.kind_id == kind_id
+        assert registry.query(kind.name) is kind
+    assert registry.query("NOT") is None
+    assert registry.get_kind(new_devices.Q_ID) is None
+    assert registry.get_kind(new_devices.D_TYPE).output_names == ["Q", "QBAR"]
+
+
+def test_make_device_validation(network_with_not):
+    """Test if make_device uses the validation of a registered kind."""
+    devices = network_with_not.devices
+    [NOT2] = devices.names.lookup(["Not2"])
+    NOT = devices.registry.query("NOT").kind_id
+    assert devices.make_device(NOT2, NOT, 3) == devices.QUALIFIER_PRESENT
+
+
+def test_execute_registered_kind(network_with_not):
+    """Test if execute_network simulates a registered kind."""
+    network = network_with_not
+    devices = network.devices
+    [SW1, NOT1] = devices.names.lookup(["Sw1", "Not1"])
+
+    assert network.execute_network()
+    assert network.get_output_signal(NOT1, None) == devices.HIGH
+    devices.set_switch(SW1, devices.HIGH)
+    assert network.execute_network()
+    assert network.get_output_signal(NOT1, None) == devices.LOW
+
+
+def test_execute_batch(network_with_not):
+    """Test if execute_network prefers the batched kernel of a kind."""
+    network = network_with_not
+    devices = network.devices
+    kind = devices.registry.query("NOT")
+    batches = []
+
+    def execute_batch(network, device_ids):
+        batches.append(list(device_ids))
+        return all(execute_not(network, device_id)
+                   for device_id in device_ids)
+
+    kind.execute_batch = execute_batch
+    [NOT1] = devices.names.lookup(["Not1"])
+    assert network.execute_network()
+    assert batches and batches[0] == [NOT1]
+    assert network.get_output_signal(NOT1, None) == devices.HIGH
@@ -1,4 +1,5 @@
 import pytest
+import io
 import os
 from names import Names
 from scanner import Scanner
@@ -99,3 +100,12 @@ def test_get_many_symbols(scanner):
 def test_get_all_symbols(scanner):
     print("\n")
     symbols = scanner.get_all_symbols()
+
+
+def test_get_hex_number(scanner):
+    scanner.file = io.StringIO("LUT[3, 0xE8];")
+    scanner.get_next_character()
+    symbols = [scanner.get_symbol() for _ in range(6)]
+    assert [scanner.decode(symbol) for symbol in symbols] == [
+        "LUT", "[", "3", ",", "0xE8", "]"]
+    assert symbols[4].type == scanner.NUMBER
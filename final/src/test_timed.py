@@ -0,0 +1,159 @@
+"""Test the timed module."""
+import contextlib
+import io
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from scanner import Scanner
+from parse import Parser
+from levelize import LevelizedEngine
+from timed import TimedEngine
+from test_parse import parse_example as parse_delays_example
+from testing_helpers import EXAMPLE_FILES, parse_example, get_traces, \
+    get_switched_data_traces
+
+
+@pytest.fixture
+def new_network():
+    """Return a new Network instance that uses the timed engine."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    network.set_engine(TimedEngine(devices, network))
+    return network
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_zero_delays(file_name):
+    """Test if the engine gives the levelized traces with no delays."""
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        pytest.skip("not a valid network")
+    network, monitors = parsed
+    network.set_engine(LevelizedEngine(network.devices, network))
+    expected = get_traces(network, monitors)
+
+    network, monitors = parse_example(file_name, seed=file_name)
+    devices = network.devices
+    delays = {kind.kind_id: 0 for kind in devices.registry.kinds}
+    for device in devices.devices_list:
+        device.delay = None  # the delays set in the file
+    network.set_engine(TimedEngine(devices, network, delays=delays))
+    assert get_traces(network, monitors) == expected
+
+
+def test_data_sampled_before_edge():
+    """Test if a D-type stores the DATA from before its sources change."""
+    def make_engine(devices, network):
+        delays = {kind.kind_id: 0 for kind in devices.registry.kinds}
+        return TimedEngine(devices, network, delays=delays)
+    expected = get_switched_data_traces(None)
+    assert get_switched_data_traces(make_engine) == expected
+
+
+def test_glitch():
+    """Test if unequal paths make a glitch as long as their difference."""
+    names, devices, network = parse_delays_example("glitch.txt")
+    network.set_engine(TimedEngine(devices, network))
+    [SW1, N1, G1, G2] = names.lookup(["SW1", "N1", "G1", "G2"])
+    assert devices.get_device(N1).delay == 3
+    assert devices.get_device(G1).delay is None
+    assert devices.get_device(G2).delay == 0
+
+    outputs = []
+    for cycle in range(10):
+        if cycle == 4:
+            devices.set_switch(SW1, devices.HIGH)
+        assert network.execute_network()
+        outputs.append([network.get_output_signal(device_id, None)
+                        for device_id in [N1, G1, G2]])
+    assert outputs == [[0, 0, 0], [0, 0, 0], [0, 0, 0], [1, 0, 0],
+                       [1, 0, 1], [1, 1, 1], [1, 1, 1], [0, 1, 0],
+                       [0, 0, 0], [0, 0, 0]]
+
+
+def test_kind_delays(new_network):
+    """Test if a change moves down a chain by the delay of each gate."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW1_ID, I1] = names.lookup(["Sw1", "I1"])
+    chain_ids = names.lookup(["Nand" + str(number) for number in range(4)])
+    devices.make_device(SW1_ID, devices.SWITCH, devices.LOW)
+    previous_id = SW1_ID
+    for device_id in chain_ids:
+        devices.make_device(device_id, devices.NAND, 1)
+        network.make_connection(previous_id, None, device_id, I1)
+        previous_id = device_id
+    network.set_engine(TimedEngine(devices, network,
+                                   delays={devices.NAND: 2}))
+
+    for _ in range(10):
+        assert network.execute_network()
+    assert [network.get_output_signal(device_id, None)
+            for device_id in chain_ids] == [1, 0, 1, 0]
+    assert len(network.engine.wheel) == 3
+
+    devices.set_switch(SW1_ID, devices.HIGH)
+    outputs = []
+    for _ in range(9):
+        assert network.execute_network()
+        outputs.append(network.get_output_signal(chain_ids[-1], None))
+    assert outputs == [0] * 8 + [1]
+
+
+@pytest.mark.parametrize("delay", ["A", "", "0x2"])
+def test_parse_bad_delay(tmp_path, delay):
+    """Test if a delay that is not a number is rejected."""
+    path = tmp_path / "bad_delay.txt"
+    path.write_text("DEVICES: SW1 = SWITCH[0]; G1 = NAND[1] : " + delay
+                    + "; CONNECTIONS: SW1 > G1.I1; MONITORS: G1;")
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    scanner = Scanner(
+        path=str(path),
+        names_map=names,
+        devices_map=Names(devices.registry.get_names()),
+        keywords_map=Names(["DEVICES", "CONNECTIONS", "MONITORS", "DATA",
+                            "CLK", "SET", "CLEAR", "Q", "QBAR", "I"]),
+        punct_map=Names([",", ".", ":", ";", ">", "[", "]", "="])
+    )
+    parser = Parser(names, devices, network, monitors, scanner)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert not parser.parse_network()
+
+
+def test_checkpoint_keeps_pending_changes(new_network):
+    """Test if a restored checkpoint keeps the changes still on the wheel."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [CLK_ID, G1_ID, I1] = names.lookup(["Clk", "G1", "I1"])
+    devices.make_clock(CLK_ID, 1, clock_phase=0)
+    devices.make_device(G1_ID, devices.NAND, 1)
+    network.make_connection(CLK_ID, None, G1_ID, I1)
+    devices.get_device(G1_ID).delay = 3
+
+    def run(cycles):
+        outputs = []
+        for _ in range(cycles):
+            assert network.execute_network()
+            outputs.append(network.get_output_signal(G1_ID, None))
+        return outputs
+
+    run(5)
+    assert network.engine.get_pending_events()
+    blob = network.checkpoint()
+    expected = run(8)
+    assert expected[-4:] in [[0, 1, 0, 1], [1, 0, 1, 0]]
+
+    assert network.restore(blob)
+    assert run(8) == expected
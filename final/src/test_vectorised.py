@@ -0,0 +1,82 @@
+"""Test the vectorised module."""
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from vectorised import VectorisedEngine
+from testing_helpers import (EXAMPLE_FILES, check_engine_traces,
+                             get_switched_data_traces)
+
+
+@pytest.fixture
+def new_network():
+    """Return a new Network instance that uses the vectorised engine."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    network.set_engine(VectorisedEngine(devices, network))
+    return network
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_same_traces(file_name):
+    """Test if the vectorised engine gives the same traces as the sweep."""
+    check_engine_traces(file_name, VectorisedEngine)
+
+
+def test_large_network(new_network):
+    """Test if wide groups of gates, look-up tables and loops are evaluated."""
+    network = new_network
+    devices = network.devices
+    names = devices.names
+
+    [SW1_ID, SW2_ID, I1, I2] = names.lookup(["Sw1", "Sw2", "I1", "I2"])
+    devices.make_device(SW1_ID, devices.SWITCH, devices.HIGH)
+    devices.make_device(SW2_ID, devices.SWITCH, devices.LOW)
+    kinds = [devices.AND, devices.OR, devices.NAND, devices.NOR, devices.XOR]
+    gate_ids = {}
+    for kind in kinds:
+        gate_ids[kind] = names.lookup([names.get_name_string(kind) + str(n)
+                                       for n in range(200)])
+        for device_id in gate_ids[kind]:
+            devices.make_device(device_id, kind,
+                                None if kind == devices.XOR else 2)
+            network.make_connection(SW1_ID, None, device_id, I1)
+            network.make_connection(SW2_ID, None, device_id, I2)
+
+    # Look-up table computing Sw1 AND NOT Sw2
+    [LUT_ID] = names.lookup(["Lut"])
+    devices.make_device(LUT_ID, devices.LUT, (2, 0b0010))
+    network.make_connection(SW1_ID, None, LUT_ID, I1)
+    network.make_connection(SW2_ID, None, LUT_ID, I2)
+
+    assert network.execute_network()
+    expected = {devices.AND: devices.LOW, devices.OR: devices.HIGH,
+                devices.NAND: devices.HIGH, devices.NOR: devices.LOW,
+                devices.XOR: devices.HIGH}
+    for kind in kinds:
+        assert {network.get_output_signal(device_id, None)
+                for device_id in gate_ids[kind]} == {expected[kind]}
+    assert network.get_output_signal(LUT_ID, None) == devices.HIGH
+
+    devices.set_switch(SW2_ID, devices.HIGH)
+    assert network.execute_network()
+    assert network.get_output_signal(gate_ids[devices.AND][0],
+                                      None) == devices.HIGH
+    assert network.get_output_signal(gate_ids[devices.XOR][-1],
+                                      None) == devices.LOW
+    assert network.get_output_signal(LUT_ID, None) == devices.LOW
+
+    # A NAND gate driving its own input oscillates
+    [OSC_ID] = names.lookup(["Osc"])
+    devices.make_device(OSC_ID, devices.NAND, 1)
+    network.make_connection(OSC_ID, None, OSC_ID, I1)
+    assert not network.execute_network()
+
+
+def test_data_sampled_before_edge():
+    """Test if a D-type stores its DATA from before the clock edge."""
+    expected = get_switched_data_traces(None)
+    assert get_switched_data_traces(VectorisedEngine) == expected
@@ -0,0 +1,138 @@
+"""Test the xprop module."""
+import itertools
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from bitparallel import BitParallelSimulator
+from xprop import XPropagationSimulator
+from testing_helpers import EXAMPLE_FILES, parse_example
+
+
+@pytest.fixture
+def new_monitors():
+    """Return a new Monitors instance with an empty network."""
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    return Monitors(names, devices, network)
+
+
+@pytest.mark.parametrize("file_name", EXAMPLE_FILES)
+def test_known_state(file_name):
+    """Test if a known state gives the same traces as bit-parallel."""
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        pytest.skip("not a valid network")
+    network, monitors = parsed
+    devices = network.devices
+    switch_ids = devices.find_devices(devices.SWITCH)
+    patterns = [list(pattern) for pattern in itertools.islice(
+        itertools.product([0, 1], repeat=len(switch_ids)), 16)]
+    expected = BitParallelSimulator(devices, monitors).run_patterns(
+        patterns, cycles=12)
+    assert XPropagationSimulator(devices, monitors).run_patterns(
+        patterns, cycles=12, unknown=False) == expected
+
+
+def test_gate_rules(new_monitors):
+    """Test if a gate output is unknown unless its known inputs decide it."""
+    monitors = new_monitors
+    devices = monitors.devices
+    network = monitors.network
+    names = devices.names
+    [A, B, I1, I2] = names.lookup(["A", "B", "I1", "I2"])
+    devices.make_device(A, devices.SWITCH, 0)
+    devices.make_device(B, devices.SWITCH, 0)
+    gate_ids = names.lookup(["And", "Nand", "Or", "Nor", "Xor", "Lut"])
+    for gate_id, (kind_id, device_property) in zip(gate_ids, [
+            (devices.AND, 2), (devices.NAND, 2), (devices.OR, 2),
+            (devices.NOR, 2), (devices.XOR, None),
+            (devices.LUT, (2, 0b1001))]):
+        devices.make_device(gate_id, kind_id, device_property)
+        network.make_connection(A, None, gate_id, I1)
+        network.make_connection(B, None, gate_id, I2)
+        monitors.make_monitor(gate_id, None)
+
+    signals = [devices.LOW, devices.HIGH, devices.UNKNOWN]
+    patterns = [list(pattern)
+                for pattern in itertools.product(signals, repeat=2)]
+    simulator = XPropagationSimulator(devices, monitors)
+    results = simulator.run_patterns(patterns)
+    for pattern, result in zip(patterns, results):
+        choices = [[signal] if signal != devices.UNKNOWN
+                   else [devices.LOW, devices.HIGH] for signal in pattern]
+        for gate_id in gate_ids:
+            device = devices.get_device(gate_id)
+            kind = devices.registry.get_kind(device.device_kind)
+            outputs = {kind.evaluate(devices, device, list(inputs))[0]
+                       for inputs in itertools.product(*choices)}
+            expected = outputs.pop() if len(outputs) == 1 else (
+                devices.UNKNOWN)
+            assert result[(gate_id, None)] == [expected]
+
+
+def make_flip_flop(monitors, toggle):
+    """Make a D-type clocked every two cycles, and return its ID.
+
+    DATA is QBAR if toggle is True, and a LOW switch otherwise. CLEAR is the
+    switch "Clear".
+    """
+    devices = monitors.devices
+    network = monitors.network
+    names = devices.names
+    [CLK, D, CLEAR, SET, DTYPE] = names.lookup(
+        ["Clk", "D", "Clear", "Set", "Dtype"])
+    devices.make_device(CLK, devices.CLOCK, (1, 1, 1))
+    devices.make_device(D, devices.SWITCH, devices.LOW)
+    devices.make_device(CLEAR, devices.SWITCH, devices.LOW)
+    devices.make_device(SET, devices.SWITCH, devices.LOW)
+    devices.make_device(DTYPE, devices.D_TYPE)
+    network.make_connection(CLK, None, DTYPE, devices.CLK_ID)
+    network.make_connection(CLEAR, None, DTYPE, devices.CLEAR_ID)
+    network.make_connection(SET, None, DTYPE, devices.SET_ID)
+    if toggle:
+        network.make_connection(DTYPE, devices.QBAR_ID, DTYPE,
+                                devices.DATA_ID)
+    else:
+        network.make_connection(D, None, DTYPE, devices.DATA_ID)
+    monitors.make_monitor(DTYPE, devices.Q_ID)
+    devices.cold_startup()
+    return DTYPE
+
+
+def test_reset_by_clock(new_monitors):
+    """Test if a D-type is known after the first edge stores known DATA."""
+    monitors = new_monitors
+    devices = monitors.devices
+    dtype_id = make_flip_flop(monitors, toggle=False)
+
+    simulator = XPropagationSimulator(devices, monitors)
+    traces = simulator.run(4)
+    X = devices.UNKNOWN
+    assert traces == {(dtype_id, devices.Q_ID): [X, 0, 0, 0]}
+    assert simulator.get_known_cycles(traces) == {
+        (dtype_id, devices.Q_ID): 1}
+
+
+def test_reset_by_clear(new_monitors):
+    """Test if a toggling D-type is only known when it is cleared."""
+    monitors = new_monitors
+    devices = monitors.devices
+    dtype_id = make_flip_flop(monitors, toggle=True)
+    monitor = (dtype_id, devices.Q_ID)
+
+    simulator = XPropagationSimulator(devices, monitors)
+    traces = simulator.run(4)
+    assert traces == {monitor: [devices.UNKNOWN] * 4}
+    assert simulator.get_known_cycles(traces) == {monitor: None}
+
+    [CLEAR] = devices.names.lookup(["Clear"])
+    X = devices.UNKNOWN
+    patterns = [[devices.HIGH], [devices.LOW], [X]]
+    results = simulator.run_patterns(patterns, cycles=4, switch_ids=[CLEAR])
+    assert [result[monitor] for result in results] == [
+        [0, 0, 0, 0], [X, X, X, X], [X, X, X, X]]
@@ -0,0 +1,252 @@
+"""Share helpers between the tests of the simulation engines.
+
+Used by the test modules to parse the example definition files, run them
+with a given engine or runner, and compare the traces with those of the
+default sweep.
+
+Functions
+---------
+parse_example(file_name, seed) - returns the network and monitors parsed from
+                                 an example file.
+get_traces(network, monitors, cycles=40) - runs the network, toggling the
+                                           switches, and returns the traces.
+check_engine_traces(file_name, make_engine) - checks that an engine gives the
+                                              same traces as the sweep.
+run_plain(network, monitors, cycles) - runs the network cycle by cycle.
+toggle_switches(devices) - inverts the state of every switch.
+check_runner_results(file_name, make_runner, cycles) - checks that a runner
+                                                       records the same
+                                                       signals as run_plain.
+insert_gate(network, monitors) - puts a new monitored gate in the network.
+remove_gate(network, monitors, gate_id, connection) - removes a gate put in
+                                                      by insert_gate.
+get_edited_traces(file_name, make_engine, rebuild) - returns the traces of an
+                                                     example as a gate is
+                                                     put in and taken out.
+get_switched_data_traces(make_engine, cycles=16) - returns the traces of
+                                                   D-types whose DATA follows
+                                                   a switch.
+"""
+import contextlib
+import io
+import os
+import random
+
+import pytest
+
+from names import Names
+from devices import Devices
+from network import Network
+from monitors import Monitors
+from scanner import Scanner
+from parse import Parser
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                        "doc", "net_definition")
+EXAMPLE_FILES = sorted(os.listdir(EXAMPLES))
+
+
+def parse_example(file_name, seed):
+    """Return the network and monitors parsed from an example file.
+
+    Return None if the file does not define a valid network.
+    """
+    random.seed(seed)  # the same random cold start-up for every engine
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    monitors = Monitors(names, devices, network)
+    scanner = Scanner(
+        path=os.path.join(EXAMPLES, file_name),
+        names_map=names,
+        devices_map=Names(devices.registry.get_names()),
+        keywords_map=Names(["DEVICES", "CONNECTIONS", "MONITORS", "DATA",
+                            "CLK", "SET", "CLEAR", "Q", "QBAR", "I"]),
+        punct_map=Names([",", ".", ":", ";", ">", "[", "]", "="])
+    )
+    parser = Parser(names, devices, network, monitors, scanner)
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            if not parser.parse_network():
+                return None
+        except SystemExit:  # too many errors to continue
+            return None
+    return network, monitors
+
+
+def get_traces(network, monitors, cycles=40):
+    """Run the network, toggling the switches, and return the traces."""
+    devices = network.devices
+    switch_ids = devices.find_devices(devices.SWITCH)
+    traces = []
+    for cycle in range(cycles):
+        if cycle in [10, 25]:
+            for switch_id in switch_ids:
+                device = devices.get_device(switch_id)
+                devices.set_switch(switch_id, 1 - device.switch_state)
+        steady = network.execute_network()
+        traces.append((steady, [network.get_output_signal(device_id,
+                                                          output_id)
+                                for (device_id, output_id)
+                                in monitors.monitors_dictionary]))
+    return traces
+
+
+def check_engine_traces(file_name, make_engine):
+    """Check that an engine gives the same traces as the sweep.
+
+    make_engine(devices, network) returns the engine to use. The test is
+    skipped if the file does not define a valid network.
+    """
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        pytest.skip("not a valid network")
+    expected = get_traces(*parsed)
+
+    network, monitors = parse_example(file_name, seed=file_name)
+    network.set_engine(make_engine(network.devices, network))
+    assert get_traces(network, monitors) == expected
+
+
+def run_plain(network, monitors, cycles):
+    """Run the network cycle by cycle. Return True if successful."""
+    for _ in range(cycles):
+        if not network.execute_network():
+            return False
+        monitors.record_signals()
+    return True
+
+
+def toggle_switches(devices):
+    """Invert the state of every switch."""
+    for switch_id in devices.find_devices(devices.SWITCH):
+        device = devices.get_device(switch_id)
+        devices.set_switch(switch_id, 1 - device.switch_state)
+
+
+def check_runner_results(file_name, make_runner, cycles):
+    """Check that a runner records the same signals as run_plain.
+
+    make_runner(devices, network, monitors) returns the runner to use. The
+    network is run for cycles[0] cycles, then for cycles[1] cycles after
+    toggling the switches. Return the network run by the runner. The test
+    is skipped if the file does not define a valid network.
+    """
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        pytest.skip("not a valid network")
+    network, monitors = parsed
+    expected = [run_plain(network, monitors, cycles[0])]
+    toggle_switches(network.devices)
+    expected.append(run_plain(network, monitors, cycles[1]))
+    expected.append(monitors.monitors_dictionary)
+
+    network, monitors = parse_example(file_name, seed=file_name)
+    runner = make_runner(network.devices, network, monitors)
+    result = [runner.run(cycles[0])]
+    toggle_switches(network.devices)
+    result.append(runner.run(cycles[1]))
+    result.append(monitors.monitors_dictionary)
+    assert result == expected
+    return network
+
+
+def insert_gate(network, monitors):
+    """Put a new monitored NAND gate in front of the first gate input.
+
+    The gate is driven by the output it replaces and the first switch, if
+    any. Return the gate and input IDs, or None if there is no gate.
+    """
+    devices = network.devices
+    for device in list(devices.devices_list):
+        if device.device_kind not in devices.gate_types:
+            continue
+        [(input_id, driver)] = list(device.inputs.items())[:1]
+        [gate_id] = devices.names.lookup(["Eco1"])
+        devices.make_device(gate_id, devices.NAND, 2)
+        second_driver = driver
+        for switch_id in devices.find_devices(devices.SWITCH)[:1]:
+            second_driver = (switch_id, None)
+        [I1, I2] = devices.get_gate_input_ids(2)
+        network.make_connection(*driver, gate_id, I1)
+        network.make_connection(*second_driver, gate_id, I2)
+        assert network.remove_connection(device.device_id, input_id)
+        network.make_connection(gate_id, None, device.device_id, input_id)
+        monitors.make_monitor(gate_id, None)
+        return gate_id, (device.device_id, input_id)
+    return None
+
+
+def remove_gate(network, monitors, gate_id, connection):
+    """Remove a gate put in by insert_gate, and restore the connection."""
+    devices = network.devices
+    driver = devices.get_device(gate_id).inputs[
+        devices.get_gate_input_ids(1)[0]]
+    monitors.remove_monitor(gate_id, None)
+    assert network.remove_device(gate_id)
+    network.make_connection(*driver, *connection)
+
+
+def get_edited_traces(file_name, make_engine, rebuild):
+    """Return the traces of an example as a gate is put in and taken out.
+
+    make_engine(devices, network) returns the engine to use, or None for
+    the sweep. If rebuild is True, the plans are rebuilt after each edit
+    rather than updated. Return None if the example has no gate.
+    """
+    parsed = parse_example(file_name, seed=file_name)
+    if parsed is None:
+        return None
+    network, monitors = parsed
+    network.set_engine(make_engine(network.devices, network))
+    traces = get_traces(network, monitors, cycles=12)
+    inserted = insert_gate(network, monitors)
+    if inserted is None:
+        return None
+    if rebuild:
+        network.devices.topology_edits.clear()
+    traces += get_traces(network, monitors, cycles=12)
+    remove_gate(network, monitors, *inserted)
+    if rebuild:
+        network.devices.topology_edits.clear()
+    traces += get_traces(network, monitors, cycles=12)
+    return [signals for steady, signals in traces]
+
+
+def get_switched_data_traces(make_engine, cycles=16):
+    """Return the traces of D-types whose DATA follows a switch.
+
+    The switch is toggled between cycles. The DATA input of one D-type is
+    driven by the switch itself, and that of the other through an inverter.
+    make_engine(devices, network) returns the engine to use, or None for
+    the sweep.
+    """
+    random.seed(1)
+    names = Names()
+    devices = Devices(names)
+    network = Network(names, devices)
+    if make_engine is not None:
+        network.set_engine(make_engine(devices, network))
+    [SW1_ID, SW2_ID, CLK_ID, INV_ID, D1_ID, D2_ID] = names.lookup(
+        ["Sw1", "Sw2", "Clk", "Inv", "D1", "D2"])
+    [I1] = devices.get_gate_input_ids(1)
+    devices.make_device(SW1_ID, devices.SWITCH, devices.LOW)
+    devices.make_device(SW2_ID, devices.SWITCH, devices.LOW)
+    devices.make_clock(CLK_ID, 1, clock_phase=0)
+    devices.make_device(INV_ID, devices.NAND, 1)
+    network.make_connection(SW1_ID, None, INV_ID, I1)
+    for d_type_id, data_id in [(D1_ID, SW1_ID), (D2_ID, INV_ID)]:
+        devices.make_device(d_type_id, devices.D_TYPE)
+        network.make_connection(data_id, None, d_type_id, devices.DATA_ID)
+        network.make_connection(CLK_ID, None, d_type_id, devices.CLK_ID)
+        network.make_connection(SW2_ID, None, d_type_id, devices.SET_ID)
+        network.make_connection(SW2_ID, None, d_type_id, devices.CLEAR_ID)
+
+    traces = []
+    for cycle in range(cycles):
+        devices.set_switch(SW1_ID, cycle % 2)
+        steady = network.execute_network()
+        traces.append((steady, [network.get_output_signal(device_id,
+                                                          devices.Q_ID)
+                                for device_id in [D1_ID, D2_ID]]))
+    return traces
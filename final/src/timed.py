@@ -0,0 +1,370 @@
+"""Execute the network with a propagation delay for every device.
+
+Used in the Logic Simulator project to see the glitches and races that the
+zero-delay engines hide. A change at the inputs of a device reaches its
+outputs a whole number of simulation cycles later.
+
+Classes
+-------
+TimedEngine - executes the devices with integer propagation delays, using a
+              timing wheel.
+"""
+from graph import strongly_connected_components, get_device_graph
+from levelize import LevelizedEngine
+
+
+class TimedEngine:
+    """Execute the devices with integer propagation delays.
+
+    One simulation cycle is one unit of time. When the inputs of a device
+    change, its outputs are evaluated at once, and the new outputs take
+    effect after the delay of the device. The delay of a device is its
+    Device.delay, set in the definition file as in "G1 = AND[2] : 3 ;", or
+    else the delay of its kind given by delays, or else 0 for kinds without
+    inputs and 1 for the others. Every change is kept, however short, so a
+    pulse narrower than the delay of a gate still passes through it, and
+    the waveforms show the glitches of unequal paths.
+
+    The pending output changes are stored on a timing wheel, which is a list
+    of buckets with one bucket per cycle, indexed by the cycle modulo the
+    number of buckets. There is one bucket more than the longest delay, so
+    every change in a bucket is due when the bucket is reached, and
+    scheduling a change costs the same whatever the number pending.
+
+    Devices with a delay of 0 settle within the cycle. They are evaluated in
+    signal-flow order, by the level of their strongly connected component,
+    and feedback loops are iterated until their signals settle. With all
+    the delays 0, the traces are the same as with the levelized engine. The
+    DATA input of a D-type is sampled at the start of the cycle, before the
+    changes due in the cycle are applied and the sources updated, and the
+    D-type stores it when its CLK input has risen since it was last
+    evaluated. The pending changes are dropped if the topology of the
+    network changes or the simulation is restarted, and are kept in a
+    checkpoint of the network.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    iteration_limit: number of passes through the zero-delay feedback loops
+                     to wait for their signals to settle before declaring
+                     the network unstable.
+    delays: optional dictionary {kind_id: delay} of the delays of the device
+            kinds, in cycles.
+
+    Public methods
+    --------------
+    build_plan(self): Sorts the devices into levels and sizes the timing
+                      wheel.
+
+    get_delay(self, kind, device): Returns the propagation delay of a device.
+
+    execute_network(self): Executes the devices whose inputs have changed
+                           for one simulation cycle.
+
+    get_pending_events(self): Returns the output changes and evaluations
+                              still to come.
+
+    set_pending_events(self, events): Replaces the pending work with events
+                                      from get_pending_events.
+    """
+
+    def __init__(self, devices, network, iteration_limit=20, delays=None):
+        """Initialise the engine. The plan is built on the first cycle."""
+        self.devices = devices
+        self.network = network
+        self.iteration_limit = iteration_limit
+        self.delays = dict(delays or {})
+
+        self.topology_version = None  # version the plan was built for
+        self.kind_devices = []  # (kind, device IDs) in registry order
+        self.sources = []  # (kind, device, delay) of the kinds without inputs
+        self.d_types = []  # (device, DATA driver, DATA port)
+        # Stores {device_id: (kind, device, inputs, delay)} of the devices
+        # with inputs, where inputs are (driver Device, output ID) pairs
+        self.members = {}
+        self.level = {}  # stores {device_id: signal-flow level}
+        self.rank = {}  # stores {device_id: position in registry order}
+        self.level_count = 0
+        self.fanout = {}  # stores {device_id: IDs of the devices it drives}
+
+        self.wheel = [[]]  # buckets of (device, outputs) changes
+        self.projected = {}  # stores {device_id: outputs once changes apply}
+        self.pending = set()  # devices still to evaluate in the next cycle
+        self.last_clock = {}  # stores {device_id: CLK at last evaluation}
+        self.data_samples = {}  # stores {device_id: DATA at cycle start}
+        self.next_cycle = None  # cycle expected to be executed next
+        self.events = 0  # number of output changes applied so far
+
+    def build_plan(self):
+        """Sort the devices into levels and size the timing wheel."""
+        devices = self.devices
+        self.kind_devices = []
+        kinds = {}
+        rank = {}
+        for kind in devices.registry.kinds:
+            device_ids = devices.find_devices(kind.kind_id)
+            if device_ids:
+                self.kind_devices.append((kind, device_ids))
+            for device_id in device_ids:
+                kinds[device_id] = kind
+                rank[device_id] = len(rank)
+
+        successors = get_device_graph(devices, cut_inputs=[devices.DATA_ID])
+        self.rank = rank
+        self.sources = []
+        self.d_types = []
+        self.members = {}
+        self.level = {}
+        longest_delay = 0
+        for component in strongly_connected_components(list(rank),
+                                                       successors):
+            component.sort(key=rank.get)
+            # A component comes after all the components that drive it
+            level = 0
+            for device_id in component:
+                for connected_output in devices.get_device(
+                        device_id).inputs.values():
+                    if (connected_output is not None
+                            and connected_output[0] in self.level):
+                        level = max(level,
+                                    self.level[connected_output[0]] + 1)
+            for device_id in component:
+                self.level[device_id] = level
+                device = devices.get_device(device_id)
+                kind = kinds[device_id]
+                delay = self.get_delay(kind, device)
+                longest_delay = max(longest_delay, delay)
+                if not device.inputs:
+                    self.sources.append((kind, device, delay))
+                    continue
+                inputs = []
+                for connected_output in device.inputs.values():
+                    if connected_output is None:
+                        inputs.append(None)
+                    else:
+                        inputs.append((devices.get_device(connected_output[0]),
+                                       connected_output[1]))
+                self.members[device_id] = (kind, device, inputs, delay)
+                if kind.kind_id == devices.D_TYPE:
+                    self.d_types.append((device,) + tuple(
+                        device.inputs[devices.DATA_ID] or (None, None)))
+        self.level_count = max(self.level.values(), default=-1) + 1
+        self.fanout = {device_id: [target for target in targets
+                                   if target in self.members]
+                       for device_id, targets in successors.items()}
+
+        self.wheel = [[] for _ in range(longest_delay + 1)]
+        self.topology_version = devices.topology_version
+        self.next_cycle = None
+
+    def get_delay(self, kind, device):
+        """Return the propagation delay of a device, in cycles."""
+        if device.delay is not None:
+            return device.delay
+        return self.delays.get(kind.kind_id, 1 if device.inputs else 0)
+
+    def get_pending_events(self):
+        """Return the output changes and evaluations still to come.
+
+        The result is a tuple of (cycles until due, device_id, outputs) of
+        the changes on the timing wheel, followed by the IDs of the devices
+        to evaluate in the next cycle, so it is the same in any two cycles
+        with the same work ahead. It is empty if nothing is pending.
+        """
+        if self.next_cycle != self.devices.cycle:
+            return ()  # dropped when the engine resets
+        events = []
+        for offset in range(len(self.wheel)):
+            bucket = self.wheel[(self.next_cycle + offset) % len(self.wheel)]
+            events.extend(sorted((offset, device.device_id, outputs)
+                                 for device, outputs in bucket))
+        return tuple(events) + tuple(sorted(self.pending))
+
+    def set_pending_events(self, events):
+        """Replace the pending work with events from get_pending_events.
+
+        The events are taken to be due from the current cycle, as when the
+        state of the network is restored from a checkpoint. Return True if
+        successful, or False if they do not fit the plan, in which case the
+        engine resets as usual.
+        """
+        devices = self.devices
+        if self.topology_version != devices.topology_version:
+            self.build_plan()
+        self.reset()
+        self.pending = set()
+        for event in events:
+            if not isinstance(event, tuple):  # a device to evaluate
+                if event not in self.members:
+                    self.reset()
+                    return False
+                self.pending.add(event)
+                continue
+            (offset, device_id, outputs) = event
+            device = devices.get_device(device_id)
+            if (not 0 <= offset < len(self.wheel) or device is None
+                    or len(outputs) != len(device.outputs)):
+                self.reset()
+                return False
+            self.projected[device_id] = outputs  # the last change counts
+            self.wheel[(devices.cycle + offset) % len(self.wheel)].append(
+                (device, outputs))
+        self.next_cycle = devices.cycle
+        return True
+
+    def reset(self):
+        """Drop the pending changes and evaluate every device again."""
+        devices = self.devices
+        self.wheel = [[] for _ in self.wheel]
+        self.projected = {device.device_id: tuple(device.outputs.values())
+                          for device in devices.devices_list}
+        self.pending = set(self.members)
+        # Clock edges are counted from the current CLK signals
+        self.last_clock = {}
+        for (device, data_driver, data_port) in self.d_types:
+            self.last_clock[device.device_id] = self.get_input(
+                device, devices.CLK_ID)
+
+    def execute_network(self):
+        """Execute the devices whose inputs have changed for one cycle.
+
+        Return True if successful and the network does not oscillate.
+        """
+        devices = self.devices
+        network = self.network
+        if self.topology_version != devices.topology_version:
+            self.build_plan()
+        if self.next_cycle != devices.cycle:
+            self.reset()
+        cycle = devices.cycle
+
+        # D-types sample DATA before the changes due in this cycle apply
+        if not self.sample_data():
+            return False
+
+        # Apply the output changes due in this cycle
+        changed = self.pending
+        self.pending = set()
+        slot = cycle % len(self.wheel)
+        bucket = self.wheel[slot]
+        self.wheel[slot] = []
+        for device, outputs in bucket:
+            self.events += 1
+            if tuple(device.outputs.values()) != outputs:
+                device.outputs.update(zip(device.outputs, outputs))
+                changed.update(self.fanout[device.device_id])
+
+        previous = [tuple(device.outputs.values())
+                    for (kind, device, delay) in self.sources]
+        for kind, device_ids in self.kind_devices:
+            if kind.start_cycle is not None:
+                kind.start_cycle(network, device_ids)
+        for (kind, device, delay), outputs in zip(self.sources, previous):
+            if not self.settle(kind, device):
+                return False
+            new_outputs = tuple(device.outputs.values())
+            device.outputs.update(zip(device.outputs, outputs))
+            if self.drive(device, new_outputs, delay, cycle):
+                changed.update(self.fanout[device.device_id])
+
+        network.steady_state = True
+        network.iterations = 1
+        if not self.settle_levels(changed, cycle):
+            return False
+
+        devices.cycle += 1
+        self.next_cycle = devices.cycle
+        return network.steady_state
+
+    def settle_levels(self, changed, cycle):
+        """Evaluate the changed devices in level order until they settle.
+
+        Devices with a delay of 0 are evaluated again, in the same pass, as
+        soon as a device at a lower level changes their inputs, and in the
+        next pass if the change comes from their own level or above. After
+        iteration_limit passes, network.steady_state is cleared,
+        network.oscillating_loops holds the loops of the devices left, and
+        these are evaluated in the next cycle. Return True if
+        successful.
+        """
+        network = self.network
+        level = self.level
+        fanout = self.fanout
+        buckets = [[] for _ in range(self.level_count)]
+        passes = 0
+        while changed:
+            if passes == self.iteration_limit:
+                network.steady_state = False
+                network.oscillating_loops = network.find_loops(
+                    sorted(changed))
+                self.pending = changed
+                break
+            passes += 1
+            for device_id in changed:
+                buckets[level[device_id]].append(device_id)
+            queued = changed
+            changed = set()
+            for current_level in range(min(level[device_id]
+                                           for device_id in queued),
+                                       self.level_count):
+                bucket = buckets[current_level]
+                bucket.sort(key=self.rank.get)  # not in the order of a set
+                for device_id in bucket:
+                    (kind, device, inputs, delay) = self.members[device_id]
+                    outputs = self.evaluate(kind, device, inputs)
+                    if outputs is None:
+                        return False
+                    if not self.drive(device, outputs, delay, cycle):
+                        continue
+                    for target in fanout[device_id]:
+                        if level[target] <= current_level:
+                            changed.add(target)
+                        elif target not in queued:
+                            queued.add(target)
+                            buckets[level[target]].append(target)
+                bucket.clear()
+            network.iterations = passes
+        return True
+
+    def drive(self, device, outputs, delay, cycle):
+        """Set the outputs of a device after its delay.
+
+        outputs are the new signals in the order of device.outputs. Return
+        True if the outputs have changed now, or False if they have not
+        changed or will change in a later cycle.
+        """
+        device_id = device.device_id
+        if delay == 0:
+            self.projected[device_id] = outputs
+            if tuple(device.outputs.values()) == outputs:
+                return False
+            device.outputs.update(zip(device.outputs, outputs))
+            return True
+        if self.projected[device_id] != outputs:
+            self.projected[device_id] = outputs
+            self.wheel[(cycle + delay) % len(self.wheel)].append(
+                (device, outputs))
+        return False
+
+    # The settled signals, the sources and the DATA samples are handled as
+    # in the levelized engine
+    resolve = LevelizedEngine.resolve
+    get_input = LevelizedEngine.get_input
+    settle = LevelizedEngine.settle
+    sample_data = LevelizedEngine.sample_data
+
+    def evaluate(self, kind, device, inputs):
+        """Return the new outputs of a device for its current inputs.
+
+        The device is evaluated as in the levelized engine, and its outputs
+        are then put back until the delay has passed, so only the memory of
+        a D-type changes. The outputs are in the order of device.outputs.
+        Return None if the device cannot be evaluated.
+        """
+        outputs = tuple(device.outputs.values())
+        if not LevelizedEngine.evaluate(self, kind, device, inputs):
+            return None
+        new_outputs = tuple(device.outputs.values())
+        device.outputs.update(zip(device.outputs, outputs))
+        return new_outputs
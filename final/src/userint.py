@@ -7,6 +7,7 @@ Classes:
 --------
 UserInterface - reads and parses user commands.
 """
+from periodic import PeriodicRunner
 
 
 class UserInterface:
@@ -60,9 +61,20 @@ class UserInterface:
     run_network(self, cycles): Runs the network for the specified number of
                                simulation cycles.
 
+    print_oscillating_loops(self): Prints the devices and signals that kept
+                                   changing.
+
     run_command(self): Runs the simulation from scratch.
 
     continue_command(self): Continues a previously run simulation.
+
+    read_path(self): Returns the rest of the user entry as a file path.
+
+    write_checkpoint_command(self): Writes a checkpoint of the simulation to
+                                    a file.
+
+    load_checkpoint_command(self): Loads a checkpoint of the simulation from
+                                   a file.
     """
 
     def __init__(self, names, devices, network, monitors):
@@ -73,6 +85,7 @@ class UserInterface:
         self.network = network
 
         self.cycles_completed = 0  # number of simulation cycles completed
+        self.runner = PeriodicRunner(devices, network, monitors)
 
         self.character = ""  # current character
         self.line = ""  # current string entered by the user
@@ -97,6 +110,10 @@ class UserInterface:
                 self.run_command()
             elif command == "c":
                 self.continue_command()
+            elif command == "w":
+                self.write_checkpoint_command()
+            elif command == "l":
+                self.load_checkpoint_command()
             else:
                 print("Invalid command. Enter 'h' for help.")
             self.get_line()  # get the user entry
@@ -206,6 +223,8 @@ class UserInterface:
         print("s X N     - set switch X to N (0 or 1)")
         print("m X       - set a monitor on signal X")
         print("z X       - zap the monitor on signal X")
+        print("w FILE    - write a checkpoint of the simulation to FILE")
+        print("l FILE    - load a checkpoint of the simulation from FILE")
         print("h         - help (this command)")
         print("q         - quit the program")
 
@@ -247,15 +266,28 @@ class UserInterface:
 
         Return True if successful.
         """
-        for _ in range(cycles):
-            if self.network.execute_network():
-                self.monitors.record_signals()
-            else:
-                print("Error! Network oscillating.")
-                return False
+        self.network.get_plan()  # built once, not in the first cycle
+        if not self.runner.run(cycles):
+            print("Error! Network oscillating.")
+            self.print_oscillating_loops()
+            return False
+        if self.runner.skipped_cycles:
+            print("Repeated the periodic signals for",
+                  self.runner.skipped_cycles, "cycles")
         self.monitors.display_signals()
         return True
 
+    def print_oscillating_loops(self):
+        """Print the devices and signals that kept changing, if known."""
+        for loop in self.network.oscillating_loops:
+            signals = []
+            for device_id in loop:
+                for output_id in self.devices.get_device(device_id).outputs:
+                    signals.append(self.devices.get_signal_name(device_id,
+                                                                output_id))
+            print("Signals still changing after", self.network.iterations,
+                  "iterations:", ", ".join(signals))
+
     def run_command(self):
         """Run the simulation from scratch."""
         self.cycles_completed = 0
@@ -278,3 +310,45 @@ class UserInterface:
                 self.cycles_completed += cycles
                 print(" ".join(["Continuing for", str(cycles), "cycles.",
                                 "Total:", str(self.cycles_completed)]))
+
+    def read_path(self):
+        """Return the rest of the user entry as a file path.
+
+        Return None if no path is provided.
+        """
+        self.skip_spaces()
+        path = (self.character + self.line[self.cursor:]).strip()
+        self.cursor = len(self.line)
+        if not path:
+            print("Error! Expected a file path.")
+            return None
+        return path
+
+    def write_checkpoint_command(self):
+        """Write a checkpoint of the simulation to a file."""
+        path = self.read_path()
+        if path is not None:
+            try:
+                with open(path, "wb") as checkpoint_file:
+                    checkpoint_file.write(
+                        self.network.checkpoint(self.monitors))
+            except OSError:
+                print("Error! Could not write the checkpoint.")
+                return
+            print("Saved checkpoint at cycle", self.devices.cycle)
+
+    def load_checkpoint_command(self):
+        """Load a checkpoint of the simulation from a file."""
+        path = self.read_path()
+        if path is not None:
+            try:
+                with open(path, "rb") as checkpoint_file:
+                    blob = checkpoint_file.read()
+            except OSError:
+                print("Error! Could not read the checkpoint.")
+                return
+            if self.network.restore(blob, self.monitors):
+                self.cycles_completed = self.devices.cycle
+                print("Restored checkpoint at cycle", self.devices.cycle)
+            else:
+                print("Error! The checkpoint does not match this network.")
@@ -0,0 +1,436 @@
+"""Execute the network with vectorised NumPy operations.
+
+Used in the Logic Simulator project to simulate very large networks. All the
+signal values are stored in one NumPy array, and the inputs of each group of
+similar devices are stored as an array of indices into it, so a whole group
+is evaluated by a single array operation.
+
+Classes
+-------
+VectorisedEngine - executes groups of devices with array operations.
+"""
+import numpy as np
+
+from graph import strongly_connected_components, get_device_graph
+
+
+class VectorisedEngine:
+    """Execute groups of devices with array operations.
+
+    The devices are sorted into levels, so that every device comes after the
+    devices that drive it, and the devices of a level are grouped by kind and
+    number of inputs. Each group of gates is evaluated with one reduction
+    over the gathered input values, D-types are updated with masked array
+    operations, and clocks and RC devices are computed from the cycle
+    number. Feedback loops are iterated until their signals settle. The
+    timing of D-types is the same as in the levelized.LevelizedEngine()
+    class.
+
+    The Device objects are only updated for the signals that changed in the
+    cycle, so monitors and get_output_signal keep working.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    network: instance of the network.Network() class.
+    iteration_limit: number of passes through the feedback loops to wait for
+                     their signals to settle before declaring the network
+                     unstable.
+
+    Public methods
+    --------------
+    build_plan(self): Builds the signal array and the groups of devices.
+
+    load_state(self): Reads the signals and D-type memories from the Device
+                      objects.
+
+    execute_network(self): Executes all the devices for one simulation
+                           cycle.
+    """
+
+    def __init__(self, devices, network, iteration_limit=20):
+        """Initialise the engine. The plan is built on the first cycle."""
+        self.devices = devices
+        self.network = network
+        self.iteration_limit = iteration_limit
+
+        self.topology_version = None  # version the plan was built for
+        self.next_cycle = None  # cycle expected to be executed next
+        self.floating = False  # True if an input is unconnected
+
+        self.ports = []  # (Device, output ID) of each signal
+        self.signal_index = {}  # stores {(device_id, output_id): index}
+        self.values = np.zeros(0, dtype=np.int8)
+        self.synced = np.zeros(0, dtype=np.int8)  # values in Device objects
+
+        # Levels of groups, each level a pair (acyclic groups, loop groups)
+        self.levels = []
+        self.lut_weights = {}  # stores {number of inputs: bit weights}
+
+    def build_plan(self):
+        """Build the signal array and the groups of devices."""
+        devices = self.devices
+        self.ports = []
+        self.signal_index = {}
+        kinds = {}
+        for kind in devices.registry.kinds:
+            for device_id in devices.find_devices(kind.kind_id):
+                kinds[device_id] = kind
+                device = devices.get_device(device_id)
+                for output_id in device.outputs:
+                    self.signal_index[(device_id, output_id)] = len(
+                        self.ports)
+                    self.ports.append((device, output_id))
+
+        self.floating = False
+        inputs = {}  # stores {device_id: list of signal indices}
+        for device_id in kinds:
+            device = devices.get_device(device_id)
+            inputs[device_id] = []
+            for connected_output in device.inputs.values():
+                if connected_output not in self.signal_index:
+                    self.floating = True  # unconnected input
+                    inputs[device_id].append(0)
+                else:
+                    inputs[device_id].append(
+                        self.signal_index[connected_output])
+
+        self.build_sources(kinds)
+        self.build_d_types(kinds, inputs)
+        self.build_levels(kinds, inputs)
+        self.topology_version = devices.topology_version
+        self.load_state()
+
+    def build_sources(self, kinds):
+        """Build the index arrays of the devices without inputs."""
+        devices = self.devices
+        self.switches = []
+        self.siggens = []
+        self.clocks = []
+        self.rcs = []
+        self.other_sources = []  # (kind, device) of kinds without arrays
+        for device_id, kind in kinds.items():
+            device = devices.get_device(device_id)
+            if device.inputs:
+                continue
+            elif kind.kind_id == devices.SWITCH:
+                self.switches.append(device)
+            elif kind.kind_id == devices.SIGGEN:
+                self.siggens.append(device)
+            elif kind.kind_id == devices.CLOCK:
+                self.clocks.append(device)
+            elif kind.kind_id == devices.RC:
+                self.rcs.append(device)
+            else:
+                self.other_sources.append((kind, device))
+
+        self.switch_index = self.get_output_index(self.switches)
+        self.siggen_index = self.get_output_index(self.siggens)
+        self.clock_index = self.get_output_index(self.clocks)
+        self.rc_index = self.get_output_index(self.rcs)
+        self.clock_period = np.array([2 * device.clock_half_period
+                                      for device in self.clocks],
+                                     dtype=np.int64)
+        self.clock_high_time = np.array([device.clock_high_time
+                                         for device in self.clocks],
+                                        dtype=np.int64)
+
+    def build_d_types(self, kinds, inputs):
+        """Build the index arrays of the inputs and outputs of D-types."""
+        devices = self.devices
+        self.d_types = [devices.get_device(device_id)
+                        for device_id, kind in kinds.items()
+                        if kind.kind_id == devices.D_TYPE]
+        self.d_type_position = {device.device_id: position for position,
+                                device in enumerate(self.d_types)}
+        d_type_inputs = {}
+        for input_id in devices.dtype_input_ids:
+            d_type_inputs[input_id] = np.array(
+                [inputs[device.device_id][list(device.inputs).index(input_id)]
+                 for device in self.d_types], dtype=np.int64)
+        self.clock_inputs = d_type_inputs[devices.CLK_ID]
+        self.data_inputs = d_type_inputs[devices.DATA_ID]
+        self.set_inputs = d_type_inputs[devices.SET_ID]
+        self.clear_inputs = d_type_inputs[devices.CLEAR_ID]
+        self.q_outputs = np.array(
+            [self.signal_index[(device.device_id, devices.Q_ID)]
+             for device in self.d_types], dtype=np.int64)
+        self.qbar_outputs = np.array(
+            [self.signal_index[(device.device_id, devices.QBAR_ID)]
+             for device in self.d_types], dtype=np.int64)
+
+    def build_levels(self, kinds, inputs):
+        """Sort the devices with inputs into levels of groups."""
+        devices = self.devices
+        successors = get_device_graph(devices, cut_inputs=[devices.DATA_ID])
+        level = {}
+        level_members = []  # lists of (device_id, in_loop) for each level
+        for component in strongly_connected_components(list(kinds),
+                                                       successors):
+            members = set(component)
+            drivers = set()
+            for device_id in component:
+                device = devices.get_device(device_id)
+                for input_id, connected_output in device.inputs.items():
+                    if (connected_output is not None
+                            and input_id != devices.DATA_ID):
+                        drivers.add(connected_output[0])
+            in_loop = len(component) > 1 or bool(members & drivers)
+            component_level = 1 + max(
+                [level.get(driver_id, 0) for driver_id in drivers - members],
+                default=0)
+            for device_id in component:
+                level[device_id] = component_level
+            if not devices.get_device(component[0]).inputs:
+                continue  # sources are updated separately
+            while len(level_members) <= component_level:
+                level_members.append([])
+            for device_id in component:
+                level_members[component_level].append((device_id, in_loop))
+
+        # Devices in loops are evaluated one at a time in registry order,
+        # so each sees the outputs already updated in the same pass
+        rank = {device_id: position for position, device_id
+                in enumerate(kinds)}
+        self.levels = []
+        for members in level_members:
+            if members:
+                loop_ids = sorted([device_id for device_id, in_loop
+                                   in members if in_loop], key=rank.get)
+                self.levels.append((
+                    self.build_groups([device_id for device_id, in_loop
+                                       in members if not in_loop],
+                                      kinds, inputs),
+                    [group for device_id in loop_ids
+                     for group in self.build_groups([device_id], kinds,
+                                                    inputs)]))
+
+    def build_groups(self, device_ids, kinds, inputs):
+        """Return the groups of devices that are evaluated together.
+
+        Each group is a tuple (kind_id, device information). Gates are
+        grouped by kind and number of inputs.
+        """
+        devices = self.devices
+        vector_kinds = devices.gate_types + [devices.LUT]
+        buckets = {}
+        groups = []
+        for device_id in device_ids:
+            device = devices.get_device(device_id)
+            kind = kinds[device_id]
+            number = len(device.inputs)
+            if kind.kind_id == devices.D_TYPE:
+                buckets.setdefault((devices.D_TYPE, 0), []).append(
+                    self.d_type_position[device_id])
+            elif kind.kind_id in vector_kinds and (
+                    kind.kind_id != devices.LUT or number <= 6):
+                buckets.setdefault((kind.kind_id, number), []).append(
+                    device_id)
+            else:  # evaluated one device at a time
+                groups.append((None, (kind, device, inputs[device_id],
+                                      self.get_output_index([device]))))
+
+        for (kind_id, number), members in buckets.items():
+            if kind_id == devices.D_TYPE:
+                groups.append((kind_id, np.array(members, dtype=np.int64)))
+                continue
+            input_index = np.array([inputs[device_id]
+                                    for device_id in members],
+                                   dtype=np.int64).reshape(len(members),
+                                                           number)
+            output_index = self.get_output_index(
+                [devices.get_device(device_id) for device_id in members])
+            tables = None
+            if kind_id == devices.LUT:
+                tables = np.array([devices.get_device(device_id).lut_table
+                                   for device_id in members],
+                                  dtype=np.uint64)
+                self.lut_weights[number] = np.left_shift(
+                    1, np.arange(number, dtype=np.uint64))
+            groups.append((kind_id, (input_index, output_index, tables)))
+        return groups
+
+    def get_output_index(self, device_list):
+        """Return the signal indices of the single outputs of the devices."""
+        return np.array([self.signal_index[(device.device_id, None)]
+                         for device in device_list], dtype=np.int64)
+
+    def load_state(self):
+        """Read the signals and D-type memories from the Device objects."""
+        devices = self.devices
+        signals = [device.outputs[output_id]
+                   for (device, output_id) in self.ports]
+        # Transitional and unset signals are written back after the cycle
+        self.synced = np.array([signal if signal in (devices.LOW, devices.HIGH)
+                                else -1 for signal in signals], dtype=np.int8)
+        settled = {devices.HIGH: devices.HIGH, devices.RISING: devices.HIGH}
+        self.values = np.array([settled.get(signal, devices.LOW)
+                                for signal in signals], dtype=np.int8)
+        self.memory = np.array([device.dtype_memory
+                                for device in self.d_types], dtype=np.int8)
+        self.last_clock = self.values[self.clock_inputs]
+        self.clock_phase = np.array([device.clock_phase
+                                     for device in self.clocks],
+                                    dtype=np.int64)
+        self.rc_fall_cycle = np.array([device.rc_fall_cycle
+                                       for device in self.rcs],
+                                      dtype=np.int64)
+        self.next_cycle = devices.cycle
+
+    def execute_network(self):
+        """Execute all the devices for one simulation cycle.
+
+        Return True if successful and the network does not oscillate.
+        """
+        devices = self.devices
+        network = self.network
+        if self.topology_version != devices.topology_version:
+            self.build_plan()
+        elif self.next_cycle != devices.cycle:
+            self.load_state()  # a cold start-up changed the devices
+        if self.floating:
+            return False
+
+        # D-types sample DATA before the sources change it
+        self.data_samples = self.values[self.data_inputs]
+        for kind, device_ids in network.get_plan():
+            if kind.start_cycle is not None:
+                kind.start_cycle(network, device_ids)
+        if not self.update_sources():
+            return False
+
+        network.steady_state = True
+        network.iterations = 1
+        for (groups, loop_groups) in self.levels:
+            for group in groups:
+                if not self.evaluate_group(group):
+                    return False
+            if not loop_groups:
+                continue
+            for passes in range(1, self.iteration_limit + 1):
+                previous = self.values.copy()
+                for group in loop_groups:
+                    if not self.evaluate_group(group):
+                        return False
+                network.iterations = max(network.iterations, passes)
+                if np.array_equal(previous, self.values):
+                    break
+            else:
+                network.steady_state = False
+
+        self.store_changes()
+        devices.cycle += 1
+        self.next_cycle = devices.cycle
+        return network.steady_state
+
+    def update_sources(self):
+        """Set the signals of the devices without inputs for this cycle.
+
+        Return True if successful.
+        """
+        devices = self.devices
+        cycle = devices.cycle
+        values = self.values
+        if self.switches:
+            values[self.switch_index] = [device.switch_state
+                                         for device in self.switches]
+        if self.siggens:
+            values[self.siggen_index] = [
+                device.siggen_pattern[cycle % len(device.siggen_pattern)]
+                for device in self.siggens]
+        if self.clocks:
+            values[self.clock_index] = (
+                (cycle + self.clock_phase) % self.clock_period
+                < self.clock_high_time)
+        if self.rcs:
+            values[self.rc_index] = cycle < self.rc_fall_cycle
+        for kind, device in self.other_sources:
+            if not self.settle(kind, device, [],
+                               self.get_output_index([device])):
+                return False
+        return True
+
+    def evaluate_group(self, group):
+        """Evaluate a group of devices. Return True if successful."""
+        devices = self.devices
+        values = self.values
+        kind_id, information = group
+        if kind_id is None:
+            return self.evaluate_device(*information)
+
+        elif kind_id == devices.D_TYPE:
+            positions = information
+            clock = values[self.clock_inputs[positions]]
+            rising = (self.last_clock[positions] == devices.LOW) & (
+                clock == devices.HIGH)
+            memory = np.where(rising, self.data_samples[positions],
+                              self.memory[positions])
+            memory[values[self.set_inputs[positions]] == devices.HIGH] = \
+                devices.HIGH
+            memory[values[self.clear_inputs[positions]] == devices.HIGH] = \
+                devices.LOW
+            self.memory[positions] = memory
+            self.last_clock[positions] = clock
+            values[self.q_outputs[positions]] = memory
+            values[self.qbar_outputs[positions]] = 1 - memory
+            return True
+
+        input_index, output_index, tables = information
+        input_values = values[input_index]
+        if kind_id == devices.AND:
+            values[output_index] = input_values.all(axis=1)
+        elif kind_id == devices.OR:
+            values[output_index] = input_values.any(axis=1)
+        elif kind_id == devices.NAND:
+            values[output_index] = ~input_values.all(axis=1)
+        elif kind_id == devices.NOR:
+            values[output_index] = ~input_values.any(axis=1)
+        elif kind_id == devices.XOR:
+            values[output_index] = input_values.sum(axis=1) & 1
+        elif kind_id == devices.LUT:
+            index = input_values.astype(np.uint64) @ self.lut_weights[
+                input_index.shape[1]]
+            values[output_index] = (tables >> index) & np.uint64(1)
+        return True
+
+    def evaluate_device(self, kind, device, input_index, output_index):
+        """Evaluate a single device of a kind without an array operation.
+
+        Return True if successful.
+        """
+        if kind.evaluate is not None:
+            self.values[output_index] = kind.evaluate(
+                self.devices, device, [int(self.values[index])
+                                       for index in input_index])
+            return True
+        # Bring the drivers up to date before executing the device
+        for index in input_index:
+            (driver, output_id) = self.ports[index]
+            driver.outputs[output_id] = int(self.values[index])
+            self.synced[index] = self.values[index]
+        return self.settle(kind, device, input_index, output_index)
+
+    def settle(self, kind, device, input_index, output_index):
+        """Execute a device until its outputs settle to LOW or HIGH.
+
+        Return True if successful.
+        """
+        network = self.network
+        for _ in range(self.iteration_limit):
+            network.steady_state = True
+            if not kind.execute(network, device.device_id):
+                return False
+            if network.steady_state:
+                self.values[output_index] = list(device.outputs.values())
+                self.synced[output_index] = self.values[output_index]
+                return True
+        return False
+
+    def store_changes(self):
+        """Write the signals that changed into the Device objects."""
+        for index in np.flatnonzero(self.values != self.synced).tolist():
+            (device, output_id) = self.ports[index]
+            device.outputs[output_id] = int(self.values[index])
+        self.synced = self.values.copy()
+        for device, memory in zip(self.d_types, self.memory.tolist()):
+            device.dtype_memory = memory
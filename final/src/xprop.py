@@ -0,0 +1,398 @@
+"""Simulate a network from an unknown initial state.
+
+Used in the Logic Simulator project to check that a network resets to a
+known state, whatever the memories of its D-types at start-up. Every signal
+is LOW, HIGH or UNKNOWN, and an unknown signal only makes unknown the
+outputs that depend on it, so a single run covers every initial state.
+
+Classes
+-------
+XPropagationSimulator - simulates three-valued signals for a batch of switch
+                        patterns at once.
+"""
+import itertools
+
+from bitparallel import BitParallelSimulator
+
+
+class XPropagationSimulator:
+    """Simulate three-valued signals for a batch of switch patterns at once.
+
+    Every signal is a pair of words (high, low), with one bit for each
+    pattern as in the bitparallel.BitParallelSimulator() class. Bit k of
+    high is set if the signal can be HIGH in pattern k, and bit k of low if
+    it can be LOW, so LOW is (0, 1), HIGH is (1, 0) and UNKNOWN is (1, 1).
+    A gate is evaluated in every pattern with a few bitwise operators on
+    each word: for example, an AND gate can be HIGH if all its inputs can be
+    HIGH, and can be LOW if any of its inputs can be LOW. A vectorised
+    engine would hold the two bits in two boolean arrays in the same way.
+
+    The devices are evaluated in topological order, with the DATA input of
+    D-types cut as in the levelized.LevelizedEngine() class. A D-type whose
+    CLK input may have risen keeps its memory only where it agrees with the
+    DATA sample, and an unknown SET or CLEAR input does the same with HIGH
+    or LOW. Feedback loops are iterated until none of their signals change.
+
+    From an unknown state, the memories of the D-types and the outputs of
+    all the devices with inputs are UNKNOWN. Switches, clocks, signal
+    generators and RC devices start from their current state, so the clocks
+    keep the phases set by the last cold start-up. The Device objects are
+    left unchanged.
+
+    Parameters
+    ----------
+    devices: instance of the devices.Devices() class.
+    monitors: instance of the monitors.Monitors() class.
+    iteration_limit: number of passes through a feedback loop to wait for
+                     its signals to settle before declaring the network
+                     unstable.
+
+    Public methods
+    --------------
+    build_plan(self): Sorts the devices into evaluation order.
+
+    run(self, cycles): Simulates the current switch settings from an unknown
+                       state and returns the monitored signals.
+
+    run_patterns(self, patterns, cycles=1, switch_ids=None, unknown=True):
+                    Simulates each pattern of switch signals for a number of
+                    cycles and returns the monitored signals of every
+                    pattern.
+
+    run_words(self, switch_words, width, cycles=1, unknown=True): Simulates
+                    packed switch words and returns the monitored words.
+
+    get_known_cycles(self, traces): Returns the first cycle from which each
+                                    monitored signal stays known.
+
+    display_report(self, traces): Prints the monitored signals and the
+                                  cycle from which each one is known.
+
+    load_state(self, unknown=True): Broadcasts the current state of the
+                                    network to every pattern.
+
+    execute_cycle(self, cycle, switch_words): Evaluates all the devices for
+                                              one cycle.
+    """
+
+    def __init__(self, devices, monitors, iteration_limit=20):
+        """Initialise the simulator. The plan is built on the first run."""
+        self.devices = devices
+        self.monitors = monitors
+        self.iteration_limit = iteration_limit
+
+        self.topology_version = None  # version the plan was built for
+        self.sources = []  # (kind, device) of the devices without inputs
+        self.components = []  # lists of (kind, device, in_loop) in order
+        self.supported = True  # False if a device cannot be simulated
+
+        self.words = {}  # stores {(device_id, output_id): (high, low)}
+        self.memory = {}  # stores {device_id: D-type memory words}
+        self.last_clock = {}  # stores {device_id: CLK words}
+        self.mask = 0  # word with a HIGH bit for every pattern
+
+    def build_plan(self):
+        """Sort the devices into evaluation order.
+
+        The plan is built by the bitparallel.BitParallelSimulator() class,
+        so both simulators evaluate the devices in the same order.
+        """
+        BitParallelSimulator.build_plan(self)
+
+    def run(self, cycles):
+        """Simulate the current switch settings from an unknown state.
+
+        Return a dictionary {(device_id, output_id): list of signals in each
+        cycle} of the monitored outputs, with LOW, HIGH or UNKNOWN signals.
+        Return None if the network cannot be simulated or oscillates.
+        """
+        results = self.run_patterns([[]], cycles, switch_ids=[])
+        if results is None:
+            return None
+        return results[0]
+
+    def run_patterns(self, patterns, cycles=1, switch_ids=None,
+                     unknown=True):
+        """Simulate each pattern of switch signals for a number of cycles.
+
+        Each pattern is a list of signals, LOW, HIGH or UNKNOWN, for the
+        switches in switch_ids, which are all the switches in the network by
+        default. The simulation starts from an unknown state, or from the
+        current state of the network if unknown is False. Return a list with
+        a dictionary {(device_id, output_id): list of signals in each cycle}
+        of the monitored outputs for each pattern. Return None if the network
+        cannot be simulated, or if it oscillates under any of the patterns.
+        """
+        devices = self.devices
+        if switch_ids is None:
+            switch_ids = devices.find_devices(devices.SWITCH)
+
+        # Pack the patterns into a pair of words per switch
+        switch_words = {}
+        for position, switch_id in enumerate(switch_ids):
+            high = low = 0
+            for bit, pattern in enumerate(patterns):
+                if pattern[position] != devices.LOW:
+                    high |= 1 << bit
+                if pattern[position] != devices.HIGH:
+                    low |= 1 << bit
+            switch_words[switch_id] = (high, low)
+
+        traces = self.run_words(switch_words, len(patterns), cycles, unknown)
+        if traces is None:
+            return None
+
+        # Unpack one dictionary of traces for each pattern
+        results = []
+        for bit in range(len(patterns)):
+            results.append({monitor: [self.get_signal(words, bit)
+                                      for words in trace]
+                            for monitor, trace in traces.items()})
+        return results
+
+    def run_words(self, switch_words, width, cycles=1, unknown=True):
+        """Simulate packed switch words for a number of cycles.
+
+        switch_words is a dictionary {switch_id: (high, low)} with one bit
+        for each of the width patterns. Switches that are left out keep
+        their state in every pattern. Return a dictionary {(device_id,
+        output_id): list of (high, low) in each cycle} of the monitored
+        outputs, or None if the network cannot be simulated or oscillates.
+        """
+        devices = self.devices
+        if self.topology_version != devices.topology_version:
+            self.build_plan()
+        if not self.supported:
+            return None
+        self.mask = (1 << width) - 1
+
+        self.load_state(unknown)
+        monitored = list(self.monitors.monitors_dictionary)
+        traces = {monitor: [] for monitor in monitored}
+        for cycle in range(devices.cycle, devices.cycle + cycles):
+            if not self.execute_cycle(cycle, switch_words):
+                return None
+            for monitor in monitored:
+                traces[monitor].append(self.words[monitor])
+        return traces
+
+    def get_signal(self, words, bit):
+        """Return the signal of the words (high, low) in one pattern."""
+        (high, low) = words
+        if (high >> bit) & 1:
+            if (low >> bit) & 1:
+                return self.devices.UNKNOWN
+            return self.devices.HIGH
+        return self.devices.LOW
+
+    def get_known_cycles(self, traces):
+        """Return the first cycle from which each monitored signal is known.
+
+        traces are as returned by run. Return a dictionary {(device_id,
+        output_id): number of cycles after which the signal is never
+        UNKNOWN}, with None for the signals still UNKNOWN in the last cycle.
+        """
+        known_cycles = {}
+        for monitor, signals in traces.items():
+            unknown_cycles = [cycle for cycle, signal in enumerate(signals)
+                              if signal == self.devices.UNKNOWN]
+            if not unknown_cycles:
+                known_cycles[monitor] = 0
+            elif unknown_cycles[-1] == len(signals) - 1:
+                known_cycles[monitor] = None
+            else:
+                known_cycles[monitor] = unknown_cycles[-1] + 1
+        return known_cycles
+
+    def display_report(self, traces):
+        """Print the monitored signals and the cycle each one is known from.
+
+        traces are as returned by run. LOW is shown as "_", HIGH as "-" and
+        UNKNOWN as "X".
+        """
+        devices = self.devices
+        symbols = {devices.LOW: "_", devices.HIGH: "-", devices.UNKNOWN: "X"}
+        known_cycles = self.get_known_cycles(traces)
+        margin = self.monitors.get_margin()
+        for monitor, signals in traces.items():
+            monitor_name = devices.get_signal_name(*monitor)
+            if known_cycles[monitor] is None:
+                verdict = "never known"
+            else:
+                verdict = "known from cycle {}".format(known_cycles[monitor])
+            print(monitor_name + (margin - len(monitor_name)) * " ", end=": ")
+            print("".join(symbols[signal] for signal in signals), verdict)
+
+    def load_state(self, unknown=True):
+        """Broadcast the current state of the network to every pattern.
+
+        If unknown is True, the memories of the D-types and the outputs of
+        the devices with inputs are UNKNOWN instead.
+        """
+        devices = self.devices
+        self.words = {}
+        for device in devices.devices_list:
+            for output_id, signal in device.outputs.items():
+                if unknown and device.inputs:
+                    words = (self.mask, self.mask)
+                else:
+                    words = self.broadcast(
+                        signal in [devices.HIGH, devices.RISING])
+                self.words[(device.device_id, output_id)] = words
+        self.memory = {}
+        self.last_clock = {}
+        for device_id in devices.find_devices(devices.D_TYPE):
+            device = devices.get_device(device_id)
+            if unknown:
+                self.memory[device_id] = (self.mask, self.mask)
+            else:
+                self.memory[device_id] = self.broadcast(
+                    device.dtype_memory == devices.HIGH)
+            self.last_clock[device_id] = self.words[
+                device.inputs[devices.CLK_ID]]
+
+    def broadcast(self, high):
+        """Return the words of a signal that is the same in every pattern."""
+        return (self.mask, 0) if high else (0, self.mask)
+
+    def execute_cycle(self, cycle, switch_words):
+        """Evaluate all the devices for one cycle. Return True if settled."""
+        devices = self.devices
+        # D-types sample DATA before the sources change it
+        data_samples = {}
+        for device_id in self.memory:
+            device = devices.get_device(device_id)
+            data_samples[device_id] = self.words[
+                device.inputs[devices.DATA_ID]]
+
+        for kind, device in self.sources:
+            device_id = device.device_id
+            kind_id = kind.kind_id
+            if kind_id == devices.SWITCH:
+                words = switch_words.get(device_id, self.broadcast(
+                    device.switch_state == devices.HIGH))
+            elif kind_id == devices.SIGGEN:
+                pattern = device.siggen_pattern
+                words = self.broadcast(
+                    pattern[cycle % len(pattern)] == devices.HIGH)
+            elif kind_id == devices.CLOCK:
+                words = self.broadcast(devices.get_clock_signal(
+                    device_id, cycle) == devices.HIGH)
+            elif kind_id == devices.RC:
+                words = self.broadcast(cycle < device.rc_fall_cycle)
+            else:
+                self.evaluate_bits(kind, device)
+                continue
+            self.words[(device_id, None)] = words
+
+        for members in self.components:
+            if len(members) == 1 and not members[0][2]:
+                kind, device, in_loop = members[0]
+                self.evaluate(kind, device, data_samples)
+                continue
+            for passes in range(self.iteration_limit):
+                changed = False
+                for (kind, device, in_loop) in members:
+                    outputs = self.get_output_words(device)
+                    self.evaluate(kind, device, data_samples)
+                    if self.get_output_words(device) != outputs:
+                        changed = True
+                if not changed:
+                    break
+            else:
+                return False
+        return True
+
+    def get_output_words(self, device):
+        """Return the list of output words of the device."""
+        return [self.words[(device.device_id, output_id)]
+                for output_id in device.outputs]
+
+    def evaluate(self, kind, device, data_samples):
+        """Evaluate a device under every pattern at once."""
+        devices = self.devices
+        device_id = device.device_id
+        mask = self.mask
+        input_words = [self.words[connected_output]
+                       for connected_output in device.inputs.values()]
+        kind_id = kind.kind_id
+
+        if kind_id in [devices.AND, devices.NAND]:
+            high, low = mask, 0
+            for (input_high, input_low) in input_words:
+                high &= input_high
+                low |= input_low
+            if kind_id == devices.NAND:
+                high, low = low, high
+        elif kind_id in [devices.OR, devices.NOR]:
+            high, low = 0, mask
+            for (input_high, input_low) in input_words:
+                high |= input_high
+                low &= input_low
+            if kind_id == devices.NOR:
+                high, low = low, high
+        elif kind_id == devices.XOR:
+            high, low = 0, mask  # the parity of no inputs is even
+            for (input_high, input_low) in input_words:
+                high, low = ((high & input_low) | (low & input_high),
+                             (high & input_high) | (low & input_low))
+        elif kind_id == devices.LUT:
+            # A minterm is possible if every input can take its value
+            high = low = 0
+            for index in range(1 << len(input_words)):
+                term = mask
+                for bit, (input_high, input_low) in enumerate(input_words):
+                    term &= input_high if (index >> bit) & 1 else input_low
+                if (device.lut_table >> index) & 1:
+                    high |= term
+                else:
+                    low |= term
+        elif kind_id == devices.D_TYPE:
+            signals = dict(zip(device.inputs, input_words))
+            (clock_high, clock_low) = signals[devices.CLK_ID]
+            (last_high, last_low) = self.last_clock[device_id]
+            # Patterns in which CLK may have risen, and surely has
+            maybe = clock_high & last_low
+            surely = maybe & ~clock_low & ~last_high
+            (high, low) = self.memory[device_id]
+            (data_high, data_low) = data_samples[device_id]
+            high = (high & ~surely) | (data_high & maybe)
+            low = (low & ~surely) | (data_low & maybe)
+            (set_high, set_low) = signals[devices.SET_ID]
+            high |= set_high
+            low &= set_low
+            (clear_high, clear_low) = signals[devices.CLEAR_ID]
+            low |= clear_high
+            high &= clear_low
+            self.memory[device_id] = (high, low)
+            self.last_clock[device_id] = (clock_high, clock_low)
+            self.words[(device_id, devices.Q_ID)] = (high, low)
+            self.words[(device_id, devices.QBAR_ID)] = (low, high)
+            return
+        else:
+            self.evaluate_bits(kind, device)
+            return
+        self.words[(device_id, None)] = (high, low)
+
+    def evaluate_bits(self, kind, device):
+        """Evaluate a device of another kind one pattern at a time.
+
+        The device is evaluated for every value of its UNKNOWN inputs, and
+        an output is UNKNOWN if it is not the same for all of them.
+        """
+        devices = self.devices
+        input_words = [self.words[connected_output]
+                       for connected_output in device.inputs.values()]
+        output_words = [[0, 0] for _ in device.outputs]
+        for bit in range(self.mask.bit_length()):
+            choices = []
+            for (input_high, input_low) in input_words:
+                choices.append([signal for signal, words in [
+                    (devices.LOW, input_low), (devices.HIGH, input_high)]
+                    if (words >> bit) & 1])
+            for input_signals in itertools.product(*choices):
+                for position, signal in enumerate(kind.evaluate(
+                        devices, device, list(input_signals))):
+                    output_words[position][signal != devices.HIGH] |= 1 << bit
+        for output_id, (high, low) in zip(device.outputs, output_words):
+            self.words[(device.device_id, output_id)] = (high, low)